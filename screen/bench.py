@@ -0,0 +1,316 @@
+import os
+import sys
+import json
+import glob
+import time
+import platform
+import argparse
+import itertools
+
+import cv2
+import numpy as np
+
+from .dtw_engine import dtw_distance
+from .features import NUM_KEYPOINTS, calculate_relative_distances, smooth_keypoints
+from .keypoints import BATCH_SIZE, MAX_KEYPOINTS, MODEL_NAME, SAMPLE_FPS, iter_sampled_frames, result_to_points
+from .onnx_backend import PoseBoxes, PoseKeypoints, PoseResult
+from .reference_store import REFERENCE_VIDEO_DIR, ROOT_DIR
+from .tracking import keypoint_confidence
+
+# src/mp4 전체 영상에 대한 end-to-end 벤치마크 (Streamlit 없이 실행)
+# 단계별 시간(open/decode, inference, normalize, relative distances, smoothing, DTW), 프레임 수,
+# 최대 RSS, 초당 비교 횟수를 JSON으로 저장하고 이전 결과(baseline)와 비교
+#
+# python -m screen.bench --record                   # 모델 추론 + 포즈 결과를 fixture로 저장
+# python -m screen.bench --replay -o bench.json     # fixture 재생 (torch 없이 특징/DTW 단계만)
+# python -m screen.bench --replay --baseline bench.json
+
+FIXTURE_DIR = os.path.join(ROOT_DIR, '.cache', 'bench_fixtures')
+STAGES = ('open', 'decode', 'inference', 'normalize', 'smoothing', 'relative_distances', 'dtw')
+REGRESSION_THRESHOLD = 0.10  # baseline 대비 10% 이상 느려지면 회귀로 판단
+NOISE_FLOOR = 0.005  # 단계 시간 차이가 이보다 작으면(초) 측정 오차로 보고 회귀 판단에서 제외
+TOTAL_NOISE_FLOOR = 0.25  # 전체 시간(한 번 실행, fixture/영상 읽기 포함)의 측정 오차 기준 (초)
+DTW_ROUNDS = 5  # 전체 쌍 비교를 반복하는 횟수 (가장 빠른 회차 사용)
+FEATURE_ROUNDS = 5  # 특징 단계(변환/스무딩/상대 거리)를 반복하는 횟수 (가장 빠른 회차 사용)
+
+
+class StageTimer:
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+
+    def measure(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        value = fn(*args, **kwargs)
+        self.add(stage, time.perf_counter() - start)
+        return value
+
+    # 짧은 단계는 rounds번 실행해서 가장 빠른 시간만 더함 (타이머/스케줄링 잡음 제거)
+    def best(self, stage, fn, *args, rounds=FEATURE_ROUNDS, **kwargs):
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            value = fn(*args, **kwargs)
+            best = min(best, time.perf_counter() - start)
+        self.add(stage, best)
+        return value
+
+
+# 최대 RSS (MB), resource 모듈이 없는 환경(Windows)에서는 psutil 사용
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _fixture_path(video_path, fixture_dir):
+    return os.path.join(fixture_dir, os.path.splitext(os.path.basename(video_path))[0] + '.npz')
+
+
+# fixture 저장용: YOLO 결과 하나에서 첫 번째 사람의 픽셀 좌표 (17, 2), 신뢰도 (17,), 검출 여부
+def _first_person(result):
+    xy = result.keypoints.xy.cpu().numpy().astype(np.float32).reshape(-1, NUM_KEYPOINTS, 2)
+    if not len(xy):
+        return np.zeros((NUM_KEYPOINTS, 2), np.float32), np.zeros(NUM_KEYPOINTS, np.float32), False
+    return xy[0], keypoint_confidence(result.keypoints, xy)[0], True
+
+
+# fixture의 첫 번째 사람 좌표를 모델 결과와 같은 형식으로 복원 (result_to_points에 그대로 전달)
+# 신뢰도/검출 여부가 없는 이전 fixture는 0이 아닌 점을 검출된 것으로 봄
+def _pose_results(outputs):
+    xy = outputs['xy']
+    conf = outputs['conf'] if 'conf' in outputs else (xy != 0).any(axis=-1).astype(np.float32)
+    detected = outputs['detected'] if 'detected' in outputs else xy.reshape(len(xy), -1).any(axis=1)
+    shape = (int(outputs['height']), int(outputs['width']))
+    results = []
+    for points, confidence, found in zip(xy, conf, detected):
+        data = np.concatenate([points, confidence[:, None]], axis=1)[None] if found else \
+            np.zeros((0, NUM_KEYPOINTS, 3), np.float32)
+        boxes = PoseBoxes(np.zeros((len(data), 4), np.float32), np.ones(len(data), np.float32))
+        results.append(PoseResult(boxes, PoseKeypoints(data), shape))
+    return results
+
+
+# 영상 하나를 디코딩 + 추론해서 픽셀 좌표 시퀀스를 반환
+def run_model(video_path, model, timer, batch_size=BATCH_SIZE, sample_fps=SAMPLE_FPS):
+    start = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    timer.add('open', time.perf_counter() - start)
+
+    people, timestamps, batch, batch_times = [], [], [], []
+
+    def infer():
+        for result, timestamp in zip(timer.measure('inference', model, batch, verbose=False), batch_times):
+            if result.keypoints is not None:
+                people.append(_first_person(result))
+                timestamps.append(timestamp)
+
+    frames = iter_sampled_frames(cap, sample_fps)
+    while True:
+        start = time.perf_counter()
+        item = next(frames, None)
+        timer.add('decode', time.perf_counter() - start)
+        if item is None:
+            break
+        batch.append(item[2])
+        batch_times.append(item[1])
+        if len(batch) == batch_size:
+            infer()
+            batch, batch_times = [], []
+    if batch:
+        infer()
+    cap.release()
+
+    return {
+        'xy': np.array([xy for xy, _, _ in people], dtype=np.float32).reshape(-1, NUM_KEYPOINTS, 2),
+        'conf': np.array([conf for _, conf, _ in people], dtype=np.float32).reshape(-1, NUM_KEYPOINTS),
+        'detected': np.array([found for _, _, found in people], dtype=bool),
+        'timestamps': np.array(timestamps, dtype=np.float32),
+        'width': frame_width,
+        'height': frame_height,
+    }
+
+
+def save_fixture(video_path, outputs, fixture_dir, model_name, sample_fps):
+    os.makedirs(fixture_dir, exist_ok=True)
+    np.savez(_fixture_path(video_path, fixture_dir), model=model_name, sample_fps=sample_fps, **outputs)
+
+
+def load_fixture(video_path, fixture_dir):
+    with np.load(_fixture_path(video_path, fixture_dir)) as data:
+        return {key: data[key] for key in data.files}
+
+
+# 포즈 결과 -> extract_keypoints와 같은 변환(keypoints.result_to_points)/스무딩, 이후 DTW 입력(상대 거리)까지
+def run_features(outputs, timer):
+    results = _pose_results(outputs)
+    width, height = int(outputs['width']), int(outputs['height'])
+    points = timer.best('normalize', lambda: [result_to_points(result, width, height) for result in results])
+    normalized = np.array([p[:, :2].reshape(MAX_KEYPOINTS) for p in points], dtype=np.float32)
+    normalized = normalized.reshape(len(points), MAX_KEYPOINTS)
+    if len(normalized) > 3:
+        normalized = timer.best('smoothing', smooth_keypoints, normalized)
+    return timer.best('relative_distances', calculate_relative_distances, normalized)
+
+
+def run(video_paths, model_name=MODEL_NAME, sample_fps=SAMPLE_FPS, batch_size=BATCH_SIZE,
+        replay=False, record=False, fixture_dir=FIXTURE_DIR, imgsz=None):
+    """
+    video_paths 전체를 처리하고 모든 영상 쌍을 DTW로 비교한 결과(dict)를 반환.
+    replay=True이면 모델 대신 fixture_dir의 포즈 결과를 사용 (torch/ultralytics 필요 없음).
+    """
+    timer = StageTimer()
+    model = None
+    if not replay:
+        from .profiles import PipelineProfile, load_profile_model
+
+        model = load_profile_model(PipelineProfile('bench', model_name, imgsz), warm=True)
+
+    total_start = time.perf_counter()
+    features = {}
+    videos = {}
+    for video_path in video_paths:
+        name = os.path.basename(video_path)
+        if replay:
+            outputs = load_fixture(video_path, fixture_dir)
+        else:
+            outputs = run_model(video_path, model, timer, batch_size, sample_fps)
+            if record:
+                save_fixture(video_path, outputs, fixture_dir, model_name, sample_fps)
+        features[name] = run_features(outputs, timer)
+        videos[name] = {'frames': int(len(outputs['xy']))}
+
+    # 모든 영상 쌍 비교 (한 회차가 짧아서 여러 번 반복하고 가장 빠른 회차 사용)
+    pairs = list(itertools.combinations(sorted(features), 2))
+    dtw_time = float('inf')
+    for _ in range(DTW_ROUNDS):
+        start = time.perf_counter()
+        for name1, name2 in pairs:
+            dtw_distance(features[name1], features[name2])
+        dtw_time = min(dtw_time, time.perf_counter() - start)
+    timer.add('dtw', dtw_time)
+    total = time.perf_counter() - total_start
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'mode': 'replay' if replay else 'model',
+            'model': model_name,
+            'imgsz': imgsz,
+            'sample_fps': sample_fps,
+            'batch_size': batch_size,
+            'videos': len(video_paths),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'stages': timer.totals,
+        'total_time': total,
+        'frames': sum(video['frames'] for video in videos.values()),
+        'comparisons': len(pairs),
+        'comparisons_per_sec': len(pairs) / dtw_time if dtw_time > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'videos': videos,
+    }
+
+
+# baseline 대비 변화율 표 출력, 회귀(느려진 항목) 목록 반환
+def compare(result, baseline, threshold=REGRESSION_THRESHOLD):
+    # 항목마다 (이름, baseline, current, 클수록 좋은지, 초 단위 차이 함수, 측정 오차 기준(초))
+    # 단계 시간은 가장 빠른 회차, 전체 시간은 한 번 실행한 값이라 기준을 따로 둠 (메모리는 기준 없음)
+    def seconds(old, new):
+        return abs(new - old)
+
+    def comparison_seconds(old, new):  # 초당 비교 횟수 -> 전체 쌍 비교 시간 차이
+        comparisons = result.get('comparisons', 0)
+        return abs(comparisons / new - comparisons / old) if new else float('inf')
+
+    rows = [(f'stage.{stage}', baseline['stages'].get(stage), result['stages'].get(stage), False, seconds,
+             NOISE_FLOOR) for stage in STAGES]
+    rows += [
+        ('total_time', baseline.get('total_time'), result.get('total_time'), False, seconds, TOTAL_NOISE_FLOOR),
+        ('peak_rss_mb', baseline.get('peak_rss_mb'), result.get('peak_rss_mb'), False, None, None),
+        ('comparisons_per_sec', baseline.get('comparisons_per_sec'), result.get('comparisons_per_sec'), True,
+         comparison_seconds, NOISE_FLOOR),
+    ]
+    if baseline['config'].get('mode') != result['config'].get('mode'):
+        print(f"주의: 실행 모드가 다릅니다 ({baseline['config'].get('mode')} -> {result['config'].get('mode')})")
+    if baseline.get('frames') != result.get('frames'):
+        print(f"주의: 처리한 프레임 수가 다릅니다 ({baseline.get('frames')} -> {result.get('frames')})")
+
+    regressions = []
+    print(f"{'항목':<28}{'baseline':>12}{'current':>12}{'변화':>10}")
+    for name, old, new, higher_is_better, to_seconds, floor in rows:
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        # 시간 차이가 측정 오차 기준보다 작으면 회귀 판단에서 제외
+        regressed = worse > threshold and (to_seconds is None or to_seconds(old, new) > floor)
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<28}{old:>12.4f}{new:>12.4f}{change * 100:>9.1f}%{'  <- 회귀' if regressed else ''}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='src/mp4 영상 전체에 대한 파이프라인 벤치마크')
+    parser.add_argument('videos', nargs='*', help='영상 경로 (기본: src/mp4/*.mp4)')
+    parser.add_argument('-o', '--output', help='결과 JSON 경로')
+    parser.add_argument('--baseline', help='비교할 이전 결과 JSON')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--model', default=MODEL_NAME)
+    parser.add_argument('--imgsz', type=int, help='추론 해상도 (기본: 모델 기본값)')
+    parser.add_argument('--profile', help='프로필 이름 (--model/--imgsz 대신 사용)')
+    parser.add_argument('--sample-fps', type=float, default=SAMPLE_FPS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--fixtures', default=FIXTURE_DIR, help='포즈 결과 fixture 디렉터리')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', action='store_true', help='모델 결과를 fixture로 저장')
+    mode.add_argument('--replay', action='store_true', help='모델 대신 fixture 재생')
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        from .profiles import get_profile
+
+        profile = get_profile(args.profile)
+        args.model, args.imgsz = profile.model_name, profile.imgsz
+
+    video_paths = args.videos or sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))
+    result = run(video_paths, args.model, args.sample_fps, args.batch_size,
+                 replay=args.replay, record=args.record, fixture_dir=args.fixtures, imgsz=args.imgsz)
+
+    print(f"영상 {result['config']['videos']}개, 프레임 {result['frames']}개, 전체 {result['total_time']:.2f}s")
+    for stage, seconds in result['stages'].items():
+        print(f"{stage:>20}: {seconds * 1000:10.2f}ms")
+    if result['comparisons_per_sec']:
+        print(f"DTW 비교 {result['comparisons']}회, 초당 {result['comparisons_per_sec']:.1f}회")
+    if result['peak_rss_mb'] is not None:
+        print(f"최대 RSS: {result['peak_rss_mb']:.1f}MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
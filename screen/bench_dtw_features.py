@@ -0,0 +1,174 @@
+import time
+import argparse
+
+import numpy as np
+from scipy.stats import spearmanr
+
+from .dtw_engine import dtw_distance
+from .feature_space import JointAngleFeature, RelativeDistanceFeature, fit_pca, library_pca
+
+# DTW 특징 공간 벤치마크: 레퍼런스 영상 16개의 쌍별 DTW를 특징마다 계산해서 속도와 순위 유지 정도를 비교
+# 기준은 relative_distances 순위. 영상마다 나머지 영상을 거리순으로 정렬하고 특징별 순위가 기준과 얼마나 같은지
+# (1위 일치율, 상위 3개 겹침, Spearman 순위 상관) 측정
+# --synthetic: 모델 가중치 없이 관절 각도 궤적으로 만든 합성 동작 16개로 측정하고,
+#              시간 왜곡/잡음/크기·위치 변화를 준 질의로 원래 동작을 1위로 찾는 비율도 측정
+#
+# python -m screen.bench_dtw_features [--profile accurate]
+# python -m screen.bench_dtw_features --synthetic [--frames 120]
+
+# 합성 골격 (몸 길이 1 기준): 몸통, 머리, 위팔, 아래팔, 허벅지, 정강이, 어깨/골반 반폭
+SEGMENTS = {'trunk': 0.3, 'head': 0.12, 'upper_arm': 0.15, 'forearm': 0.13, 'thigh': 0.22, 'shin': 0.22,
+            'shoulder': 0.09, 'hip': 0.06}
+
+
+def _direction(theta):
+    return np.stack([np.sin(theta), np.cos(theta)], axis=-1)  # 0이면 아래(+y), pi이면 위
+
+
+# 관절 각도 궤적 angles (T, 10) -> (T, 17, 2) 좌표 (골반 중심 원점)
+# 각도: 몸통 기울기, 머리, 왼/오른 위팔, 왼/오른 팔꿈치, 왼/오른 허벅지, 왼/오른 무릎 (부모 분절 기준)
+def _skeleton(angles):
+    trunk, head, l_arm, r_arm, l_elbow, r_elbow, l_thigh, r_thigh, l_knee, r_knee = angles.T
+    trunk_theta = np.pi + trunk
+    points = np.zeros((len(angles), 17, 2))
+    mid_hip = np.zeros((len(angles), 2))
+    mid_shoulder = mid_hip + SEGMENTS['trunk'] * _direction(trunk_theta)
+    side = _direction(trunk_theta + np.pi / 2)
+    points[:, 0] = mid_shoulder + SEGMENTS['head'] * _direction(trunk_theta + head)
+    points[:, 1:5] = points[:, :1]  # 눈/귀는 코 위치
+    down = trunk_theta - np.pi
+    for sign, shoulder, elbow, wrist, arm, bend in ((1, 5, 7, 9, l_arm, l_elbow), (-1, 6, 8, 10, r_arm, r_elbow)):
+        points[:, shoulder] = mid_shoulder + sign * SEGMENTS['shoulder'] * side
+        points[:, elbow] = points[:, shoulder] + SEGMENTS['upper_arm'] * _direction(down + sign * arm)
+        points[:, wrist] = points[:, elbow] + SEGMENTS['forearm'] * _direction(down + sign * (arm + bend))
+    for sign, hip, knee, ankle, thigh, bend in ((1, 11, 13, 15, l_thigh, l_knee), (-1, 12, 14, 16, r_thigh, r_knee)):
+        points[:, hip] = mid_hip + sign * SEGMENTS['hip'] * side
+        points[:, knee] = points[:, hip] + SEGMENTS['thigh'] * _direction(down + sign * thigh)
+        points[:, ankle] = points[:, knee] + SEGMENTS['shin'] * _direction(down + sign * (thigh - bend))
+    return points
+
+
+def _to_frame(points, rng, scale=None, noise=0.0):
+    scale = scale if scale is not None else rng.uniform(0.5, 0.8)
+    offset = rng.uniform(0.3, 0.7, size=2)
+    points = points * scale + offset + rng.normal(0, noise, points.shape)
+    return points.reshape(len(points), 34).astype(np.float32)
+
+
+# 합성 동작 count개: 동작마다 각도별 기준값/진폭/위상과 반복 속도가 다름
+# rate: 같은 동작을 rate배 촘촘하게 샘플링 (길이 frames * rate, 높은 sample_fps 흉내)
+def synthetic_library(count=16, frames=120, seed=0, rate=1):
+    rng = np.random.default_rng(seed)
+    low = np.array([-1.5, -0.4, -0.3, -0.3, 0.0, 0.0, -1.2, -1.2, 0.0, 0.0])
+    high = np.array([1.5, 0.4, 2.8, 2.8, 2.0, 2.0, 1.2, 1.2, 2.0, 2.0])
+    motions = []
+    for _ in range(count):
+        base = rng.uniform(low, high)
+        amplitude = rng.uniform(0.0, 0.8, size=10)
+        phase = rng.uniform(0, 2 * np.pi, size=10)
+        frequency = rng.uniform(0.02, 0.08)  # 샘플당 반복 수
+        motions.append((base, amplitude, phase, frequency))
+
+    def render(motion, times):
+        base, amplitude, phase, frequency = motion
+        return _skeleton(base + amplitude * np.sin(2 * np.pi * frequency * times[:, None] + phase))
+
+    references = [_to_frame(render(motion, np.arange(frames * rate, dtype=np.float64) / rate), rng)
+                  for motion in motions]
+    # 질의: 속도 0.8~1.25배 + 완만한 시간 왜곡, 좌표 잡음, 다른 크기/위치
+    queries = []
+    for motion in motions:
+        length = int(frames / rng.uniform(0.8, 1.25))
+        u = np.linspace(0, 1, length * rate)
+        warped = (u + 0.05 * np.sin(2 * np.pi * u * rng.uniform(0.5, 2))) * (frames - 1)
+        queries.append(_to_frame(render(motion, np.clip(warped, 0, frames - 1)), rng, noise=0.005))
+    return references, queries
+
+
+# 모든 (질의, 후보) 쌍의 DTW 거리 행렬과 DTW 계산 시간 (같은 목록이면 대각선 제외)
+def distance_matrix(queries, candidates, symmetric=False):
+    matrix = np.full((len(queries), len(candidates)), np.inf)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        for j, candidate in enumerate(candidates):
+            if symmetric and j <= i:
+                continue
+            matrix[i, j] = dtw_distance(query, candidate)
+            if symmetric:
+                matrix[j, i] = matrix[i, j]
+    return matrix, time.perf_counter() - start
+
+
+# 기준 거리 행렬과 비교한 순위 유지 정도 (행마다 자기 자신/inf 제외)
+def ranking_agreement(baseline, matrix, top_k=3):
+    top1, overlap, rho = [], [], []
+    for expected, actual in zip(baseline, matrix):
+        valid = np.isfinite(expected)
+        expected_order = np.argsort(expected[valid])
+        actual_order = np.argsort(actual[valid])
+        top1.append(expected_order[0] == actual_order[0])
+        overlap.append(len(set(expected_order[:top_k]) & set(actual_order[:top_k])) / top_k)
+        rho.append(spearmanr(expected[valid], actual[valid])[0])
+    return float(np.mean(top1)), float(np.mean(overlap)), float(np.nanmean(rho))
+
+
+def run(sequences, extractors, queries=None):
+    """sequences(레퍼런스 키포인트 목록)로 특징별 DTW 시간/순위 유지 정도 출력, 질의가 있으면 1위 검색 정확도도 출력"""
+    report = {}
+    baseline = None
+    for name, extractor in extractors:
+        start = time.perf_counter()
+        features = [extractor(seq, dtype=np.float64) for seq in sequences]
+        query_features = [extractor(seq, dtype=np.float64) for seq in queries] if queries else None
+        extract_time = time.perf_counter() - start
+        matrix, dtw_time = distance_matrix(features, features, symmetric=True)
+        row = {'dims': features[0].shape[1], 'extract': extract_time, 'dtw': dtw_time}
+        if baseline is None:
+            baseline = matrix
+        row['top1'], row['top3'], row['spearman'] = ranking_agreement(baseline, matrix)
+        if query_features is not None:
+            retrieval, _ = distance_matrix(query_features, features)
+            row['retrieval'] = float(np.mean(np.argmin(retrieval, axis=1) == np.arange(len(queries))))
+        report[name] = row
+
+    base_time = report[extractors[0][0]]['dtw']
+    frames = sum(len(seq) for seq in sequences)
+    print(f"레퍼런스 {len(sequences)}개 ({frames}프레임), 쌍별 DTW {len(sequences) * (len(sequences) - 1) // 2}회")
+    for name, row in report.items():
+        line = (f"{name:>20} {row['dims']:4d}차원: DTW {row['dtw'] * 1000:8.1f}ms ({base_time / row['dtw']:5.1f}x), "
+                f"특징 {row['extract'] * 1000:6.1f}ms, 1위 일치 {row['top1']:.0%}, 상위3 겹침 {row['top3']:.0%}, "
+                f"Spearman {row['spearman']:.3f}")
+        if 'retrieval' in row:
+            line += f", 질의 1위 정확도 {row['retrieval']:.0%}"
+        print(line)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='DTW 특징 공간별 속도와 레퍼런스 순위 유지 정도 비교')
+    parser.add_argument('--synthetic', action='store_true', help='합성 동작 16개 사용 (모델 가중치 불필요)')
+    parser.add_argument('--frames', type=int, default=120, help='합성 동작 길이 (샘플 수)')
+    parser.add_argument('--profile', help='레퍼런스 저장소 프로필 (기본: HH_PROFILE)')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        references, queries = synthetic_library(frames=args.frames)
+        pca = fit_pca(references)
+    else:
+        import glob
+        import os
+
+        from .profiles import base_profile, get_profile, load_profile_model, model_key
+        from .reference_store import REFERENCE_VIDEO_DIR, load_reference_keypoints
+        from .tracking import TRACK_SUBJECT
+
+        profile = get_profile(args.profile) if args.profile else base_profile()
+        model = load_profile_model(profile)
+        references = [load_reference_keypoints(path, model, model_key(profile), track_subject=TRACK_SUBJECT,
+                                               imgsz=profile.imgsz)
+                      for path in sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))]
+        queries = None
+        pca = library_pca(profile, model)
+    print(f"PCA {pca.dims}성분 설명 분산 {np.sum(pca.explained):.1%}")
+    run(references, [('relative_distances', RelativeDistanceFeature()), ('joint_angles', JointAngleFeature()),
+                     ('pca', pca)], queries)
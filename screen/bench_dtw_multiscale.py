@@ -0,0 +1,119 @@
+import time
+import argparse
+import itertools
+
+import numpy as np
+
+from .bench_dtw_features import ranking_agreement, synthetic_library
+from .dtw_engine import MULTISCALE_MIN_CELLS, MULTISCALE_RADIUS, default_window, dtw_distance, multiscale_dtw
+from .feature_space import FEATURE_TYPES, fit_pca, get_feature_extractor
+from .sampling import resample_keypoints
+
+# coarse-to-fine(multiscale) DTW의 exact 대비 근사 오차와 속도 벤치마크
+# 기본: src/mp4 레퍼런스 영상을 --sample-fps(기본 10)로 추출한 키포인트로
+#   1) 영상 쌍별 DTW를 exact와 multiscale(MULTISCALE_MIN_CELLS와 무관하게 강제)로 계산해서 상대 오차/순위/시간 비교
+#   2) 영상을 모두 이어 붙인 몇 분짜리 시퀀스와, 같은 순서로 영상마다 속도(0.8~1.25배)를 바꿔 이어 붙인 시퀀스를
+#      비교해서 긴 루틴을 따라 한 경우의 속도/오차 측정
+# --synthetic: 모델 가중치 없이 합성 동작을 --rate배 촘촘하게 샘플링해서 측정
+# 윈도우는 둘 다 dtw_distance 기본값(default_window)
+#
+# python -m screen.bench_dtw_multiscale [--sample-fps 10] [--radius 5 10 20]
+# python -m screen.bench_dtw_multiscale --synthetic --rate 10
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+# (a, b) 특징 시퀀스 쌍마다 exact / multiscale 거리와 시간
+def compare(pairs, radius):
+    rows = []
+    for a, b in pairs:
+        window = default_window(len(a), len(b))
+        exact, exact_time = _timed(dtw_distance, a, b, window, method='exact')
+        approx, approx_time = _timed(multiscale_dtw, a, b, window, radius=radius, min_cells=0)
+        rows.append({'cells': len(a) * len(b), 'exact': exact, 'approx': approx,
+                     'exact_time': exact_time, 'approx_time': approx_time})
+    return rows
+
+
+def summarize(label, rows):
+    exact = np.array([row['exact'] for row in rows])
+    approx = np.array([row['approx'] for row in rows])
+    error = (approx - exact) / np.where(exact > 0, exact, 1.0)
+    exact_time = sum(row['exact_time'] for row in rows)
+    approx_time = sum(row['approx_time'] for row in rows)
+    print(f"{label}: {len(rows)}쌍, 평균 {np.mean([row['cells'] for row in rows]):,.0f}칸 | "
+          f"상대 오차 평균 {np.mean(error):.2%} 중앙값 {np.median(error):.2%} 최대 {np.max(error):.2%} | "
+          f"exact {exact_time * 1000:.0f}ms, multiscale {approx_time * 1000:.0f}ms ({exact_time / approx_time:.1f}x)",
+          flush=True)
+    return error
+
+
+# 시퀀스마다 속도를 0.8~1.25배로 바꿔 (선형 보간) 같은 순서로 이어 붙임
+def _warped_routine(features, rng):
+    parts = []
+    for seq in features:
+        length = max(2, int(round(len(seq) / rng.uniform(0.8, 1.25))))
+        parts.append(resample_keypoints(seq, np.arange(len(seq)), np.linspace(0, len(seq) - 1, length)))
+    return np.concatenate(parts).astype(np.float64)
+
+
+# 쌍별 비교 결과로 만든 대칭 거리 행렬 (대각선 inf)
+def _matrix(rows, count, key):
+    matrix = np.full((count, count), np.inf)
+    for (i, j), row in zip(itertools.combinations(range(count), 2), rows):
+        matrix[i, j] = matrix[j, i] = row[key]
+    return matrix
+
+
+def run(sequences, extractor, radii=(MULTISCALE_RADIUS,), routines=3, seed=0):
+    """sequences(키포인트 목록)의 쌍별 비교와 이어 붙인 긴 시퀀스 비교를 반경마다 출력"""
+    features = [extractor(seq, dtype=np.float64) for seq in sequences]
+    pairs = list(itertools.combinations(features, 2))
+    rng = np.random.default_rng(seed)
+    routine = np.concatenate(features)
+    long_pairs = [(routine, _warped_routine(features, rng)) for _ in range(routines)]
+
+    print(f"시퀀스 {len(features)}개 (길이 {min(map(len, features))}~{max(map(len, features))}, "
+          f"{features[0].shape[1]}차원), 이어 붙인 길이 {len(routine)}, "
+          f"자동 전환 기준 {MULTISCALE_MIN_CELLS:,}칸", flush=True)
+    for radius in radii:
+        rows = compare(pairs, radius)
+        summarize(f"radius {radius:3d} 쌍별", rows)
+        top1, top3, rho = ranking_agreement(_matrix(rows, len(features), 'exact'),
+                                            _matrix(rows, len(features), 'approx'))
+        print(f"{'':>18}순위 유지: 1위 일치 {top1:.0%}, 상위3 겹침 {top3:.0%}, Spearman {rho:.3f}")
+        summarize(f"radius {radius:3d} 긴 시퀀스", compare(long_pairs, radius))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='multiscale DTW의 exact 대비 오차와 속도 비교')
+    parser.add_argument('--synthetic', action='store_true', help='합성 동작 16개 사용 (모델 가중치 불필요)')
+    parser.add_argument('--rate', type=int, default=10, help='합성 동작 샘플링 배율 (120샘플 x rate)')
+    parser.add_argument('--sample-fps', type=float, default=10.0, help='레퍼런스 영상 추출 fps')
+    parser.add_argument('--radius', type=int, nargs='+', default=[MULTISCALE_RADIUS])
+    parser.add_argument('--feature', choices=FEATURE_TYPES, default='relative_distances')
+    parser.add_argument('--profile', help='레퍼런스 저장소 프로필 (기본: HH_PROFILE)')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        sequences, _ = synthetic_library(rate=args.rate)
+        extractor = fit_pca(sequences) if args.feature == 'pca' else get_feature_extractor(args.feature)
+    else:
+        import glob
+        import os
+
+        from .profiles import base_profile, get_profile, load_profile_model, model_key
+        from .reference_store import REFERENCE_VIDEO_DIR, load_reference_keypoints
+        from .tracking import TRACK_SUBJECT
+
+        profile = get_profile(args.profile) if args.profile else base_profile()
+        model = load_profile_model(profile)
+        sequences = [load_reference_keypoints(path, model, model_key(profile), sample_fps=args.sample_fps,
+                                              track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+                     for path in sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))]
+        extractor = get_feature_extractor(args.feature, profile, model)
+    run(sequences, extractor, args.radius)
@@ -0,0 +1,146 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from .features import PAIR_I, PAIR_J, calculate_relative_distances, normalize_keypoints, smooth_keypoints
+from .keypoints import SAMPLE_FPS
+from .sequence import KeypointSequence
+
+# 포즈 특징 계산 마이크로벤치마크: 기존 파이썬 반복문 구현과 결과/속도 비교
+# 추출 결과 저장 -> 스무딩 -> DTW 입력 특징까지의 분석 1분당 최대 메모리도 기존 방식과 비교
+# python -m screen.bench_features [프레임 수] [분석 영상 길이(분)]
+
+
+# 기존 구현 (main.py page2 / DTWtest.py에 있던 코드)
+def _normalize_loop(keypoints, frame_width, frame_height):
+    normalized_keypoints = np.copy(keypoints)
+    for i in range(0, len(keypoints), 2):
+        normalized_keypoints[i] = keypoints[i] / frame_width  # x 좌표
+        normalized_keypoints[i + 1] = keypoints[i + 1] / frame_height  # y 좌표
+    return normalized_keypoints
+
+
+def _relative_distances_loop(keypoints):
+    num_keypoints = len(keypoints) // 2
+    relative_distances = []
+    for i in range(num_keypoints):
+        for j in range(i + 1, num_keypoints):
+            x1, y1 = keypoints[2 * i], keypoints[2 * i + 1]
+            x2, y2 = keypoints[2 * j], keypoints[2 * j + 1]
+            relative_distances.append(np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2))
+    return np.array(relative_distances)
+
+
+def _smooth_loop(sequence, window_size=3):
+    smoothed_sequence = []
+    for i in range(sequence.shape[1]):
+        smoothed_sequence.append(np.convolve(sequence[:, i], np.ones(window_size)/window_size, mode='valid'))
+    return np.array(smoothed_sequence).T
+
+
+# 기존 구현: 프레임마다 (34,) 배열을 리스트에 쌓고, 특징은 전체 시퀀스를 한 번에 float32로 계산한 뒤
+# DTW 입력으로 float64 복사본을 만듦
+def _legacy_dtw_input(frames, timestamps):
+    keypoints_sequence = []
+    timestamp_list = []
+    for frame, timestamp in zip(frames, timestamps):
+        keypoints_sequence.append(frame[:, :2].reshape(-1))
+        timestamp_list.append(timestamp)
+    keypoints_sequence = np.array(keypoints_sequence)
+    timestamp_list = np.array(timestamp_list)
+    keypoints_sequence = smooth_keypoints(keypoints_sequence)
+    timestamp_list = smooth_keypoints(timestamp_list[:, None])[:, 0]
+    points = keypoints_sequence.reshape(len(keypoints_sequence), -1, 2)
+    diff = points[:, PAIR_I] - points[:, PAIR_J]
+    distances = np.sqrt(np.einsum('tpk,tpk->tp', diff, diff))
+    return np.ascontiguousarray(distances, dtype=np.float64)
+
+
+# 현재 구현: KeypointSequence 버퍼에 기록하고, 특징은 청크 단위로 float64 DTW 입력에 바로 기록
+def _sequence_dtw_input(frames, timestamps):
+    sequence = KeypointSequence(len(frames))  # 추출 단계처럼 예상 샘플 수로 미리 할당
+    for frame, timestamp in zip(frames, timestamps):
+        sequence.append(frame, timestamp)
+    sequence = sequence.smoothed()
+    return calculate_relative_distances(sequence, dtype=np.float64)
+
+
+def _peak_memory(fn, *args):
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+# 분석 영상 minutes분 (SAMPLE_FPS 샘플) 하나를 DTW 입력까지 만드는 동안의 최대 메모리 (bytes / 분)
+def memory(minutes=60, sample_fps=SAMPLE_FPS, seed=0):
+    num_frames = int(minutes * 60 * sample_fps)
+    rng = np.random.default_rng(seed)
+    frames = rng.random((num_frames, 17, 3)).astype(np.float32)
+    timestamps = np.arange(num_frames) / float(sample_fps)
+
+    legacy_peak, legacy = _peak_memory(_legacy_dtw_input, frames, timestamps)
+    current_peak, current = _peak_memory(_sequence_dtw_input, frames, timestamps)
+    np.testing.assert_array_equal(current, legacy)
+    print(f"분석 {minutes}분 ({num_frames}프레임), 분당 최대 메모리: "
+          f"{legacy_peak / minutes / 1024:.1f}KB -> {current_peak / minutes / 1024:.1f}KB "
+          f"({current_peak / legacy_peak:.0%}, DTW 입력 결과 동일)")
+    return legacy_peak / minutes, current_peak / minutes
+
+
+def _best_time(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(num_frames=300, frame_width=1920, frame_height=1080, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = (rng.random((num_frames, 17, 2)) * [frame_width, frame_height]).astype(np.float32)
+    raw = raw.reshape(num_frames, 34)
+
+    # 결과 동일성 확인 (float32 계산이므로 상대 오차 1e-5 이내)
+    legacy_norm = np.array([_normalize_loop(frame, frame_width, frame_height) for frame in raw])
+    fast_norm = normalize_keypoints(raw, frame_width, frame_height)
+    np.testing.assert_allclose(fast_norm, legacy_norm, rtol=1e-5, atol=1e-6)
+
+    legacy_smooth = _smooth_loop(legacy_norm.astype(np.float64))
+    fast_smooth = smooth_keypoints(fast_norm)
+    np.testing.assert_allclose(fast_smooth, legacy_smooth, rtol=1e-5, atol=1e-6)
+
+    legacy_dist = np.array([_relative_distances_loop(frame) for frame in legacy_smooth])
+    fast_dist = calculate_relative_distances(fast_smooth)
+    np.testing.assert_allclose(fast_dist, legacy_dist, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(calculate_relative_distances(fast_smooth[0]), legacy_dist[0], rtol=1e-5, atol=1e-6)
+
+    timings = {
+        'normalize': (
+            _best_time(lambda: [_normalize_loop(frame, frame_width, frame_height) for frame in raw]),
+            _best_time(lambda: normalize_keypoints(raw, frame_width, frame_height)),
+        ),
+        'relative_distances': (
+            _best_time(lambda: [_relative_distances_loop(frame) for frame in legacy_smooth], repeat=2),
+            _best_time(lambda: calculate_relative_distances(fast_smooth)),
+        ),
+        'smooth': (
+            _best_time(lambda: _smooth_loop(legacy_norm)),
+            _best_time(lambda: smooth_keypoints(fast_norm)),
+        ),
+    }
+    print(f"프레임 수: {num_frames} (결과 일치 확인 완료)")
+    for name, (legacy, fast) in timings.items():
+        print(f"{name:>20}: {legacy * 1000:9.2f}ms -> {fast * 1000:7.3f}ms ({legacy / fast:7.1f}x)")
+    return timings
+
+
+if __name__ == '__main__':
+    import sys
+
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
+    memory(float(sys.argv[2]) if len(sys.argv) > 2 else 60)
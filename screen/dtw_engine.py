@@ -0,0 +1,352 @@
+import os
+import math
+
+import numpy as np
+from dtaidistance import dtw, dtw_ndim
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+from .features import calculate_relative_distances
+from .metrics import incr, span
+
+# (T, D) 특징 시퀀스 전체에 대한 다변량 DTW
+# dtaidistance dtw_ndim의 C 구현을 사용하고, Sakoe-Chiba 윈도우 / 하한(LB_Kim, LB_Keogh) / 조기 중단을 지원
+# 거리 정의는 dtaidistance와 동일: sqrt(정렬 경로 위 프레임 간 제곱 유클리드 거리의 합)
+#
+# multiscale: 초당 여러 프레임으로 샘플링한 몇 분짜리 영상은 O(N·M) 전체 계산이 병목이므로
+# 인접 프레임을 평균해서 길이를 절반씩 줄인 피라미드를 만들고, 가장 거친 단계에서 정확한 경로를 구한 뒤
+# 한 단계씩 내려오면서 경로 주변 ±radius 칸 안에서만 다시 계산 (단계마다 O(N·radius))
+# 범위가 exact 윈도우의 일부이므로 거리는 exact 이상 (오차는 python -m screen.bench_dtw_multiscale로 측정)
+
+WINDOW_RATIO = 0.1  # 기본 윈도우: 긴 쪽 시퀀스 길이의 10%
+MIN_WINDOW = 3
+MAX_PATH_CELLS = 4_000_000  # 경로 반환 시 전체 누적 행렬 크기 제한 (float64 기준 약 32MB)
+DTW_METHODS = ('exact', 'multiscale')
+DTW_METHOD = os.environ.get('HH_DTW_METHOD', 'exact')
+MULTISCALE_RADIUS = int(os.environ.get('HH_DTW_RADIUS', 10))  # 단계마다 투영한 경로 주변으로 넓히는 칸 수
+# 셀 수(N·M)가 이 값 이하면 exact로 계산 (136차원 특징 기준 약 1400x1400까지는 dtaidistance C 구현이 더 빠름)
+MULTISCALE_MIN_CELLS = int(os.environ.get('HH_DTW_MIN_CELLS', 2_000_000))
+COARSEST_FRAMES = 64  # 피라미드를 이 길이까지 줄인 단계에서 윈도우 전체로 시작
+BAND_BLOCK_ROWS = 32  # 칸별 비용을 행렬 곱 한 번으로 계산하는 행 수
+
+
+def _as_sequence(seq):
+    seq = np.asarray(seq, dtype=np.float64)
+    if seq.size == 0:
+        return seq.reshape(0, 1)
+    if seq.ndim == 1:
+        seq = seq[:, None]
+    return np.ascontiguousarray(seq.reshape(len(seq), -1))
+
+
+# 시퀀스 길이에 맞춘 기본 Sakoe-Chiba 윈도우 크기
+def default_window(len1, len2, ratio=WINDOW_RATIO):
+    return max(MIN_WINDOW, int(math.ceil(ratio * max(len1, len2))))
+
+
+# LB_Kim: 모든 정렬 경로는 첫 프레임 쌍과 마지막 프레임 쌍을 반드시 지나감
+def lb_kim(seq1, seq2):
+    seq1, seq2 = _as_sequence(seq1), _as_sequence(seq2)
+    first = np.sum((seq1[0] - seq2[0]) ** 2)
+    if len(seq1) == 1 and len(seq2) == 1:
+        return float(np.sqrt(first))
+    last = np.sum((seq1[-1] - seq2[-1]) ** 2)
+    return float(np.sqrt(first + last))
+
+
+# seq의 Sakoe-Chiba 상한/하한 envelope, length 길이의 상대 시퀀스에 맞춰 (length, D)로 반환
+def envelope(seq, window, length=None):
+    seq = _as_sequence(seq)
+    length = len(seq) if length is None else length
+    # dtaidistance 윈도우는 |i - j| < window + |길이 차| 이므로 그만큼 넓혀서 하한이 항상 성립하도록 함
+    radius = (window if window else max(len(seq), length)) + abs(len(seq) - length)
+    if radius >= max(len(seq), length):
+        upper = np.broadcast_to(seq.max(axis=0), (length, seq.shape[1]))
+        lower = np.broadcast_to(seq.min(axis=0), (length, seq.shape[1]))
+        return upper, lower
+
+    padded = np.pad(seq, ((radius, radius + max(0, length - len(seq))), (0, 0)), mode='edge')
+    size = 2 * radius + 1
+    upper = maximum_filter1d(padded, size, axis=0)[radius:radius + length]
+    lower = minimum_filter1d(padded, size, axis=0)[radius:radius + length]
+    return upper, lower
+
+
+# LB_Keogh: query의 각 프레임이 candidate envelope 바깥으로 벗어난 만큼의 거리
+def lb_keogh(query, candidate, window=None, candidate_envelope=None):
+    query = _as_sequence(query)
+    if candidate_envelope is None:
+        candidate_envelope = envelope(candidate, window, len(query))
+    upper, lower = candidate_envelope
+    excess = np.maximum(query - upper, 0) + np.maximum(lower - query, 0)
+    return float(np.sqrt(np.sum(excess ** 2)))
+
+
+# 인접한 두 프레임 평균으로 길이를 절반으로 줄임 (홀수면 마지막 프레임은 그대로)
+def _downsample(seq):
+    half = len(seq) // 2
+    coarse = (seq[0:2 * half:2] + seq[1:2 * half:2]) / 2
+    if len(seq) % 2:
+        coarse = np.concatenate([coarse, seq[-1:]])
+    return np.ascontiguousarray(coarse)
+
+
+# dtaidistance 윈도우와 같은 행별 열 범위 [lo, hi) (window가 None이면 전체)
+def _window_band(len1, len2, window):
+    rows = np.arange(len1)
+    if not window:
+        return np.zeros(len1, dtype=np.int64), np.full(len1, len2, dtype=np.int64)
+    lo = np.maximum(0, rows - max(0, len1 - len2) - window + 1)
+    hi = np.minimum(len2, rows + max(0, len2 - len1) + window)
+    return lo, hi
+
+
+# 절반 길이 단계의 경로를 (len1, len2) 단계로 투영하고 앞뒤 radius 행/열만큼 넓힌 행별 범위 [lo, hi)
+def _project_band(path, len1, len2, radius):
+    rows, cols = path[:, 0], path[:, 1]
+    coarse_lo = np.full(rows[-1] + 1, len2, dtype=np.int64)
+    coarse_hi = np.zeros(rows[-1] + 1, dtype=np.int64)
+    np.minimum.at(coarse_lo, rows, cols)
+    np.maximum.at(coarse_hi, rows, cols)
+    fine_rows = np.arange(len1) // 2
+    lo, hi = 2 * coarse_lo[fine_rows], 2 * coarse_hi[fine_rows] + 2
+    if radius:
+        lo = minimum_filter1d(lo, 2 * radius + 1, mode='nearest') - radius
+        hi = maximum_filter1d(hi, 2 * radius + 1, mode='nearest') + radius
+    return np.clip(lo, 0, len2), np.clip(hi, 0, len2)
+
+
+# 행 i마다 열 [lo[i], hi[i]) 안에서만 누적 행렬 계산 (밖은 inf)
+# 칸별 비용은 BAND_BLOCK_ROWS행씩 범위를 덮는 직사각형을 |x|² + |y|² - 2x·y 행렬 곱으로 한 번에 계산하고
+# 행별 누적합도 (N, 최대 폭) 배열로 미리 구해서, 행 루프에서는 점화식만 계산
+# (0, 0)에서 (끝, 끝)까지 이어지지 않는 범위면 None, 누적 거리가 max_sq를 넘으면 inf
+# 반환: (제곱 거리, 누적 행렬 (N, 최대 폭), 행 i의 k번째 칸 = 열 lo[i] + k)
+def _band_dtw(seq1, seq2, lo, hi, max_sq=np.inf):
+    if lo[0] != 0 or hi[-1] != len(seq2) or np.any(lo >= hi) or np.any(lo[1:] > hi[:-1]):
+        return None, None
+    widths = hi - lo
+    width = int(widths.max())
+    offsets = np.arange(width)
+    norms1, norms2 = np.einsum('ij,ij->i', seq1, seq1), np.einsum('ij,ij->i', seq2, seq2)
+    cumulative = np.empty((len(seq1), width))
+    preceding = np.empty((len(seq1), width))  # 누적합에서 자기 칸 비용을 뺀 값
+    for start in range(0, len(seq1), BAND_BLOCK_ROWS):
+        rows = slice(start, start + BAND_BLOCK_ROWS)
+        first, last = lo[start], hi[rows][-1]  # 범위가 단조 증가하므로 블록 전체의 열 범위
+        block = norms1[rows, None] + norms2[first:last] - 2 * seq1[rows] @ seq2[first:last].T
+        np.maximum(block, 0.0, out=block)
+        cols = np.minimum(lo[rows, None] + offsets, hi[rows, None] - 1) - first  # 폭 밖의 칸은 쓰지 않음
+        cost = np.take_along_axis(block, cols, axis=1)
+        np.cumsum(cost, axis=1, out=cumulative[rows])
+        np.subtract(cumulative[rows], cost, out=preceding[rows])
+
+    # OpenEndDTW.update와 같은 누적합 전개: D[j] = S[j] + min_{k <= j}(min(D[i-1, k], D[i-1, k-1]) - S[k-1])
+    # (행 루프는 파이썬 정수와 행 view 목록으로 돌려서 numpy 스칼라 인덱싱 비용을 줄임)
+    matrix = np.full((len(seq1), width), np.inf)
+    previous = np.full(width + 1, np.inf)  # 직전 행의 열 [a - 1, a + w)
+    vertical = np.empty(width)
+    lo_list, hi_list = lo.tolist(), hi.tolist()
+    prev_lo = prev_hi = 0
+    prev_row = None
+    for i, (row, total, before) in enumerate(zip(matrix, cumulative, preceding)):
+        a, b = lo_list[i], hi_list[i]
+        w = b - a
+        if i:
+            first, last = max(a - 1, prev_lo), min(b, prev_hi)
+            previous[0] = np.inf
+            previous[first - a + 1:last - a + 1] = prev_row[first - prev_lo:last - prev_lo]
+            previous[last - a + 1:w + 1] = np.inf
+            np.minimum(previous[1:w + 1], previous[:w], out=vertical[:w])
+        else:
+            vertical[:w] = np.inf
+            vertical[0] = 0.0
+        row = row[:w]
+        np.subtract(vertical[:w], before[:w], out=row)
+        np.minimum.accumulate(row, out=row)
+        row += total[:w]
+        if max_sq < np.inf and row.min() > max_sq:
+            return np.inf, None
+        prev_lo, prev_hi, prev_row = a, b, row
+    return float(matrix[-1, widths[-1] - 1]), matrix
+
+
+# _band_dtw 누적 행렬에서 (끝, 끝) -> (0, 0) 역추적한 경로 (K, 2)
+def _band_path(matrix, lo, hi):
+    def value(i, j):
+        return matrix[i, j - lo[i]] if lo[i] <= j < hi[i] else np.inf
+
+    i, j = len(matrix) - 1, hi[-1] - 1
+    path = [(i, j)]
+    while i > 0 or j > 0:
+        if i == 0:
+            j -= 1
+        elif j == 0:
+            i -= 1
+        else:
+            steps = ((i - 1, j - 1), (i - 1, j), (i, j - 1))
+            i, j = min(steps, key=lambda step: value(*step))
+        path.append((i, j))
+    return np.array(path[::-1])
+
+
+# 재귀 coarse-to-fine: (제곱 거리, 경로 (K, 2)), 윈도우와 투영 범위가 이어지지 않으면 None
+# 가장 거친 단계는 윈도우 전체를 같은 방식으로 계산 (dtaidistance의 경로 계산은 파이썬 구현이라 느림)
+def _multiscale(seq1, seq2, window, radius, max_sq=np.inf, keep_path=True):
+    lo, hi = _window_band(len(seq1), len(seq2), window)
+    if min(len(seq1), len(seq2)) > max(COARSEST_FRAMES, 2 * (radius + 1)):
+        coarse_window = window // 2 + 1 if window else None
+        coarse = _multiscale(_downsample(seq1), _downsample(seq2), coarse_window, radius)
+        if coarse is None:
+            return None
+        coarse_lo, coarse_hi = _project_band(coarse[1], len(seq1), len(seq2), radius)
+        lo, hi = np.maximum(lo, coarse_lo), np.minimum(hi, coarse_hi)
+    squared, matrix = _band_dtw(seq1, seq2, lo, hi, max_sq)
+    if squared is None:
+        return None
+    return squared, (_band_path(matrix, lo, hi) if keep_path and np.isfinite(squared) else None)
+
+
+def multiscale_dtw(seq1, seq2, window=None, radius=MULTISCALE_RADIUS, min_cells=MULTISCALE_MIN_CELLS, cutoff=None,
+                   return_path=False):
+    """
+    coarse-to-fine 근사 DTW (거리 정의와 window 의미는 dtw_distance와 같음, window=None이면 제한 없음).
+    N·M이 min_cells 이하이면 exact와 같은 값. 투영한 경로가 window 밖으로 벗어나 범위가 끊기면 exact로 다시 계산.
+    """
+    seq1, seq2 = _as_sequence(seq1), _as_sequence(seq2)
+    if len(seq1) * len(seq2) <= min_cells:
+        return dtw_distance(seq1, seq2, window or 0, cutoff, return_path, use_lower_bounds=False, method='exact')
+
+    max_sq = cutoff ** 2 if cutoff is not None else np.inf
+    result = _multiscale(seq1, seq2, window, radius, max_sq, keep_path=return_path)
+    if result is None:
+        incr('dtw.multiscale_fallback')
+        return dtw_distance(seq1, seq2, window or 0, cutoff, return_path, use_lower_bounds=False, method='exact')
+    squared, path = result
+    distance = float(np.sqrt(squared))
+    if cutoff is not None and distance > cutoff:
+        distance, path = np.inf, None
+    if not return_path:
+        return distance
+    return (distance, [tuple(step) for step in path.tolist()]) if np.isfinite(distance) else (np.inf, [])
+
+
+# 결과 캐시 키에 넣을 DTW 설정 (exact는 기존 키와 같도록 빈 dict)
+def dtw_params(method=None):
+    method = method or DTW_METHOD
+    if method == 'exact':
+        return {}
+    return {'dtw': method, 'radius': MULTISCALE_RADIUS, 'min_cells': MULTISCALE_MIN_CELLS}
+
+
+def dtw_distance(seq1, seq2, window=None, cutoff=None, return_path=False, use_lower_bounds=True, method=None):
+    """
+    두 (T, D) 시퀀스의 다변량 DTW 거리.
+    window: Sakoe-Chiba 윈도우 크기 (None이면 default_window, 0이면 제한 없음)
+    cutoff: 이 값을 넘으면 계산을 조기 중단하고 inf 반환 (하한으로 먼저 걸러냄)
+    return_path=True이면 (거리, 정렬 경로)를 반환
+    method: 'exact' 또는 'multiscale' (None이면 DTW_METHOD, multiscale도 MULTISCALE_MIN_CELLS 이하는 exact)
+    """
+    method = method or DTW_METHOD
+    if method not in DTW_METHODS:
+        raise ValueError(f"알 수 없는 DTW 방식: {method} (가능한 값: {', '.join(DTW_METHODS)})")
+    seq1, seq2 = _as_sequence(seq1), _as_sequence(seq2)
+    if len(seq1) == 0 or len(seq2) == 0 or np.isnan(seq1).any() or np.isnan(seq2).any():
+        return (np.inf, []) if return_path else np.inf
+
+    if window is None:
+        window = default_window(len(seq1), len(seq2))
+    window = window or None  # dtaidistance는 None을 윈도우 없음으로 처리
+
+    if cutoff is not None and use_lower_bounds:
+        if lb_kim(seq1, seq2) > cutoff or lb_keogh(seq1, seq2, window) > cutoff:
+            return (np.inf, []) if return_path else np.inf
+
+    if method == 'multiscale' and len(seq1) * len(seq2) > MULTISCALE_MIN_CELLS:
+        return multiscale_dtw(seq1, seq2, window, cutoff=cutoff, return_path=return_path)
+
+    if not return_path:
+        return dtw_ndim.distance(seq1, seq2, window=window, max_dist=cutoff, use_c=True)
+
+    # 경로 계산은 전체 누적 행렬이 필요하므로 크기를 제한
+    if len(seq1) * len(seq2) > MAX_PATH_CELLS:
+        raise ValueError(f"정렬 경로를 구하기에는 시퀀스가 너무 깁니다: {len(seq1)} x {len(seq2)}")
+    distance, paths = dtw_ndim.warping_paths(seq1, seq2, window=window, max_dist=cutoff)
+    if not np.isfinite(distance):
+        return np.inf, []
+    return distance, dtw.best_path(paths)
+
+
+# 두 키포인트 시퀀스 간의 DTW 거리 계산 (기본은 상대적 거리 기반)
+# feature: feature_space의 특징 추출기 (None이면 relative_distances), method: dtw_distance 참고
+# aspects: (seq1, seq2) 원본 영상의 가로/세로 비율 (feature에 그대로 넘김, None이면 보정 없음)
+def calculate_dtw_distance(seq1, seq2, window=None, cutoff=None, feature=None, method=None, aspects=None):
+    name = getattr(feature, 'name', 'relative_distances')
+    with span(f'features.{name}', frames=len(seq1) + len(seq2)):
+        if feature is None:
+            seq1_features = calculate_relative_distances(seq1, dtype=np.float64)
+            seq2_features = calculate_relative_distances(seq2, dtype=np.float64)
+        else:
+            aspect1, aspect2 = aspects or (None, None)
+            seq1_features = feature(seq1, dtype=np.float64, aspect=aspect1)
+            seq2_features = feature(seq2, dtype=np.float64, aspect=aspect2)
+    with span('dtw', cells=len(seq1_features) * len(seq2_features), dims=seq1_features.shape[1],
+              method=method or DTW_METHOD):
+        return dtw_distance(seq1_features, seq2_features, window=window, cutoff=cutoff, method=method)
+
+
+class OpenEndDTW:
+    """
+    query를 한 프레임씩 추가하면서 reference (M, D) 전체와의 누적 행렬을 한 행씩 갱신하는 open-end DTW.
+    지금까지 들어온 query는 reference의 앞부분(따라 한 구간)과만 정렬하면 되므로 distance = sqrt(min_j D[i, j]).
+    band: 직전 행에서 가장 잘 맞는 위치 ± band 안의 칸만 계산 (프레임당 O(band * D), None이면 default_window)
+    """
+
+    def __init__(self, reference, band=None):
+        self.reference = _as_sequence(reference)
+        self.band = band if band is not None else default_window(len(self.reference), len(self.reference))
+        self.frames = 0
+        self.lo = 0  # self.values[k] = D[i, lo + k], 범위 밖은 inf
+        self.values = np.zeros(0)
+
+    def update(self, frame):
+        frame = np.asarray(frame, dtype=np.float64).reshape(-1)
+        length = len(self.reference)
+        if self.frames == 0:
+            lo, hi = 0, min(length, self.band + 1)
+            previous = np.full(hi - lo + 1, np.inf)
+        else:
+            center = self.position
+            lo, hi = max(0, center - self.band), min(length, center + self.band + 1)
+            # 직전 행의 [lo - 1, hi) 구간 (band 밖은 inf)
+            previous = np.full(hi - lo + 1, np.inf)
+            start, stop = max(lo - 1, self.lo), min(hi, self.lo + len(self.values))
+            if start < stop:
+                previous[start - lo + 1:stop - lo + 1] = self.values[start - self.lo:stop - self.lo]
+
+        cost = np.sum((self.reference[lo:hi] - frame) ** 2, axis=1)
+        # D[j] = cost[j] + min(D[i-1, j], D[i-1, j-1], D[i, j-1])
+        #      = S[j] + min_{k <= j}(min(D[i-1, k], D[i-1, k-1]) - S[k-1]),  S = cost의 누적합
+        vertical = np.minimum(previous[1:], previous[:-1])
+        if self.frames == 0:
+            vertical[0] = 0.0  # 정렬은 (0, 0)에서 시작
+        cumulative = np.cumsum(cost)
+        self.values = cumulative + np.minimum.accumulate(vertical - (cumulative - cost))
+        self.lo = lo
+        self.frames += 1
+        return self.distance
+
+    # 지금까지 따라 한 구간과 가장 잘 맞는 reference 위치
+    @property
+    def position(self):
+        return self.lo + int(np.argmin(self.values)) if self.frames else 0
+
+    @property
+    def distance(self):
+        return float(np.sqrt(self.values.min())) if self.frames else np.inf
+
+    # reference 끝까지 정렬했을 때의 거리 (dtw_distance와 같은 정의, 마지막 위치가 band 밖이면 inf)
+    @property
+    def closed_distance(self):
+        last = len(self.reference) - 1
+        if not self.frames or not self.lo <= last < self.lo + len(self.values):
+            return np.inf
+        return float(np.sqrt(self.values[last - self.lo]))
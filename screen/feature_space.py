@@ -0,0 +1,196 @@
+import os
+import json
+import glob
+import hashlib
+
+import numpy as np
+
+from .features import PAIR_I, as_points, calculate_relative_distances
+
+# DTW 입력 특징 공간 (비교마다 선택, 결과 캐시 키에 포함)
+# relative_distances: 모든 keypoint 쌍 사이 거리 136차원 (기존 방식)
+# joint_angles: 관절 각도 12개 (라디안, 크기/위치에 무관, aspect로 x축을 보정해 가로세로 같은 단위로 계산)
+# pca: 레퍼런스 라이브러리 전체의 relative_distances로 학습한 주성분 PCA_COMPONENTS개로 투영
+# DTW 한 칸의 비용은 차원 수에 비례하므로 136 -> 12차원이면 거리 계산이 그만큼 줄어듦
+# (특징 공간마다 거리 크기가 다르므로 거리 값은 같은 특징끼리만 비교)
+# 특징 추출기는 extractor(keypoints, dtype, aspect)로 호출 (aspect: 원본 영상의 가로/세로 비율, 모르면 None)
+
+FEATURE_TYPES = ('relative_distances', 'joint_angles', 'pca')
+DEFAULT_FEATURE = os.environ.get('HH_FEATURE', 'relative_distances')
+PCA_COMPONENTS = int(os.environ.get('HH_PCA_COMPONENTS', 12))
+PROJECTION_CHUNK = 256  # PCA 투영 시 136차원 중간 결과를 만드는 프레임 수
+
+# COCO keypoint 번호
+NOSE = 0
+L_SHOULDER, R_SHOULDER, L_ELBOW, R_ELBOW, L_WRIST, R_WRIST = 5, 6, 7, 8, 9, 10
+L_HIP, R_HIP, L_KNEE, R_KNEE, L_ANKLE, R_ANKLE = 11, 12, 13, 14, 15, 16
+
+# (끝점, 꼭짓점, 끝점) 관절 각도
+ANGLE_TRIPLETS = (
+    (L_SHOULDER, L_ELBOW, L_WRIST),  # 왼쪽 팔꿈치
+    (R_SHOULDER, R_ELBOW, R_WRIST),  # 오른쪽 팔꿈치
+    (L_ELBOW, L_SHOULDER, L_HIP),  # 왼쪽 어깨 (위팔-몸통)
+    (R_ELBOW, R_SHOULDER, R_HIP),  # 오른쪽 어깨
+    (L_SHOULDER, L_HIP, L_KNEE),  # 왼쪽 고관절 (몸통-허벅지)
+    (R_SHOULDER, R_HIP, R_KNEE),  # 오른쪽 고관절
+    (L_HIP, L_KNEE, L_ANKLE),  # 왼쪽 무릎
+    (R_HIP, R_KNEE, R_ANKLE),  # 오른쪽 무릎
+)
+ANGLE_NAMES = ('left_elbow', 'right_elbow', 'left_shoulder', 'right_shoulder', 'left_hip', 'right_hip',
+               'left_knee', 'right_knee', 'trunk_incline', 'neck', 'leg_spread', 'torso_twist')
+
+
+# 두 벡터 (…, 2) 사이의 각도 [0, pi] (길이가 0인 벡터는 0)
+def _angle(u, v):
+    cross = u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+    dot = np.sum(u * v, axis=-1)
+    return np.arctan2(np.abs(cross), dot)
+
+
+# (T, 17, 2) -> (T, 12) 관절 각도
+# points는 가로세로 같은 단위의 좌표여야 함 (x/W, y/H 정규화 좌표는 x에 W/H를 곱해서 넘김)
+def joint_angles(points):
+    points = np.asarray(points, dtype=np.float32)
+    angles = np.empty(points.shape[:-2] + (len(ANGLE_NAMES),), dtype=np.float32)
+    for k, (a, vertex, b) in enumerate(ANGLE_TRIPLETS):
+        angles[..., k] = _angle(points[..., a, :] - points[..., vertex, :], points[..., b, :] - points[..., vertex, :])
+
+    mid_shoulder = (points[..., L_SHOULDER, :] + points[..., R_SHOULDER, :]) / 2
+    mid_hip = (points[..., L_HIP, :] + points[..., R_HIP, :]) / 2
+    trunk = mid_shoulder - mid_hip
+    up = np.array([0, -1], dtype=np.float32)  # 이미지 y축은 아래 방향
+    angles[..., 8] = _angle(trunk, up)  # 몸통 기울기 (서 있으면 0, 누우면 pi/2)
+    angles[..., 9] = _angle(points[..., NOSE, :] - mid_shoulder, -trunk)  # 목 (머리-몸통)
+    angles[..., 10] = _angle(points[..., L_KNEE, :] - points[..., L_HIP, :],
+                             points[..., R_KNEE, :] - points[..., R_HIP, :])  # 다리 벌림
+    angles[..., 11] = _angle(points[..., R_SHOULDER, :] - points[..., L_SHOULDER, :],
+                             points[..., R_HIP, :] - points[..., L_HIP, :])  # 어깨선-골반선 비틀림
+    return angles
+
+
+class RelativeDistanceFeature:
+    name = key = 'relative_distances'
+    dims = len(PAIR_I)
+
+    def __call__(self, keypoints, dtype=np.float32, aspect=None):
+        return calculate_relative_distances(keypoints, dtype=dtype)
+
+
+class JointAngleFeature:
+    """
+    관절 각도 12개.
+    키포인트는 x/W, y/H로 정규화되어 있으므로 aspect(W/H)를 x에 곱해 두 축 모두 영상 높이 단위로 맞춘 뒤 계산
+    (aspect가 None이면 정규화 좌표 그대로라서 가로세로 비율이 다른 영상끼리는 각도가 조금 달라짐).
+    """
+
+    name = 'joint_angles'
+    key = 'joint_angles-iso'  # 비율 보정 전 결과와 캐시 키가 섞이지 않도록 구분
+    dims = len(ANGLE_NAMES)
+
+    def __call__(self, keypoints, dtype=np.float32, aspect=None):
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if keypoints.size == 0:
+            return np.zeros((0, self.dims), dtype=dtype)
+        single_frame = keypoints.ndim == 1
+        points = as_points(keypoints[None] if single_frame else keypoints)
+        if aspect is not None:
+            points = points * np.array([aspect, 1.0], dtype=np.float32)
+        angles = joint_angles(points).astype(dtype, copy=False)
+        return angles[0] if single_frame else angles
+
+
+class PcaFeature:
+    """relative_distances를 레퍼런스 라이브러리에서 학습한 주성분으로 투영 (key에 기저 해시 포함)"""
+
+    name = 'pca'
+
+    def __init__(self, mean, components, explained=None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.components = np.ascontiguousarray(components, dtype=np.float64)  # (k, 136)
+        self.explained = explained  # 성분별 설명 분산 비율
+        self.dims = len(self.components)
+        digest = hashlib.sha256(self.mean.tobytes() + self.components.tobytes()).hexdigest()[:12]
+        self.key = f"pca{self.dims}-{digest}"
+
+    def __call__(self, keypoints, dtype=np.float32, aspect=None):
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        if keypoints.size == 0:
+            return np.zeros((0, self.dims), dtype=dtype)
+        single_frame = keypoints.ndim == 1
+        keypoints = keypoints[None] if single_frame else keypoints
+        projected = np.empty((len(keypoints), self.dims), dtype=dtype)
+        for start in range(0, len(keypoints), PROJECTION_CHUNK):
+            stop = start + PROJECTION_CHUNK
+            distances = calculate_relative_distances(keypoints[start:stop], dtype=np.float64)
+            projected[start:stop] = (distances - self.mean) @ self.components.T
+        return projected[0] if single_frame else projected
+
+    def save(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, mean=self.mean, components=self.components, explained=self.explained)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['mean'], data['components'], data['explained'])
+
+
+# 키포인트 시퀀스 목록의 모든 프레임으로 PCA 학습 (components개 주성분)
+def fit_pca(sequences, components=PCA_COMPONENTS):
+    distances = np.concatenate([calculate_relative_distances(seq, dtype=np.float64)
+                                for seq in sequences if len(seq)])
+    mean = distances.mean(axis=0)
+    _, singular, vt = np.linalg.svd(distances - mean, full_matrices=False)
+    variance = singular ** 2
+    explained = variance / variance.sum() if variance.sum() > 0 else np.zeros_like(variance)
+    components = min(components, len(vt))
+    return PcaFeature(mean, vt[:components], explained[:components])
+
+
+_pca_cache = {}
+
+
+def library_pca(profile=None, model=None, components=PCA_COMPONENTS, video_dir=None):
+    """
+    레퍼런스 영상 전체(src/mp4)의 키포인트로 학습한 PcaFeature.
+    같은 레퍼런스 저장본으로 학습한 결과는 저장소 디렉터리에 pca-*.npz로 보관해서 다시 학습하지 않음.
+    저장소에 없는 레퍼런스는 model로 추출 (model이 None이면 KeyError).
+    """
+    from .profiles import base_profile, model_key
+    from .reference_store import (REFERENCE_VIDEO_DIR, STORE_DIR, file_sha256, load_reference_keypoints,
+                                  store_key)
+    from .tracking import TRACK_SUBJECT
+
+    profile = profile or base_profile()
+    paths = sorted(glob.glob(os.path.join(video_dir or REFERENCE_VIDEO_DIR, '*.mp4')))
+    keys = [store_key(file_sha256(path), model_key(profile), track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+            for path in paths]
+    digest = hashlib.sha256(json.dumps([keys, components]).encode('utf-8')).hexdigest()[:16]
+    if digest in _pca_cache:
+        return _pca_cache[digest]
+
+    path = os.path.join(STORE_DIR, f"pca-{digest}.npz")
+    try:
+        feature = PcaFeature.load(path)
+    except (FileNotFoundError, ValueError, OSError, KeyError):
+        sequences = [load_reference_keypoints(video_path, model, model_key(profile), track_subject=TRACK_SUBJECT,
+                                              imgsz=profile.imgsz) for video_path in paths]
+        feature = fit_pca(sequences, components)
+        os.makedirs(STORE_DIR, exist_ok=True)
+        feature.save(path)
+    _pca_cache[digest] = feature
+    return feature
+
+
+def get_feature_extractor(name=None, profile=None, model=None):
+    """특징 이름(None이면 DEFAULT_FEATURE) -> 특징 추출기 (pca는 profile의 레퍼런스 저장본으로 학습)"""
+    name = name or DEFAULT_FEATURE
+    if name == 'relative_distances':
+        return RelativeDistanceFeature()
+    if name == 'joint_angles':
+        return JointAngleFeature()
+    if name == 'pca':
+        return library_pca(profile, model)
+    raise KeyError(f"알 수 없는 특징: {name} (가능한 값: {', '.join(FEATURE_TYPES)})")
@@ -0,0 +1,66 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 포즈 특징 계산 (정규화, keypoint 간 거리, 스무딩)
+# 프레임/좌표 단위 파이썬 반복문 대신 (T, 17, 2) 시퀀스 전체를 한 번에 float32로 계산
+
+NUM_KEYPOINTS = 17
+SMOOTHING_WINDOW = 3
+FEATURE_CHUNK = 8  # 관절 간 거리를 한 번에 계산할 프레임 수 (중간 배열 크기 제한)
+
+# 모든 keypoint 쌍 (i < j) 인덱스, 17개 기준 136쌍
+PAIR_I, PAIR_J = np.triu_indices(NUM_KEYPOINTS, k=1)
+
+
+# (…, 34) 형태의 평탄화된 좌표를 (…, 17, 2) 형태로 변환
+# (T, 17, 3) [x, y, 신뢰도] 시퀀스(sequence.KeypointSequence)는 복사 없이 x, y만 잘라낸 view
+def as_points(keypoints):
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    if keypoints.ndim == 3 and keypoints.shape[1:] == (NUM_KEYPOINTS, 3):
+        return keypoints[..., :2]
+    return keypoints.reshape(keypoints.shape[:-1] + (-1, 2)) if keypoints.shape[-1] != 2 else keypoints
+
+
+# keypoints 좌표를 [0, 1]로 정규화하는 함수 (입력과 같은 형태로 반환, (…, 17, 3)이면 신뢰도는 그대로 둠)
+def normalize_keypoints(keypoints, frame_width, frame_height):
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    scale = np.array([frame_width, frame_height], dtype=np.float32)
+    if keypoints.ndim >= 2 and keypoints.shape[-2:] == (NUM_KEYPOINTS, 3):
+        normalized = keypoints.copy()
+        normalized[..., :2] /= scale
+        return normalized
+    return (as_points(keypoints) / scale).reshape(keypoints.shape)
+
+
+# Keypoints 간 상대적 거리 계산
+# 한 프레임 (34,) -> (136,), 시퀀스 (T, 34), (T, 17, 2), (T, 17, 3) -> (T, 136)
+# 계산은 float32로 FEATURE_CHUNK 프레임씩 하고 결과는 dtype 배열에 바로 기록
+# (DTW 입력은 dtype=np.float64로 받으면 float32 결과를 한 번 더 복사하지 않음)
+# x, y 차이를 (chunk, 136) 버퍼 세 개에 돌려 쓰므로 (chunk, 136, 2) 중간 배열을 만들지 않음
+def calculate_relative_distances(keypoints, dtype=np.float32):
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    if keypoints.size == 0:  # 키포인트가 하나도 추출되지 않은 영상
+        return np.zeros((0, len(PAIR_I)), dtype=dtype)
+    single_frame = keypoints.ndim == 1
+    points = as_points(keypoints[None] if single_frame else keypoints)
+
+    distances = np.empty((len(points), len(PAIR_I)), dtype=dtype)
+    buffers = np.empty((3, min(FEATURE_CHUNK, len(points)), len(PAIR_I)), dtype=np.float32)
+    for start in range(0, len(points), FEATURE_CHUNK):
+        chunk = points[start:start + FEATURE_CHUNK]
+        squared, dy, other = buffers[:, :len(chunk)]
+        np.take(chunk[..., 0], PAIR_I, axis=1, out=squared)
+        np.subtract(squared, np.take(chunk[..., 0], PAIR_J, axis=1, out=other), out=squared)
+        np.multiply(squared, squared, out=squared)
+        np.take(chunk[..., 1], PAIR_I, axis=1, out=dy)
+        np.subtract(dy, np.take(chunk[..., 1], PAIR_J, axis=1, out=other), out=dy)
+        squared += np.multiply(dy, dy, out=dy)
+        np.sqrt(squared, out=distances[start:start + FEATURE_CHUNK])
+    return distances[0] if single_frame else distances
+
+
+# Keypoints 시퀀스를 스무딩하는 함수 (시간 축 이동 평균, 'valid' 구간만 반환)
+def smooth_keypoints(sequence, window_size=SMOOTHING_WINDOW):
+    sequence = np.asarray(sequence, dtype=np.float32)
+    windows = sliding_window_view(sequence, window_size, axis=0)
+    return windows.mean(axis=-1, dtype=np.float32)
@@ -0,0 +1,197 @@
+import os
+import math
+import queue
+import asyncio
+import threading
+
+from .metrics import incr, span
+from .result_cache import cache_key, get_result_cache
+
+# LLM 피드백 생성 서비스
+# 프로세스 공용 이벤트 루프/클라이언트에서 비동기로 호출하고, 토큰을 스트리밍으로 돌려줌
+# 같은 동작 + 비슷한 DTW 거리(구간)는 캐시된 피드백을 재사용
+
+FEEDBACK_MODEL = 'gpt-4o'
+FEEDBACK_BACKEND = os.environ.get('HH_FEEDBACK_BACKEND', 'openai')  # 'openai' 또는 'stub'
+REQUEST_TIMEOUT = 30.0  # 요청 하나의 최대 시간 (초)
+MAX_CONCURRENT_REQUESTS = 4  # 프로세스 전체 동시 LLM 요청 수
+MAX_CONNECTIONS = 8
+SCORE_BUCKET_RATIO = 1.1  # DTW 거리 캐시 구간 (10% 폭의 로그 구간)
+
+
+class FeedbackError(Exception):
+    """피드백 생성 실패 (API 오류, 타임아웃 등)"""
+
+
+# GPT-4 피드백 요청 메시지
+def build_messages(dtw_distance, action_name):
+    user_message = (
+        f"사용자와 '{action_name}' 동작을 비교한 결과, DTW 거리 값은 {dtw_distance}입니다.\n"
+        "이 값에 기반하여 피드백을 제공해주세요:\n"
+        "- 유사도가 낮을 경우: 자세를 교정하기 위한 구체적인 피드백 제공.\n"
+        "- 유사도가 높을 경우: 칭찬과 간단한 개선점을 제안.\n"
+    )
+    return [
+        {"role": "system", "content": "당신은 피트니스 전문가입니다."},
+        {"role": "user", "content": user_message},
+    ]
+
+
+# DTW 거리를 로그 구간 번호로 변환 (구간이 같으면 같은 피드백 사용)
+def score_bucket(dtw_distance):
+    if dtw_distance is None or not math.isfinite(dtw_distance):
+        return 'inf'
+    if dtw_distance <= 0:
+        return 'zero'
+    return int(math.floor(math.log(dtw_distance) / math.log(SCORE_BUCKET_RATIO)))
+
+
+class OpenAIBackend:
+    name = 'openai'
+
+    def __init__(self, model=FEEDBACK_MODEL, timeout=REQUEST_TIMEOUT, max_connections=MAX_CONNECTIONS):
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    # 클라이언트는 이벤트 루프 스레드에서 처음 사용할 때 한 번만 생성 (연결 풀 공유)
+    def _get_client(self):
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+            self._client = AsyncOpenAI(
+                timeout=self.timeout,
+                max_retries=1,
+                http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                )),
+            )
+        return self._client
+
+    async def stream(self, messages):
+        response = await self._get_client().chat.completions.create(
+            model=self.model,  # OpenAI API 모델명
+            messages=messages,
+            temperature=0.7,
+            stream=True,
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubBackend:
+    """네트워크 없이 테스트할 때 사용하는 로컬 백엔드 (정해진 문장을 토큰 단위로 스트리밍)"""
+
+    name = 'stub'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def stream(self, messages):
+        self.calls += 1
+        text = f"[stub] {messages[-1]['content'].splitlines()[0]} 자세를 천천히 유지하면서 호흡에 집중해보세요."
+        for token in text.split(' '):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield token + ' '
+
+
+def default_backend():
+    return StubBackend() if FEEDBACK_BACKEND == 'stub' else OpenAIBackend()
+
+
+_END = object()
+
+
+class FeedbackService:
+    def __init__(self, backend=None, timeout=REQUEST_TIMEOUT, max_concurrency=MAX_CONCURRENT_REQUESTS, cache=None):
+        self.backend = backend or default_backend()
+        self.timeout = timeout
+        self.cache = cache or get_result_cache()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='feedback-loop', daemon=True)
+        self._thread.start()
+
+    def _cache_key(self, dtw_distance, action_name):
+        return cache_key('feedback', self.backend.name, action_name, score_bucket(dtw_distance))
+
+    async def _consume(self, messages, tokens):
+        chunks = 0
+        async for token in self.backend.stream(messages):
+            tokens.put(token)
+            chunks += 1
+        return chunks
+
+    async def _generate(self, messages, tokens):
+        try:
+            async with self._semaphore:
+                with span('llm', backend=self.backend.name) as llm_span:
+                    # asyncio.timeout은 Python 3.11 이상에만 있으므로 wait_for 사용
+                    chunks = await asyncio.wait_for(self._consume(messages, tokens), self.timeout)
+                    llm_span.set(chunks=chunks)
+            tokens.put(_END)
+        except asyncio.TimeoutError:
+            tokens.put(FeedbackError('피드백 생성 시간이 초과되었습니다.'))
+        except asyncio.CancelledError:
+            tokens.put(_END)
+            raise
+        except Exception as e:
+            tokens.put(FeedbackError(str(e)))
+
+    def stream_advice(self, dtw_distance, action_name):
+        """
+        피드백 텍스트 조각을 순서대로 yield하는 동기 제너레이터 (st.write_stream에 바로 전달 가능).
+        캐시에 있으면 전체 문장을 한 번에 반환하고, 실패하면 FeedbackError를 발생시킨다.
+        """
+        key = self._cache_key(dtw_distance, action_name)
+        cached = self.cache.get_record(key)
+        if cached is not None:
+            incr('feedback.cache_hits')
+            yield cached['advice']
+            return
+
+        tokens = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(build_messages(dtw_distance, action_name), tokens), self._loop)
+        parts = []
+        try:
+            while True:
+                try:
+                    # 동시 요청 제한으로 대기하는 시간까지 고려해서 넉넉하게 기다림
+                    token = tokens.get(timeout=self.timeout * 2)
+                except queue.Empty:
+                    raise FeedbackError('피드백 생성 시간이 초과되었습니다.')
+                if token is _END:
+                    break
+                if isinstance(token, Exception):
+                    raise token
+                parts.append(token)
+                yield token
+        finally:
+            # 페이지가 rerun되어 스트림을 끝까지 읽지 않으면 요청도 취소
+            if not future.done():
+                future.cancel()
+
+        self.cache.put_record(key, {'advice': ''.join(parts)})
+
+    def get_advice(self, dtw_distance, action_name):
+        return ''.join(self.stream_advice(dtw_distance, action_name))
+
+
+# 프로세스당 하나의 피드백 서비스
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_feedback_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = FeedbackService()
+    return _service
@@ -0,0 +1,609 @@
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+import itertools
+import threading
+import collections
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+import numpy as np
+
+from .metrics import incr, set_gauge, span
+from .reference_store import ROOT_DIR
+
+# 여러 Streamlit 세션/레플리카/작업 워커가 함께 쓰는 로컬 추론 서버
+# 서버 프로세스 하나만 포즈 모델을 들고 있고, 클라이언트는 Unix 소켓(또는 localhost TCP)으로 프레임을 보냄
+# 동시에 들어온 요청의 프레임을 최대 MAX_BATCH개 배치로 합쳐서 한 번에 추론 (가장 오래 기다린 프레임이
+# MAX_WAIT_MS를 넘으면 덜 찼어도 실행). 배치는 클라이언트(연결)마다 한 프레임씩 돌아가며 채워서
+# 긴 영상을 보낸 클라이언트가 짧은 요청을 밀어내지 않음
+# 같은 (프로필, 추론 옵션, 프레임 크기)끼리만 합치므로 결과는 혼자 추론할 때와 같은 전처리를 거침
+# 메시지는 JSON 헤더 + 배열 원본 바이트 (pickle을 쓰지 않으므로 소켓으로 임의 객체를 받지 않음)
+# 연결마다 공유 키(AUTHKEY_PATH 또는 HH_INFERENCE_AUTHKEY)로 HMAC 인증을 먼저 하므로, TCP 주소(Windows 기본값)에서도
+# 키 파일을 읽을 수 없는 다른 로컬 프로세스는 서버를 쓸 수 없음 (Unix 소켓은 추가로 0600 권한)
+#
+# HH_INFERENCE_SERVER=<주소>이면 profiles.load_profile_model이 모델 대신 InferenceClient를 반환
+# python -m screen.inference_server serve [--address 주소] [--profiles accurate]
+# python -m screen.inference_server loadtest --users 1 2 4   (공유 서버 vs 사용자마다 모델 로드 비교)
+
+DEFAULT_ADDRESS = (os.path.join(ROOT_DIR, '.cache', 'inference.sock') if sys.platform != 'win32'
+                   else 'localhost:7420')
+SERVER_ADDRESS = os.environ.get('HH_INFERENCE_SERVER', '')  # 클라이언트 모드 주소 (비어 있으면 프로세스마다 모델 로드)
+MAX_BATCH = int(os.environ.get('HH_SERVER_MAX_BATCH', 16))  # 한 번에 추론하는 최대 프레임 수
+MAX_WAIT_MS = float(os.environ.get('HH_SERVER_MAX_WAIT_MS', 20))  # 배치를 채우려고 기다리는 최대 시간
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024  # 메시지(프레임 하나) 최대 크기
+CLIENT_TIMEOUT = 300.0  # 응답을 기다리는 최대 시간 (초)
+AUTHKEY_PATH = os.environ.get('HH_INFERENCE_AUTHKEY_FILE', os.path.join(ROOT_DIR, '.cache', 'inference.key'))
+ARRAY_DTYPES = ('uint8', 'float32')  # 주고받는 배열 형식
+
+
+class InferenceServerError(Exception):
+    """추론 서버가 요청을 처리하지 못함 (서버 쪽 오류 메시지를 담음)"""
+
+
+# 'host:port'는 TCP, 나머지는 Unix 소켓 경로
+def parse_address(address):
+    host, sep, port = address.rpartition(':')
+    if sep and host and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+# 서버와 클라이언트가 공유하는 인증 키: HH_INFERENCE_AUTHKEY, 없으면 AUTHKEY_PATH 파일
+# create=True(서버)이면 파일이 없을 때 임의 키를 만들어 소유자만 읽을 수 있게(0600) 저장
+def load_authkey(create=False, path=AUTHKEY_PATH):
+    key = os.environ.get('HH_INFERENCE_AUTHKEY')
+    if key:
+        return key.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        if not create:
+            raise
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    key = secrets.token_hex(32).encode('ascii')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:  # 다른 서버가 먼저 만듦
+        return load_authkey(path=path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+def _send(conn, header, arrays=()):
+    header = dict(header, arrays=[[str(array.dtype), list(array.shape)] for array in arrays])
+    conn.send_bytes(json.dumps(header).encode('utf-8'))
+    for array in arrays:
+        conn.send_bytes(memoryview(np.ascontiguousarray(array)).cast('B'))
+
+
+def _recv(conn):
+    header = json.loads(conn.recv_bytes(MAX_MESSAGE_BYTES).decode('utf-8'))
+    arrays = []
+    for dtype, shape in header.pop('arrays', []):
+        if dtype not in ARRAY_DTYPES:
+            raise ValueError(f"지원하지 않는 배열 형식: {dtype}")
+        arrays.append(np.frombuffer(conn.recv_bytes(MAX_MESSAGE_BYTES), dtype=dtype).reshape(shape))
+    return header, arrays
+
+
+# 포즈 결과 목록 -> (프레임별 검출 수, 박스 (N, 4), 박스 신뢰도 (N,), keypoints (N, 17, 3))
+# keypoints가 없는 결과는 검출 수 -1, keypoint 신뢰도가 없는 모델은 tracking.keypoint_confidence와 같은 값으로 채움
+def _pack_results(results):
+    from .features import NUM_KEYPOINTS
+    from .tracking import to_numpy, keypoint_confidence
+
+    counts, boxes, confidences, keypoints = [], [], [], []
+    for result in results:
+        if result.keypoints is None or result.boxes is None:
+            counts.append(-1)
+            continue
+        xy = to_numpy(result.keypoints.xy).astype(np.float32).reshape(-1, NUM_KEYPOINTS, 2)
+        data = np.empty(xy.shape[:-1] + (3,), dtype=np.float32)
+        data[..., :2] = xy
+        data[..., 2] = keypoint_confidence(result.keypoints, xy)
+        counts.append(len(data))
+        boxes.append(to_numpy(result.boxes.xyxy).astype(np.float32).reshape(-1, 4))
+        confidences.append(to_numpy(result.boxes.conf).astype(np.float32).reshape(-1))
+        keypoints.append(data)
+    if not boxes:
+        return counts, np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros((0, NUM_KEYPOINTS, 3), np.float32)
+    return counts, np.concatenate(boxes), np.concatenate(confidences), np.concatenate(keypoints)
+
+
+def _unpack_results(counts, shapes, boxes, confidences, keypoints):
+    from .onnx_backend import PoseBoxes, PoseKeypoints, PoseResult
+
+    results, start = [], 0
+    for count, shape in zip(counts, shapes):
+        if count < 0:
+            results.append(PoseResult(None, None, tuple(shape)))
+            continue
+        stop = start + count
+        results.append(PoseResult(PoseBoxes(boxes[start:stop], confidences[start:stop]),
+                                  PoseKeypoints(keypoints[start:stop]), tuple(shape)))
+        start = stop
+    return results
+
+
+class InferenceClient:
+    """
+    추론 서버에 프레임을 보내는 모델 대체 객체 (model(frames, imgsz=..., verbose=False)와 같은 호출/결과 형식).
+    스레드마다 연결을 따로 열어서 서버가 세션(스레드)별로 공정하게 배치를 나눔.
+    profile은 서버에서 쓸 프로필 이름 (None이면 서버 기본 프로필).
+    """
+
+    def __init__(self, address=None, profile=None, timeout=CLIENT_TIMEOUT, authkey=None):
+        self.address = address or SERVER_ADDRESS or DEFAULT_ADDRESS
+        self.profile = profile
+        self.timeout = timeout
+        self.authkey = authkey  # None이면 첫 연결 때 load_authkey()
+        self._local = threading.local()
+        self._ids = itertools.count()
+        self._model_key = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.authkey is None:
+                self.authkey = load_authkey()
+            conn = Client(parse_address(self.address), authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, header, arrays=()):
+        conn = self._connection()
+        try:
+            _send(conn, header, arrays)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"추론 서버 응답 없음 ({self.timeout:.0f}s): {self.address}")
+            reply, arrays = _recv(conn)
+        except BaseException:
+            # 응답을 다 읽지 못한 연결은 다음 요청과 섞이므로 버림
+            self._local.conn = None
+            conn.close()
+            raise
+        if 'error' in reply:
+            raise InferenceServerError(reply['error'])
+        return reply, arrays
+
+    def __call__(self, source, imgsz=None, verbose=False, **kwargs):
+        frames = list(source) if isinstance(source, (list, tuple)) else [source]
+        if not frames:
+            return []
+        options = dict(kwargs, imgsz=imgsz) if imgsz else dict(kwargs)
+        header = {'op': 'infer', 'id': next(self._ids), 'profile': self.profile, 'options': options}
+        with span('inference.remote', frames=len(frames)):
+            reply, arrays = self._request(header, [np.ascontiguousarray(frame) for frame in frames])
+        return _unpack_results(reply['counts'], [frame.shape[:2] for frame in frames], *arrays)
+
+    # 서버에서 이 프로필 모델의 캐시 키 이름 (profiles.model_key)
+    @property
+    def model_key(self):
+        if self._model_key is None:
+            self._model_key = self._request({'op': 'info', 'profile': self.profile})[0]['model_key']
+        return self._model_key
+
+    def stats(self):
+        return self._request({'op': 'stats'})[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def connect(address=None, profile=None):
+    """프로세스당 (주소, 프로필)마다 하나의 InferenceClient"""
+    key = (address or SERVER_ADDRESS or DEFAULT_ADDRESS, profile)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = InferenceClient(*key)
+        return _clients[key]
+
+
+class _Request:
+    def __init__(self, client, request_id, key, frames, options):
+        self.client = client
+        self.id = request_id
+        self.key = key  # (프로필, 추론 옵션, 프레임 크기): 같은 키끼리만 한 배치로 합침
+        self.frames = frames
+        self.options = options
+        self.results = [None] * len(frames)
+        self.taken = 0  # 배치에 넣은 프레임 수
+        self.done = 0
+        self.failed = False
+        self.arrival = time.monotonic()
+
+
+class _Connection:
+    def __init__(self, conn, client_id):
+        self.conn = conn
+        self.id = client_id
+        self.queue = collections.deque()  # 아직 배치에 다 넣지 못한 _Request
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, header, arrays=()):
+        with self.send_lock:
+            if not self.closed:
+                _send(self.conn, header, arrays)
+
+
+class InferenceServer:
+    """
+    프로필별 모델을 한 번만 로드해서 모든 연결의 요청을 동적 배치로 추론하는 서버.
+    연결마다 읽기 스레드 하나, 모델을 쓰는 추론 스레드는 하나뿐.
+    """
+
+    def __init__(self, address=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, default_profile=None, authkey=None):
+        from .profiles import base_profile
+
+        self.address = address or SERVER_ADDRESS or DEFAULT_ADDRESS
+        self.authkey = authkey or load_authkey(create=True)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait_ms / 1000.0
+        self.default_profile = default_profile or base_profile().name
+        self._models = {}
+        self._model_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._connections = {}
+        self._client_ids = itertools.count()
+        self._turn = 0  # 라운드로빈 시작 위치
+        self._listener = None
+        self._closed = False
+        self.counters = collections.Counter(dict.fromkeys(
+            ('connections', 'auth_failures', 'requests', 'batches', 'frames', 'shared_batches', 'max_batch_frames',
+             'wait_ms'), 0))
+
+    def model(self, profile_name=None):
+        from .profiles import get_profile, load_local_model
+
+        name = profile_name or self.default_profile
+        with self._model_lock:
+            if name not in self._models:
+                self._models[name] = load_local_model(get_profile(name), warm=True)
+            return self._models[name]
+
+    def serve_forever(self):
+        address = parse_address(self.address)
+        if isinstance(address, str):
+            os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+            if os.path.exists(address):  # 이전에 종료된 서버의 소켓 파일
+                os.remove(address)
+        self._listener = Listener(address)
+        if isinstance(address, str):
+            os.chmod(address, 0o600)
+        threading.Thread(target=self._inference_loop, name='inference', daemon=True).start()
+        try:
+            while not self._closed:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break
+                connection = _Connection(conn, next(self._client_ids))
+                with self._cond:
+                    self._connections[connection.id] = connection
+                    self.counters['connections'] += 1
+                threading.Thread(target=self._read_loop, args=(connection,), name=f'client-{connection.id}',
+                                 daemon=True).start()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._listener is not None:
+            self._listener.close()
+
+    def stats(self):
+        from .bench import peak_rss_mb
+
+        with self._cond:
+            stats = dict(self.counters)
+            stats['clients'] = len(self._connections)
+            stats['queued_frames'] = self._queued_frames()
+        stats['profiles'] = sorted(self._models)
+        stats['peak_rss_mb'] = peak_rss_mb()
+        return stats
+
+    # 연결 하나의 요청 읽기: infer는 대기열에 넣고, info/stats는 바로 응답
+    # 인증은 accept 스레드가 아니라 여기서 해서 느린/잘못된 클라이언트가 다른 연결을 막지 않음
+    def _read_loop(self, connection):
+        try:
+            try:
+                deliver_challenge(connection.conn, self.authkey)
+                answer_challenge(connection.conn, self.authkey)
+            except AuthenticationError:
+                with self._cond:
+                    self.counters['auth_failures'] += 1
+                return
+            while True:
+                header, arrays = _recv(connection.conn)
+                op = header.get('op')
+                try:
+                    if op == 'infer':
+                        self._enqueue(connection, header, arrays)
+                    elif op == 'info':
+                        from .profiles import get_profile, local_model_key
+
+                        name = header.get('profile') or self.default_profile
+                        self.model(name)
+                        connection.send({'model_key': local_model_key(get_profile(name))})
+                    elif op == 'stats':
+                        connection.send(self.stats())
+                    else:
+                        connection.send({'error': f"알 수 없는 요청: {op}"})
+                except Exception as e:  # 잘못된 요청/모델 로드 실패는 이 요청에만 오류로 응답
+                    connection.send({'id': header.get('id'), 'error': f"{type(e).__name__}: {e}"})
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            with self._cond:
+                connection.closed = True
+                connection.queue.clear()
+                self._connections.pop(connection.id, None)
+            connection.conn.close()
+
+    def _enqueue(self, connection, header, frames):
+        from .profiles import get_profile
+
+        profile = header.get('profile') or self.default_profile
+        get_profile(profile)  # 알 수 없는 프로필이면 KeyError
+        options = {key: value for key, value in (header.get('options') or {}).items() if key != 'verbose'}
+        if not frames:
+            connection.send({'id': header.get('id'), 'counts': []})
+            return
+        shapes = {frame.shape for frame in frames}
+        if len(shapes) > 1:  # 서로 다른 크기를 섞으면 전처리가 달라지므로 한 요청은 한 크기만
+            raise ValueError("한 요청의 프레임 크기가 모두 같아야 합니다")
+        key = (profile, json.dumps(options, sort_keys=True), frames[0].shape)
+        with self._cond:
+            connection.queue.append(_Request(connection, header.get('id'), key, frames, options))
+            self.counters['requests'] += 1
+            set_gauge('server.queued_frames', self._queued_frames())
+            self._cond.notify()
+
+    def _queued_frames(self, key=None):
+        return sum(len(request.frames) - request.taken for connection in self._connections.values()
+                   for request in connection.queue if key is None or request.key == key)
+
+    # 다음 배치: 가장 오래 기다린 요청과 같은 키의 프레임이 max_batch개 모이거나 max_wait가 지나면
+    # 연결마다 한 프레임씩 돌아가며 max_batch개까지 채움 (_cond를 잡은 상태에서 호출)
+    def _next_batch(self):
+        while not self._closed:
+            heads = [connection.queue[0] for connection in self._connections.values() if connection.queue]
+            if not heads:
+                self._cond.wait()
+                continue
+            oldest = min(heads, key=lambda request: request.arrival)
+            remaining = oldest.arrival + self.max_wait - time.monotonic()
+            if remaining > 0 and self._queued_frames(oldest.key) < self.max_batch:
+                self._cond.wait(remaining)
+                continue
+
+            connections = list(self._connections.values())
+            start = self._turn % len(connections)
+            connections = connections[start:] + connections[:start]
+            self._turn += 1
+            batch = []
+            while len(batch) < self.max_batch:
+                added = False
+                for connection in connections:
+                    if len(batch) == self.max_batch:
+                        break
+                    if connection.queue and connection.queue[0].key == oldest.key:
+                        request = connection.queue[0]
+                        batch.append((request, request.taken))
+                        request.taken += 1
+                        if request.taken == len(request.frames):
+                            connection.queue.popleft()
+                        added = True
+                if not added:
+                    break
+            return oldest.key, batch
+        return None, None
+
+    def _inference_loop(self):
+        while True:
+            with self._cond:
+                key, batch = self._next_batch()
+                if batch is None:
+                    return
+                set_gauge('server.queued_frames', self._queued_frames())
+            self._run_batch(key, batch)
+
+    def _run_batch(self, key, batch):
+        profile, _, _ = key
+        requests = list({id(request): request for request, _ in batch}.values())
+        waited = time.monotonic() - min(request.arrival for request in requests)
+        try:
+            with span('server.batch', frames=len(batch), clients=len({request.client.id for request in requests})):
+                results = self.model(profile)([request.frames[i] for request, i in batch], verbose=False,
+                                              **requests[0].options)
+            error = None
+        except Exception as e:
+            results, error = [None] * len(batch), f"{type(e).__name__}: {e}"
+
+        for (request, i), result in zip(batch, results):
+            request.results[i] = result
+            request.done += 1
+        with self._cond:
+            self.counters['batches'] += 1
+            self.counters['frames'] += len(batch)
+            self.counters['shared_batches'] += len({request.client.id for request in requests}) > 1
+            self.counters['max_batch_frames'] = max(self.counters['max_batch_frames'], len(batch))
+            self.counters['wait_ms'] += int(waited * 1000)
+        incr('server.frames', len(batch))
+
+        for request in requests:
+            try:
+                if error is not None and not request.failed:
+                    request.failed = True
+                    with self._cond:  # 남은 프레임은 추론하지 않음
+                        if request in request.client.queue:
+                            request.client.queue.remove(request)
+                    request.client.send({'id': request.id, 'error': error})
+                elif error is None and not request.failed and request.done == len(request.frames):
+                    counts, *arrays = _pack_results(request.results)
+                    request.client.send({'id': request.id, 'counts': counts}, arrays)
+                    request.results = None
+            except OSError:  # 응답을 기다리던 클라이언트가 끊김
+                pass
+
+
+# --- 부하 테스트 ---------------------------------------------------------------------------------
+
+def _serve(address, profiles, max_batch, max_wait_ms):
+    server = InferenceServer(address, max_batch, max_wait_ms, default_profile=profiles[0])
+    for name in profiles:
+        server.model(name)
+    server.serve_forever()
+
+
+# 서버가 연결을 받을 때까지 대기
+def wait_for_server(address, timeout=120.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(parse_address(address), authkey=load_authkey()).close()
+            return
+        except OSError:  # 서버가 아직 소켓/키 파일을 만들지 않음
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+# 사용자 한 명: 서버 모드(address)면 extract_keypoints 클라이언트 모드, 아니면 자기 모델을 로드해서 추출
+def _user(address, video_path, profile_name, sample_fps, barrier, results):
+    from .bench import peak_rss_mb
+    from .keypoints import extract_keypoints
+    from .profiles import get_profile, load_local_model
+
+    model = profile_name if address else load_local_model(get_profile(profile_name), warm=True)
+    barrier.wait()
+    start = time.perf_counter()
+    keypoints = extract_keypoints(video_path, model, sample_fps=sample_fps, server=address)
+    results.put((len(keypoints), time.perf_counter() - start, peak_rss_mb(), keypoints))
+
+
+def _run_users(context, address, videos, profile_name, sample_fps):
+    barrier = context.Barrier(len(videos) + 1)
+    queue = context.Queue()
+    processes = [context.Process(target=_user, args=(address, video, profile_name, sample_fps, barrier, queue))
+                 for video in videos]
+    for process in processes:
+        process.start()
+    barrier.wait()  # 모델 로드가 끝난 뒤 동시에 시작
+    start = time.perf_counter()
+    rows = [queue.get() for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return rows, elapsed
+
+
+def load_test(video_paths, users=(1, 2, 4), profile_name=None, sample_fps=None, max_batch=MAX_BATCH,
+              max_wait_ms=MAX_WAIT_MS, baseline=True):
+    """
+    N명이 동시에 영상 하나씩 추출할 때, 공유 추론 서버와 사용자마다 모델을 로드하는 방식의
+    전체 시간/처리량/사용자별 지연/메모리를 비교 (사용자는 별도 프로세스, 영상은 video_paths를 돌아가며 배정).
+    """
+    import tempfile
+    import multiprocessing
+
+    from .keypoints import SAMPLE_FPS
+    from .profiles import base_profile
+
+    profile_name = profile_name or base_profile().name
+    sample_fps = sample_fps or SAMPLE_FPS
+    context = multiprocessing.get_context('spawn')
+    address = os.path.join(tempfile.mkdtemp(prefix='hh-inference-'), 'server.sock')
+    server = context.Process(target=_serve, args=(address, [profile_name], max_batch, max_wait_ms), daemon=True)
+    server.start()
+    report = []
+    try:
+        wait_for_server(address)
+        client = InferenceClient(address, profile_name)
+        for count in users:
+            videos = [video_paths[k % len(video_paths)] for k in range(count)]
+            before = client.stats()
+            shared, shared_time = _run_users(context, address, videos, profile_name, sample_fps)
+            after = client.stats()
+            batches = after['batches'] - before['batches']
+            frames = sum(row[0] for row in shared)
+            row = {
+                'users': count, 'frames': frames,
+                'shared_seconds': shared_time,
+                'shared_latency': [r[1] for r in shared],
+                'mean_batch': (after['frames'] - before['frames']) / max(batches, 1),
+                'shared_batches': (after['shared_batches'] - before['shared_batches']) / max(batches, 1),
+                'shared_rss_mb': after['peak_rss_mb'] + sum(r[2] for r in shared),
+            }
+            line = (f"사용자 {count}명 ({frames}프레임) 공유 서버: {shared_time:.1f}s "
+                    f"({frames / shared_time:.1f} fps), 사용자 지연 평균 {np.mean(row['shared_latency']):.1f}s "
+                    f"최대 {np.max(row['shared_latency']):.1f}s, 평균 배치 {row['mean_batch']:.1f}프레임 "
+                    f"(여러 사용자 합친 배치 {row['shared_batches']:.0%}), 메모리 합계 {row['shared_rss_mb']:.0f}MB")
+            if baseline:
+                local, local_time = _run_users(context, None, videos, profile_name, sample_fps)
+                row.update(local_seconds=local_time, local_latency=[r[1] for r in local],
+                           local_rss_mb=sum(r[2] for r in local))
+                # 같은 영상이면 결과가 같아야 함 (배치 크기에 따른 부동소수점 차이만 허용)
+                by_length = {len(r[3]): r[3] for r in local}
+                row['same_keypoints'] = all(len(r[3]) in by_length and np.allclose(r[3], by_length[len(r[3])],
+                                                                                   atol=1e-4) for r in shared)
+                line += (f" | 사용자별 모델: {local_time:.1f}s ({frames / local_time:.1f} fps), "
+                         f"지연 평균 {np.mean(row['local_latency']):.1f}s 최대 {np.max(row['local_latency']):.1f}s, "
+                         f"메모리 합계 {row['local_rss_mb']:.0f}MB, 결과 {'일치' if row['same_keypoints'] else '다름'}")
+            print(line, flush=True)
+            report.append(row)
+        client.close()
+    finally:
+        server.terminate()
+        server.join()
+    return report
+
+
+if __name__ == '__main__':
+    import glob
+
+    from .profiles import PROFILES
+    from .reference_store import REFERENCE_VIDEO_DIR
+
+    parser = argparse.ArgumentParser(description='공유 포즈 추론 서버')
+    parser.add_argument('command', choices=['serve', 'loadtest'])
+    parser.add_argument('videos', nargs='*', help='loadtest 영상 (기본: 레퍼런스 영상)')
+    parser.add_argument('--address', help=f'Unix 소켓 경로 또는 host:port (기본: {DEFAULT_ADDRESS})')
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), help='미리 로드할 프로필 (첫 번째가 기본)')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 2, 4], help='loadtest 동시 사용자 수')
+    parser.add_argument('--sample-fps', type=float, help='loadtest 추출 fps (기본: SAMPLE_FPS)')
+    parser.add_argument('--no-baseline', action='store_true', help='사용자마다 모델을 로드하는 비교 생략')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        server = InferenceServer(args.address, args.max_batch, args.max_wait_ms,
+                                 default_profile=args.profiles[0] if args.profiles else None)
+        for name in args.profiles or [server.default_profile]:
+            server.model(name)
+        print(f"추론 서버 시작: {server.address} (프로필 {', '.join(server._models)}, "
+              f"배치 {server.max_batch}, 대기 {args.max_wait_ms:g}ms)", flush=True)
+        server.serve_forever()
+    else:
+        videos = args.videos or sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))
+        load_test(videos, args.users, args.profiles[0] if args.profiles else None, args.sample_fps,
+                  args.max_batch, args.max_wait_ms, baseline=not args.no_baseline)
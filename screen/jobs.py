@@ -0,0 +1,371 @@
+import os
+import glob
+import time
+import uuid
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .dtw_engine import DTW_METHOD, calculate_dtw_distance, dtw_params
+from .feature_space import DEFAULT_FEATURE, FEATURE_TYPES, get_feature_extractor
+from .keypoints import frame_aspect
+from .library import build_index
+from .metrics import set_gauge, span
+from .pipeline import PipelineCancelled, extract_keypoints_pipelined
+from .profiles import (AUTO, DEFAULT_PROFILE, base_profile, get_profile, load_profile_model, measure_latencies_isolated,
+                       model_key, resolve_profile, set_latencies)
+from .reference_store import REFERENCE_VIDEO_DIR, file_sha256, load_reference_keypoints
+from .result_cache import cache_key, get_result_cache, pipeline_params
+from .sampling import ADAPTIVE_SAMPLING, MAX_INFERENCES
+from .sharding import SHARD_WORKERS, get_sharded_extractor, set_shard_budget, shard_budget, shard_count
+from .tracking import TRACK_SUBJECT
+
+# 비디오 비교를 Streamlit 스크립트 밖의 프로세스 풀에서 실행하는 작업 관리자
+# 서버 프로세스당 하나만 만들어서 (st.cache_resource) 세션이 rerun되거나 페이지를 옮겨도 작업이 유지됨
+
+MAX_CONCURRENT_JOBS = int(os.environ.get('HH_MAX_CONCURRENT_JOBS', 2))  # 동시에 실행되는 작업 수 (워커 프로세스 수)
+MAX_PENDING_JOBS = MAX_CONCURRENT_JOBS * 4  # 대기열 포함 최대 작업 수
+JOB_TTL = 60 * 60  # 끝난 작업 결과를 보관하는 시간 (초)
+
+
+class TooManyJobs(Exception):
+    """서버의 작업 대기열이 가득 참"""
+
+
+# 배포 기본 프로필 모델 로드/워밍업
+# latencies(부모가 한 번 측정한 프로필별 추론 시간)를 받으면 auto 선택 때 워커에서 다시 측정하지 않음
+# (없으면 choose_profile이 필요한 프로필만 차례로 측정)
+def load_model(latencies=None):
+    if latencies:
+        set_latencies(latencies)
+    return load_profile_model(base_profile(), warm=True)
+
+
+# 워커 프로세스 시작 시 모델 로드/워밍업만 해둠 (반환값은 쓰지 않음)
+# compare는 load_profile_model로 같은 모델을 다시 가져오므로 프로세스 안의 모델 캐시가 데워진 상태로 시작
+# shard_workers는 이 워커가 긴 업로드 구간 추출에 쓸 수 있는 프로세스 수 (풀 전체 SHARD_WORKERS를 워커 수로 나눈 몫)
+def _init_worker(model_factory, shard_workers=1):
+    set_shard_budget(shard_workers)
+    model_factory()
+
+
+def _noop():
+    return None
+
+
+def _run_comparison(reference_path, upload_path, progress, cancel_event, upload_hash=None, profile=None,
+                    feature=None):
+    with span('job') as job_span:
+        result = compare(reference_path, upload_path, progress, cancel_event, upload_hash, profile, feature)
+        job_span.set(cached=result['cached'], frames=result['frames'], profile=result['profile'],
+                     feature=result['feature'])
+    return result
+
+
+def compare(reference_path, upload_path, progress, cancel_event, upload_hash, profile_name, feature_name=None,
+            dtw_method=None):
+    """
+    레퍼런스 영상과 업로드 영상 하나를 비교해서 점수 레코드(dict)를 반환 (이 프로세스에서 바로 실행).
+    progress: 단계/진행률을 기록할 dict (state, stage, decode, inference, dtw), 필요 없으면 {}.
+    cancel_event: 설정되면 추출을 멈추고 PipelineCancelled를 발생시킬 Event (None이면 취소 없음).
+    upload_hash: 업로드 바이트의 SHA-256 (None이면 여기서 계산).
+    profile_name: 프로필 이름 또는 'auto' (None이면 HH_PROFILE).
+    feature_name: DTW 특징 이름 (None이면 HH_FEATURE), dtw_method: 'exact' 또는 'multiscale' (None이면 HH_DTW_METHOD).
+    반환값은 distance, frames, upload_hash, reference_hash, profile(실제로 쓴 프로필), feature, dtw와
+    저장된 점수를 그대로 돌려줬는지(cached).
+    """
+    # auto이면 업로드 영상 길이와 이 워커에서 측정한 추론 시간으로 프로필 결정
+    profile = resolve_profile(profile_name, upload_path)
+    model = load_profile_model(profile)
+    cache = get_result_cache()
+    params = pipeline_params(model_key(profile), track_subject=TRACK_SUBJECT, imgsz=profile.imgsz,
+                             max_inferences=MAX_INFERENCES if ADAPTIVE_SAMPLING else None)
+    feature = get_feature_extractor(feature_name, profile, model)
+    dtw_method = dtw_method or DTW_METHOD
+    upload_hash = upload_hash or file_sha256(upload_path)
+    reference_hash = file_sha256(reference_path)
+
+    # 같은 업로드 + 같은 레퍼런스 + 같은 특징/DTW 방식 조합은 저장된 점수를 그대로 반환
+    # (키포인트는 특징과 무관하므로 키포인트 키는 기본 params를 그대로 사용, exact DTW는 기존 점수 키와 같음)
+    score_key = cache_key('score', upload_hash, reference_hash,
+                          dict(params, feature=feature.key, **dtw_params(dtw_method)))
+    record = cache.get_record(score_key)
+    if record is not None:
+        progress.update(state='running', stage='done', decode=1.0, inference=1.0, dtw=1.0)
+        return dict(record, cached=True)
+
+    progress.update(state='running', stage='reference')
+    reference_keypoints = load_reference_keypoints(reference_path, model, model_key(profile),
+                                                   track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+    keypoints = _upload_keypoints(upload_path, upload_hash, profile, model, params, cache, progress, cancel_event)
+    progress['stage'] = 'dtw'
+
+    distance = calculate_dtw_distance(reference_keypoints, keypoints, feature=feature, method=dtw_method,
+                                      aspects=(frame_aspect(reference_path), frame_aspect(upload_path)))
+    record = {
+        'distance': float(distance),
+        'frames': int(len(keypoints)),
+        'upload_hash': upload_hash,
+        'reference_hash': reference_hash,
+        'profile': profile.name,
+        'feature': feature.name,
+        'dtw': dtw_method,
+    }
+    cache.put_record(score_key, record)
+    progress.update(dtw=1.0, stage='done')
+    return dict(record, cached=False)
+
+
+# 업로드 영상 키포인트 (같은 업로드는 다른 레퍼런스와 비교하거나 전체 동작과 비교할 때도 재사용)
+def _upload_keypoints(upload_path, upload_hash, profile, model, params, cache, progress, cancel_event):
+    def set_progress(key, done, total):
+        progress[key] = min(done / max(total, 1), 1.0)
+
+    keypoints_key = cache_key('keypoints', upload_hash, params)
+    keypoints = cache.get_sequence(keypoints_key)
+    if keypoints is None:
+        progress['stage'] = 'inference'
+        shards = shard_count(upload_path) if shard_budget() > 1 and not ADAPTIVE_SAMPLING else 1
+        if shards > 1:
+            # 긴 영상은 시간 구간으로 나눠 여러 워커 프로세스에서 추출 (구간 단위로 진행률 갱신)
+            def shard_progress(done, total):
+                set_progress('decode', done, total)
+                set_progress('inference', done, total)
+
+            keypoints = get_sharded_extractor(profile).extract(
+                upload_path, shards=shards, track_subject=TRACK_SUBJECT, cancel_event=cancel_event,
+                progress_callback=shard_progress, return_sequence=True,
+            )
+        else:
+            keypoints = extract_keypoints_pipelined(
+                upload_path, model, cancel_event=cancel_event,
+                decode_callback=lambda done, total: set_progress('decode', done, total),
+                progress_callback=lambda done, total: set_progress('inference', done, total),
+                track_subject=TRACK_SUBJECT, adaptive=ADAPTIVE_SAMPLING, return_sequence=True,
+            )
+        cache.put_sequence(keypoints_key, keypoints)
+    progress.update(decode=1.0, inference=1.0)
+    return keypoints
+
+
+# 워커 프로세스마다 (프로필 모델, 특징, 레퍼런스 영상 해시)별 레퍼런스 인덱스를 한 번만 생성
+_reference_indexes = {}
+
+
+def _reference_index(profile, feature_name, model, reference_hashes, progress, cancel_event):
+    feature = get_feature_extractor(feature_name, profile, model)
+    key = (model_key(profile), profile.imgsz, feature.key, reference_hashes)
+    index = _reference_indexes.get(key)
+    if index is None:
+        progress['stage'] = 'reference'
+        index = build_index(model, profile=profile, feature=feature_name, cancel_event=cancel_event,
+                            progress_callback=lambda done, total: progress.update(reference=done / max(total, 1)))
+        _reference_indexes[key] = index
+    progress['reference'] = 1.0
+    return index
+
+
+def _run_search(upload_path, progress, cancel_event, upload_hash=None, profile=None, feature=None, top_k=3):
+    with span('job.search') as job_span:
+        result = search(upload_path, progress, cancel_event, upload_hash, profile, feature, top_k)
+        job_span.set(cached=result['cached'], frames=result['frames'], profile=result['profile'],
+                     feature=result['feature'])
+    return result
+
+
+def search(upload_path, progress, cancel_event, upload_hash, profile_name, feature_name=None, top_k=3):
+    """
+    업로드 영상과 가장 가까운 레퍼런스 동작 top_k개를 찾아서 레코드(dict)를 반환 (이 프로세스에서 바로 실행).
+    인자는 compare와 같고, progress에는 레퍼런스 인덱스 생성 진행률(reference)도 기록.
+    반환값은 matches([거리, 영상 이름, 동작 이름] 목록), frames, upload_hash, profile, feature와 cached.
+    """
+    profile = resolve_profile(profile_name, upload_path)
+    model = load_profile_model(profile)
+    cache = get_result_cache()
+    params = pipeline_params(model_key(profile), track_subject=TRACK_SUBJECT, imgsz=profile.imgsz,
+                             max_inferences=MAX_INFERENCES if ADAPTIVE_SAMPLING else None)
+    feature = get_feature_extractor(feature_name, profile, model)
+    upload_hash = upload_hash or file_sha256(upload_path)
+    reference_paths = sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))
+    reference_hashes = tuple(file_sha256(path) for path in reference_paths)
+
+    # 같은 업로드 + 같은 레퍼런스 영상 전체 + 같은 특징이면 저장된 결과를 그대로 반환
+    search_key = cache_key('search', upload_hash, reference_hashes, dict(params, feature=feature.key, top_k=top_k))
+    record = cache.get_record(search_key)
+    if record is not None:
+        progress.update(state='running', stage='done', reference=1.0, decode=1.0, inference=1.0, dtw=1.0)
+        return dict(record, cached=True)
+
+    progress['state'] = 'running'
+    index = _reference_index(profile, feature_name, model, reference_hashes, progress, cancel_event)
+    keypoints = _upload_keypoints(upload_path, upload_hash, profile, model, params, cache, progress, cancel_event)
+    progress['stage'] = 'dtw'
+    matches = index.search(keypoints, top_k=top_k, aspect=frame_aspect(upload_path))
+    record = {
+        'matches': [[float(distance), name, label] for distance, name, label in matches],
+        'frames': int(len(keypoints)),
+        'upload_hash': upload_hash,
+        'profile': profile.name,
+        'feature': feature.name,
+    }
+    cache.put_record(search_key, record)
+    progress.update(dtw=1.0, stage='done')
+    return dict(record, cached=False)
+
+class _Job:
+    def __init__(self, job_id, future, progress, cancel_event):
+        self.id = job_id
+        self.future = future
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.created = time.time()
+        self.finished = None
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_CONCURRENT_JOBS, max_pending=MAX_PENDING_JOBS, model_factory=load_model):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.model_factory = model_factory
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._manager = None
+
+    # 풀과 Manager는 첫 작업이 들어올 때 시작 (torch가 있는 프로세스에서 fork하지 않도록 spawn 사용)
+    def _ensure_started(self):
+        if self._pool is None:
+            model_factory = self.model_factory
+            if DEFAULT_PROFILE == AUTO and model_factory is load_model:
+                # 프로필별 추론 시간은 별도 프로세스에서 한 번만 측정해서 모든 워커에 전달
+                model_factory = functools.partial(load_model, measure_latencies_isolated())
+            context = multiprocessing.get_context('spawn')
+            self._manager = context.Manager()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context,
+                initializer=_init_worker, initargs=(model_factory, max(1, SHARD_WORKERS // self.max_workers)),
+            )
+
+    # 워커 프로세스를 미리 띄워서 모델 로드/워밍업을 첫 요청 전에 끝냄
+    # (auto 프로필의 추론 시간 측정도 여기서 하므로 페이지가 기다리지 않도록 백그라운드 스레드에서 시작)
+    def warm_up(self):
+        threading.Thread(target=self._warm_up, name='job-warmup', daemon=True).start()
+
+    def _warm_up(self):
+        with self._lock:
+            self._ensure_started()
+            for _ in range(self.max_workers):
+                self._pool.submit(_noop)
+
+    def _purge(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > JOB_TTL:
+                del self._jobs[job_id]
+
+    def active_jobs(self):
+        return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def submit(self, reference_path, upload_path, upload_hash=None, profile=None, feature=None):
+        """
+        비교 작업을 등록하고 job id를 반환.
+        upload_hash(업로드 바이트의 SHA-256)를 넘기면 워커에서 다시 해시하지 않는다.
+        profile은 프로필 이름 또는 'auto' (None이면 배포 기본값 HH_PROFILE).
+        feature는 DTW 특징 이름 (feature_space.FEATURE_TYPES, None이면 HH_FEATURE).
+        """
+        profile, feature = self._check_options(profile, feature)
+        return self._submit(_run_comparison, (reference_path, upload_path), (upload_hash, profile, feature))
+
+    def submit_search(self, upload_path, upload_hash=None, profile=None, feature=None, top_k=3):
+        """
+        업로드 영상과 가장 가까운 레퍼런스 동작 top_k개를 찾는 작업을 등록하고 job id를 반환.
+        인자는 submit과 같고 결과는 search()의 레코드 (status의 reference는 레퍼런스 인덱스 생성 진행률).
+        """
+        profile, feature = self._check_options(profile, feature)
+        return self._submit(_run_search, (upload_path,), (upload_hash, profile, feature, top_k))
+
+    def _check_options(self, profile, feature):
+        profile = profile or DEFAULT_PROFILE
+        if profile != AUTO:
+            get_profile(profile)  # 잘못된 이름은 워커로 보내기 전에 KeyError
+        feature = feature or DEFAULT_FEATURE
+        if feature not in FEATURE_TYPES:
+            raise KeyError(f"알 수 없는 특징: {feature}")
+        return profile, feature
+
+    # fn(*paths, progress, cancel_event, *options)를 워커 풀에서 실행
+    def _submit(self, fn, paths, options):
+        with self._lock:
+            self._purge()
+            if self.active_jobs() >= self.max_pending:
+                raise TooManyJobs(f"대기 중인 작업이 너무 많습니다 ({self.max_pending}개)")
+            self._ensure_started()
+
+            job_id = uuid.uuid4().hex
+            progress = self._manager.dict(state='pending', stage='pending', reference=0.0, decode=0.0, inference=0.0,
+                                          dtw=0.0)
+            cancel_event = self._manager.Event()
+            future = self._pool.submit(fn, *paths, progress, cancel_event, *options)
+            job = _Job(job_id, future, progress, cancel_event)
+            self._jobs[job_id] = job
+            set_gauge('active_jobs', self.active_jobs())
+
+        def on_done(_):
+            job.finished = time.time()
+            set_gauge('active_jobs', self.active_jobs())
+
+        future.add_done_callback(on_done)
+        return job_id
+
+    def status(self, job_id):
+        """
+        {'state': pending/running/done/failed/cancelled, 'stage', 'reference', 'decode', 'inference', 'dtw', 'result',
+         'error'}
+        등록되지 않았거나 만료된 작업이면 None
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job.future
+        if not future.done():
+            return self._progress(job)
+
+        if future.cancelled() or isinstance(future.exception(), PipelineCancelled):
+            return dict(self._progress(job), state='cancelled')
+        if future.exception() is not None:
+            return dict(self._progress(job), state='failed', error=str(future.exception()))
+        return {'state': 'done', 'stage': 'done', 'reference': 1.0, 'decode': 1.0, 'inference': 1.0, 'dtw': 1.0,
+                'result': future.result()}
+
+    # Manager 프로세스가 이미 종료된 경우에도 상태를 돌려줄 수 있도록 처리
+    def _progress(self, job):
+        try:
+            return dict(job.progress)
+        except (EOFError, BrokenPipeError, ConnectionError):
+            return {'state': 'running', 'stage': 'unknown', 'reference': 0.0, 'decode': 0.0, 'inference': 0.0,
+                    'dtw': 0.0}
+
+    def result(self, job_id):
+        status = self.status(job_id)
+        return status.get('result') if status else None
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None or job.future.done():
+            return False
+        # 아직 시작되지 않았으면 바로 취소, 실행 중이면 파이프라인이 이벤트를 보고 중단
+        if not job.future.cancel():
+            job.cancel_event.set()
+        return True
+
+    def shutdown(self):
+        if self._pool is not None:
+            for job in self._jobs.values():
+                if not job.future.done():
+                    job.cancel_event.set()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = None
+            self._manager = None
@@ -0,0 +1,258 @@
+import cv2
+import numpy as np
+
+from .features import NUM_KEYPOINTS, normalize_keypoints
+from .metrics import incr, span
+from .sequence import KeypointSequence
+from .tracking import SubjectTracker, keypoint_confidence
+
+# 기본 YOLO 포즈 모델과 샘플링 설정
+MODEL_NAME = 'yolov8m-pose.pt'
+SAMPLE_FPS = 1  # 1초당 분석할 프레임 수
+BATCH_SIZE = 8  # 한 번의 YOLO 호출에 넣을 프레임 수
+DEFAULT_FPS = 30.0  # CAP_PROP_FPS를 읽지 못했을 때 사용할 값
+MAX_KEYPOINTS = 34  # Keypoints 배열의 고정된 크기 (17개의 keypoints, 각 2D 좌표)
+
+# YOLO 결과 하나에서 첫 번째 사람의 keypoints를 (17, 3) [정규화 x, 정규화 y, 신뢰도]로 꺼냄
+# (사람이 없으면 0으로 채운 배열, keypoints가 없는 결과이면 None)
+def result_to_points(result, frame_width, frame_height):
+    if result.keypoints is None:
+        return None
+
+    points = np.zeros((NUM_KEYPOINTS, 3), dtype=np.float32)
+    xy = result.keypoints.xy.cpu().numpy()
+    if len(xy):
+        count = min(NUM_KEYPOINTS, xy.shape[1])
+        points[:count, :2] = normalize_keypoints(xy[0, :count], frame_width, frame_height)
+        points[:count, 2] = keypoint_confidence(result.keypoints, xy)[0, :count]
+    return points
+
+# YOLO 결과 하나에서 keypoints를 꺼내 정규화/패딩한 (34,) 좌표 (keypoints가 없으면 None)
+def result_to_keypoints(result, frame_width, frame_height):
+    points = result_to_points(result, frame_width, frame_height)
+    return None if points is None else points[:, :2].reshape(MAX_KEYPOINTS)
+
+# 배치 하나 추론 (시간/프레임 수 기록)
+def _infer(model, batch):
+    with span('inference', frames=len(batch)):
+        results = model(batch)
+    incr('frames_inferred', len(batch))
+    return results
+
+# 배치 하나를 프레임마다 (17, 3) points 또는 None 목록으로 변환 (입력 프레임 순서와 같음)
+# tracker가 있으면 주 수행자 한 명만 추적해서 추출
+def batch_to_points(model, batch, frame_width, frame_height, tracker=None):
+    if tracker is not None:
+        points_list = tracker.process(batch)
+        incr('frames_inferred', len(batch))
+        return points_list
+    return [result_to_points(result, frame_width, frame_height) for result in _infer(model, batch)]
+
+# 배치 하나를 (34,) keypoints 목록으로 변환 (keypoints가 없는 결과는 제외)
+def batch_to_keypoints(model, batch, frame_width, frame_height, tracker=None):
+    return [points[:, :2].reshape(MAX_KEYPOINTS)
+            for points in batch_to_points(model, batch, frame_width, frame_height, tracker) if points is not None]
+
+# 비디오 FPS 읽기 (0, NaN 등 잘못된 값이면 DEFAULT_FPS 사용, 29.97 같은 소수 FPS는 그대로 유지)
+def get_video_fps(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if not fps or fps != fps or fps <= 0 or fps > 1000:
+        return DEFAULT_FPS
+    return float(fps)
+
+# 영상의 가로/세로 비율 (읽을 수 없으면 None), 정규화 좌표로 관절 각도를 계산할 때 x축 보정에 사용
+def frame_aspect(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        width, height = cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+    finally:
+        cap.release()
+    return float(width / height) if width > 0 and height > 0 else None
+
+# 샘플 간격 (프레임 단위): target_frames가 있으면 영상 전체에서 고르게 target_frames개
+def sample_step(fps, total_frames, sample_fps=SAMPLE_FPS, target_frames=None):
+    if target_frames and total_frames > 0:
+        return max(1.0, total_frames / float(target_frames))
+    return max(1.0, fps / float(sample_fps))
+
+# 샘플링할 프레임만 디코딩하는 제너레이터: (프레임 번호, 초 단위 timestamp, 프레임)
+# 건너뛰는 프레임은 grab()만 호출해서 BGR 변환 비용을 없애고,
+# seek=True이면 CAP_PROP_POS_FRAMES로 직접 이동 (샘플 간격이 키프레임 간격보다 훨씬 클 때 유리)
+# start/stop을 주면 [start, stop) 번째 샘플만 반환 (start 샘플 위치로 먼저 seek, 시간 분할 추출용)
+def iter_sampled_frames(cap, sample_fps=SAMPLE_FPS, target_frames=None, seek=False, start=0, stop=None):
+    fps = get_video_fps(cap)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    step = sample_step(fps, total_frames, sample_fps, target_frames)
+
+    next_sample = 0.0
+    frame_index = 0
+    for _ in range(start):  # 전체 추출과 같은 누적 방식으로 시작 위치 계산 (반올림 결과가 같도록)
+        next_sample += step
+    if start and int(round(next_sample)) > 0:
+        frame_index = int(round(next_sample))
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    sample = start
+    while cap.isOpened():
+        sample_index = int(round(next_sample))
+        if (total_frames and sample_index >= total_frames) or (stop is not None and sample >= stop):
+            break
+
+        if seek and sample_index > frame_index:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, sample_index)
+            frame_index = sample_index
+
+        # 다음 샘플 위치까지는 디코딩 결과를 버리는 grab()만 사용
+        while frame_index < sample_index:
+            if not cap.grab():
+                return
+            frame_index += 1
+
+        ret, frame = cap.read()
+        if not ret:
+            return
+        yield frame_index, frame_index / fps, frame
+
+        frame_index += 1
+        next_sample += step
+        sample += 1
+
+# 샘플 프레임 수 (iter_sampled_frames가 total_frames 안에서 고르는 개수)
+def count_samples(fps, total_frames, sample_fps=SAMPLE_FPS, target_frames=None):
+    step = sample_step(fps, total_frames, sample_fps, target_frames)
+    count = 0
+    next_sample = 0.0
+    while int(round(next_sample)) < total_frames:
+        count += 1
+        next_sample += step
+    return count
+
+# 샘플 프레임 (프레임 번호, timestamp, 프레임)을 batch_size개씩 추론해서 스무딩 전 KeypointSequence로 모음
+# (keypoints가 없는 결과는 제외)
+def collect_sequence(frames, model, frame_width, frame_height, batch_size=BATCH_SIZE, tracker=None, capacity=None):
+    sequence = KeypointSequence(capacity) if capacity else KeypointSequence()
+    batch_size = max(1, int(batch_size))
+
+    def flush(batch, timestamps):
+        # YOLO로 배치 단위 포즈 추출 (결과는 입력 프레임 순서와 동일)
+        for points, timestamp in zip(batch_to_points(model, batch, frame_width, frame_height, tracker), timestamps):
+            if points is not None:
+                sequence.append(points, timestamp)
+
+    batch = []
+    timestamps = []
+    for _, timestamp, frame in frames:
+        batch.append(frame)
+        timestamps.append(timestamp)
+        if len(batch) == batch_size:
+            flush(batch, timestamps)
+            batch = []
+            timestamps = []
+
+    # 남은 프레임 처리
+    if batch:
+        flush(batch, timestamps)
+    return sequence
+
+# 추출한 시퀀스 마무리: 움직임 기반 샘플은 고정 간격 시간축으로 보간(레퍼런스와 같은 시간 해상도)하고 스무딩
+def finish_sequence(sequence, sample_fps=SAMPLE_FPS, sampling_stats=None):
+    if sampling_stats and len(sequence):
+        from .sampling import to_uniform_grid
+
+        sequence = to_uniform_grid(sequence, sampling_stats, sample_fps)
+
+    # keypoints 시퀀스에 스무딩 적용
+    if len(sequence) > 3:  # 스무딩 적용 가능한 최소 길이 확인
+        with span('features.smoothing', frames=len(sequence)):
+            sequence = sequence.smoothed()
+    return sequence
+
+# 추출 함수의 반환 형식: return_sequence=True이면 KeypointSequence 그대로,
+# 아니면 기존 형식의 (T, 34) float32 배열 (return_timestamps=True이면 (배열, timestamps))
+def sequence_result(sequence, return_timestamps=False, return_sequence=False):
+    if return_sequence:
+        return sequence
+    if return_timestamps:
+        return sequence.flat_xy(), np.array(sequence.timestamps)
+    return sequence.flat_xy()
+
+# 비디오에서 keypoints 추출하는 함수 (기본 1초당 1개의 프레임만 분석)
+# 샘플링된 프레임은 batch_size개씩 모아서 한 번에 추론 (메모리는 batch_size 프레임까지만 사용)
+# track_subject=True이면 주 수행자만 추적하면서 그 주변을 잘라낸 영역으로 추론 (tracking.SubjectTracker)
+# adaptive=True이면 움직임이 있는 프레임 위주로 최대 max_inferences번만 추론하고 고정 간격 시간축으로 보간
+# (sampling.iter_keyframes, target_frames는 무시)
+# return_timestamps=True이면 (keypoints, 각 행의 초 단위 timestamp)를 반환
+# return_sequence=True이면 신뢰도와 timestamp를 함께 담은 sequence.KeypointSequence를 반환
+def extract_keypoints(video_path, model, batch_size=BATCH_SIZE, sample_fps=SAMPLE_FPS, target_frames=None,
+                      track_subject=False, adaptive=False, max_inferences=None, return_timestamps=False,
+                      return_sequence=False, server=None):
+    # server: 추론 서버 주소 (inference_server), 이때 model은 서버에서 쓸 프로필 이름 (None이면 서버 기본 프로필)
+    if server:
+        from .inference_server import connect
+
+        model = connect(server, model)
+    cap = cv2.VideoCapture(video_path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    tracker = SubjectTracker(model) if track_subject else None
+
+    sampling_stats = {}
+    if adaptive:
+        from .sampling import MAX_INFERENCES, iter_keyframes
+
+        frames = iter_keyframes(cap, sample_fps, max_inferences or MAX_INFERENCES, sampling_stats)
+    else:
+        frames = iter_sampled_frames(cap, sample_fps, target_frames)
+
+    try:
+        sequence = collect_sequence(frames, model, frame_width, frame_height, batch_size, tracker)
+    finally:
+        cap.release()
+
+    sequence = finish_sequence(sequence, sample_fps, sampling_stats)
+    return sequence_result(sequence, return_timestamps, return_sequence)
+
+
+# 전체 프레임 디코딩 vs 샘플 프레임만 디코딩 시간 비교
+# python -m screen.keypoints src/mp4/*.mp4
+def benchmark_decode(video_paths, sample_fps=SAMPLE_FPS):
+    import time
+
+    report = []
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        interval = max(1, int(round(get_video_fps(cap) / sample_fps)))
+        start = time.perf_counter()
+        frame_count = 0
+        while True:
+            ret, _ = cap.read()
+            if not ret:
+                break
+            frame_count += 1
+        read_all = time.perf_counter() - start
+        cap.release()
+
+        cap = cv2.VideoCapture(video_path)
+        start = time.perf_counter()
+        sampled = sum(1 for _ in iter_sampled_frames(cap, sample_fps))
+        sampled_time = time.perf_counter() - start
+        cap.release()
+
+        report.append((video_path, frame_count, sampled, read_all, sampled_time))
+        print(f"{video_path}: {frame_count}프레임 중 {sampled}개 (간격 {interval}), "
+              f"read {read_all:.2f}s -> grab {sampled_time:.2f}s")
+
+    total_read = sum(r[3] for r in report)
+    total_sampled = sum(r[4] for r in report)
+    if total_sampled > 0:
+        print(f"합계: read {total_read:.2f}s -> grab {total_sampled:.2f}s ({total_read / total_sampled:.2f}x)")
+    return report
+
+
+if __name__ == '__main__':
+    import sys
+    import glob
+    import os
+
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(os.path.dirname(__file__), '../src/mp4/*.mp4')))
+    benchmark_decode(paths)
@@ -0,0 +1,156 @@
+import os
+import glob
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .dtw_engine import default_window, dtw_distance, lb_keogh
+from .feature_space import RelativeDistanceFeature, get_feature_extractor
+from .keypoints import frame_aspect
+from .metrics import timed
+from .pipeline import PipelineCancelled
+from .profiles import base_profile, model_key
+from .reference_store import REFERENCE_VIDEO_DIR, load_reference_keypoints
+from .tracking import TRACK_SUBJECT
+
+# 레퍼런스 영상 전체에서 업로드 영상과 가장 가까운 동작 찾기
+# 싼 하한(LB_Kim -> LB_Keogh)으로 대부분의 후보를 먼저 걸러내고, 남은 후보만 DTW를 워커 풀에서 계산
+
+# 동작 이름 -> 레퍼런스 영상 파일
+ACTION_VIDEOS = {
+    "로우 런지(Low Lunge)": 'video1.mp4',
+    "파르브리타 자누 시르사아사나(Revolved Head-to-Knee Pose)": 'video6.mp4',
+    "선 활 자세(Standing Split)": 'video3.mp4',
+    "런지 사이트 스트레칭(Lunging Side Stretch)": 'video4.mp4',
+    "안전한 허리 스트레칭": 'video5.mp4',
+    "골반저근 강화 운동": 'video6.mp4',
+}
+DEFAULT_REFERENCE_VIDEO = 'video6.mp4'
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+# 동작의 레퍼런스 영상 경로 (등록되지 않은 동작이면 기본 영상)
+def reference_video_path(action=None, video_dir=REFERENCE_VIDEO_DIR):
+    return os.path.join(video_dir, ACTION_VIDEOS.get(action, DEFAULT_REFERENCE_VIDEO))
+
+
+# 영상 파일에 해당하는 동작 이름들 (없으면 파일 이름)
+def video_label(video_name):
+    actions = [action for action, name in ACTION_VIDEOS.items() if name == video_name]
+    return ', '.join(actions) if actions else video_name
+
+
+class ReferenceIndex:
+    """레퍼런스 영상들의 특징 시퀀스와 하한 계산용 요약값을 메모리에 보관"""
+
+    def __init__(self, entries, feature=None):
+        # entries: [(영상 파일 이름, (T, D) 특징 시퀀스)], feature: 질의에도 같은 특징을 쓰기 위한 특징 추출기
+        self.feature = feature or RelativeDistanceFeature()
+        self.names = [name for name, _ in entries]
+        self.features = [np.ascontiguousarray(feature, dtype=np.float64) for _, feature in entries]
+        # LB_Kim용 첫/마지막 프레임, 전역 envelope (윈도우와 무관한 가장 싼 하한)
+        self.first = np.array([feature[0] for feature in self.features])
+        self.last = np.array([feature[-1] for feature in self.features])
+        self.upper = np.array([feature.max(axis=0) for feature in self.features])
+        self.lower = np.array([feature.min(axis=0) for feature in self.features])
+
+    def __len__(self):
+        return len(self.names)
+
+    # 모든 후보에 대한 LB_Kim을 한 번에 계산
+    def lb_kim_all(self, query):
+        first = np.sum((self.first - query[0]) ** 2, axis=1)
+        last = np.sum((self.last - query[-1]) ** 2, axis=1)
+        return np.sqrt(first + last)
+
+    # 모든 후보의 전역 envelope 기준 LB_Keogh (윈도우 없는 envelope이므로 느슨하지만 매우 쌈)
+    def lb_envelope_all(self, query):
+        excess = (np.maximum(query[None] - self.upper[:, None], 0)
+                  + np.maximum(self.lower[:, None] - query[None], 0))
+        return np.sqrt(np.sum(excess ** 2, axis=(1, 2)))
+
+    @timed('library.search')
+    def search(self, query_keypoints, top_k=3, window=None, max_workers=MAX_WORKERS, aspect=None):
+        """
+        query_keypoints (T, 34)와 가장 가까운 레퍼런스 top_k개를 [(거리, 영상 이름, 동작 이름)]으로 반환.
+        aspect: 질의 영상의 가로/세로 비율 (특징 추출기에 넘김, feature_space 참고).
+        통계는 self.last_stats에 기록 (후보 수, LB_Kim/envelope 하한으로 걸러진 수, LB_Keogh로 걸러진 수, DTW 계산 수).
+        """
+        query = self.feature(query_keypoints, dtype=np.float64, aspect=aspect)
+        stats = {'candidates': len(self), 'pruned_bound': 0, 'pruned_keogh': 0, 'dtw': 0}
+        self.last_stats = stats
+        if len(query) == 0 or len(self) == 0:
+            return []
+
+        # 하한이 작은 후보부터 확인해야 top_k 기준값이 빨리 좁혀짐
+        bounds = np.maximum(self.lb_kim_all(query), self.lb_envelope_all(query))
+        order = np.argsort(bounds)
+
+        best = []  # (-거리, 인덱스) 최대 힙, 길이 top_k
+        def kth_best():
+            return -best[0][0] if len(best) == top_k else None
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            position = 0
+            while position < len(order):
+                cutoff = kth_best()
+                if cutoff is not None and bounds[order[position]] >= cutoff:
+                    # 정렬된 순서이므로 나머지도 모두 걸러짐
+                    stats['pruned_bound'] += len(order) - position
+                    break
+
+                # 다음 max_workers개 후보를 윈도우 기반 LB_Keogh로 한 번 더 거른 뒤 DTW 병렬 실행
+                wave = []
+                while position < len(order) and len(wave) < max_workers:
+                    index = order[position]
+                    position += 1
+                    if cutoff is not None and bounds[index] >= cutoff:
+                        stats['pruned_bound'] += 1
+                        continue
+                    candidate = self.features[index]
+                    candidate_window = window if window is not None else default_window(len(query), len(candidate))
+                    if cutoff is not None:
+                        lb = max(lb_keogh(query, candidate, candidate_window),
+                                 lb_keogh(candidate, query, candidate_window))
+                        if lb >= cutoff:
+                            stats['pruned_keogh'] += 1
+                            continue
+                    wave.append((index, pool.submit(dtw_distance, query, candidate,
+                                                    candidate_window, cutoff, False, False)))
+
+                for index, future in wave:
+                    distance = future.result()
+                    stats['dtw'] += 1
+                    if not np.isfinite(distance):
+                        continue
+                    if len(best) < top_k:
+                        heapq.heappush(best, (-distance, index))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, index))
+
+        return [(distance, self.names[index], video_label(self.names[index]))
+                for distance, index in sorted((-d, i) for d, i in best)]
+
+
+# src/mp4의 모든 레퍼런스 영상으로 인덱스 생성 (저장소에 없는 영상은 model로 추출)
+# profile은 저장소 키를 고르는 데 사용 (None이면 배포 기본 프로필, model도 같은 프로필이어야 함)
+# feature는 특징 이름 (None이면 feature_space.DEFAULT_FEATURE)
+# progress_callback(완료 영상 수, 전체 영상 수)로 진행률 보고, cancel_event가 설정되면 영상 사이에서 PipelineCancelled
+def build_index(model=None, video_dir=REFERENCE_VIDEO_DIR, profile=None, feature=None, progress_callback=None,
+                cancel_event=None):
+    profile = profile or base_profile()
+    extractor = get_feature_extractor(feature, profile, model)
+    video_paths = sorted(glob.glob(os.path.join(video_dir, '*.mp4')))
+    entries = []
+    for done, video_path in enumerate(video_paths, start=1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise PipelineCancelled()
+        keypoints = load_reference_keypoints(video_path, model, model_key(profile),
+                                             track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+        if len(keypoints):
+            entries.append((os.path.basename(video_path),
+                            extractor(keypoints, dtype=np.float64, aspect=frame_aspect(video_path))))
+        if progress_callback is not None:
+            progress_callback(done, len(video_paths))
+    return ReferenceIndex(entries, extractor)
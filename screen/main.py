@@ -1,16 +1,32 @@
 import os
-import cv2
-import numpy as np
-import tempfile
 import streamlit as st
-import json
+import sys
+import uuid
 import time
+import hmac
+import logging
 
-from ultralytics import YOLO
-from dtaidistance import dtw
-from openai import OpenAI 
 from PIL import Image
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from screen.feature_space import DEFAULT_FEATURE, FEATURE_TYPES
+from screen.library import reference_video_path
+from screen.jobs import JobManager, TooManyJobs
+from screen.profiles import (AUTO, DEFAULT_PROFILE, PROFILES, base_profile, load_profile_model, model_key,
+                             start_profile_warmup)
+from screen.reference_store import load_reference_keypoints
+from screen.streaming import (STREAM_SAMPLE_FPS, UI_UPDATE_INTERVAL, StreamingComparison, StreamSession,
+                              VideoReplaySource, WebcamSource)
+from screen.feedback import FeedbackError, get_feedback_service
+from screen.metrics import MAX_EVENTS, aggregate, read_events
+from screen.tracking import TRACK_SUBJECT
+from screen.uploads import spool_upload, start_sweeper, touch_session
+
+JOB_POLL_INTERVAL = 0.5  # 비교 작업 진행 상황 갱신 주기 (초)
+ADMIN_TOKEN = os.environ.get('HH_ADMIN_TOKEN', '')  # ?admin=<토큰> 으로 관리자 페이지 접근 (비어 있으면 사용 안 함)
+MIN_ADMIN_TOKEN_LENGTH = 16  # 이보다 짧은(추측하기 쉬운) 토큰이면 관리자 페이지를 열지 않음
+FEEDBACK_ERROR_MESSAGE = "피드백을 생성하는 동안 문제가 발생했습니다. 다시 시도해주세요."
+
 # .venv\Scripts\activate
 # streamlit run screen/main.py
 
@@ -36,10 +52,50 @@ if 'uploaded_video_path' not in st.session_state:
 if 'description_video_path' not in st.session_state:
     st.session_state.description_video_path = None
 
-# YOLO 모델 로드
-@st.cache_resource
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+if 'spooled_uploads' not in st.session_state:
+    st.session_state.spooled_uploads = {}  # 업로드 file_id -> (디스크 경로, SHA-256)
+
+if 'comparison_job_id' not in st.session_state:
+    st.session_state.comparison_job_id = None
+
+if 'comparison_advice' not in st.session_state:
+    st.session_state.comparison_advice = None
+
+if 'search_job_id' not in st.session_state:
+    st.session_state.search_job_id = None  # 전체 동작과 비교 작업
+
+if 'stream_session' not in st.session_state:
+    st.session_state.stream_session = None  # 실시간 비교 (streaming.StreamSession)
+
+# YOLO 모델 로드 (배포 기본 프로필, 프로세스당 한 번, 워밍업이 진행 중이면 끝날 때까지 대기)
 def load_yolo_model():
-    return YOLO('yolov8m-pose.pt', verbose=False)
+    return load_profile_model(base_profile())
+
+# 비디오 비교 작업 관리자 (서버 프로세스당 하나, 모든 세션이 공유)
+@st.cache_resource
+def get_job_manager():
+    job_manager = JobManager()
+    job_manager.warm_up()
+    return job_manager
+
+# 서버 시작 시 한 번만 모델 로드/워밍업과 작업 워커 시작을 백그라운드로 실행
+# (load_yolo_model과 같은 경로라서 ONNX 백엔드/추론 서버 설정을 그대로 따름)
+@st.cache_resource
+def start_warmup():
+    get_job_manager()
+    return start_profile_warmup(base_profile())
+
+start_warmup()
+
+# 오래된 세션 업로드 파일 정리 스레드 (프로세스당 한 번)
+@st.cache_resource
+def start_upload_sweeper():
+    return start_sweeper()
+
+start_upload_sweeper()
 
 # 이미지 경로 확인 함수 추가
 def check_image_paths(image_paths):
@@ -199,7 +255,7 @@ def page1():
                             "4. 상체는 곧게 세우고 깊은 호흡으로 자세의 에너지를 느껴보세요."
                         ])
                 ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video1.mp4')
+            "video_path": reference_video_path("로우 런지(Low Lunge)")
         },
         "파르브리타 자누 시르사아사나(Revolved Head-to-Knee Pose)": {
             "title": "파르브리타 자누 시르사아사나(Revolved Head-to-Knee Pose)",
@@ -230,7 +286,7 @@ def page1():
                             "4. 반대쪽 팔은 우아하게 하늘을 향해 들어올려요."
                         ])
                     ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video6.mp4')
+            "video_path": reference_video_path("파르브리타 자누 시르사아사나(Revolved Head-to-Knee Pose)")
         },
         "선 활 자세(Standing Split)": {
             "title": "선 활 자세(Standing Split)",
@@ -260,7 +316,7 @@ def page1():
                     "4. 상체를 앞으로 기울이며 자세의 균형을 유지해요."
                 ])
             ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video3.mp4')
+            "video_path": reference_video_path("선 활 자세(Standing Split)")
         },
         "런지 사이트 스트레칭(Lunging Side Stretch)": {
             "title": "런지 사이트 스트레칭(Lunging Side Stretch)",
@@ -292,7 +348,7 @@ def page1():
                     "4. 호흡과 함께 상체를 측면으로 천천히 기울여요."
                 ])
             ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video4.mp4')
+            "video_path": reference_video_path("런지 사이트 스트레칭(Lunging Side Stretch)")
         },
                 "안전한 허리 스트레칭": {
             "title": "안전한 허리 스트레칭",
@@ -319,7 +375,7 @@ def page1():
                     "4. 호흡을 깊고 천천히 가져가요."
                 ])
             ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video5.mp4')
+            "video_path": reference_video_path("안전한 허리 스트레칭")
         },
         "골반저근 강화 운동": {
             "title": "골반저근 강화 운동",
@@ -346,7 +402,7 @@ def page1():
                     "4. 호흡과 함께 천천히 이완해요."
                 ])
             ],
-            "video_path": os.path.join(os.path.dirname(__file__), '../src/mp4/video6.mp4')
+            "video_path": reference_video_path("골반저근 강화 운동")
         },
     }
 
@@ -378,195 +434,214 @@ def page1():
 
 # 페이지 2: 사용자 비디오 업로드 및 비교 페이지
 def page2():
-    # OpenAI API 키 설정 (환경 변수에서 불러오기)
-    # openai.api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI()
-
-    # GPT-4 피드백 생성 함수
-    def get_advice_based_on_similarity(dtw_distance, action_name):
-        user_message = (
-            f"사용자와 '{action_name}' 동작을 비교한 결과, DTW 거리 값은 {dtw_distance}입니다.\n"
-            "이 값에 기반하여 피드백을 제공해주세요:\n"
-            "- 유사도가 낮을 경우: 자세를 교정하기 위한 구체적인 피드백 제공.\n"
-            "- 유사도가 높을 경우: 칭찬과 간단한 개선점을 제안.\n"
-        )
-        messages = [
-            {"role": "system", "content": "당신은 피트니스 전문가입니다."},
-            {"role": "user", "content": user_message},
-        ]
+    # GPT-4 피드백을 토큰 단위로 스트리밍 (실패하면 오류 메시지 표시)
+    def stream_advice(dtw_distance, action_name):
         try:
-            # OpenAI API 호출
-            result = client.chat.completions.create(
-                model="gpt-4o",  # OpenAI API 모델명
-                messages=messages,
-                temperature=0.7
-            )
-            advice = result.choices[0].message.content  # GPT-4의 응답 추출
-            return advice
-        except Exception as e:
+            yield from get_feedback_service().stream_advice(dtw_distance, action_name)
+        except FeedbackError as e:
             st.error(f"오류 발생: {str(e)}")
-            return "피드백을 생성하는 동안 문제가 발생했습니다. 다시 시도해주세요."
-        
-    # YOLO 모델 불러오기
-    model = YOLO('yolov8m-pose.pt')  # YOLOv8 포즈 모델 경로
-
-    # keypoints 좌표를 [0, 1]로 정규화하는 함수
-    def normalize_keypoints(keypoints, frame_width, frame_height):
-        normalized_keypoints = np.copy(keypoints)
-        for i in range(0, len(keypoints), 2):
-            normalized_keypoints[i] = keypoints[i] / frame_width  # x 좌표
-            normalized_keypoints[i + 1] = keypoints[i + 1] / frame_height  # y 좌표
-        return normalized_keypoints
-
-    # Keypoints 간 상대적 거리 계산
-    def calculate_relative_distances(keypoints):
-        num_keypoints = len(keypoints) // 2
-        relative_distances = []
-        
-        # 각 keypoint 사이의 거리를 계산 (유클리드 거리)
-        for i in range(num_keypoints):
-            for j in range(i + 1, num_keypoints):
-                x1, y1 = keypoints[2 * i], keypoints[2 * i + 1]
-                x2, y2 = keypoints[2 * j], keypoints[2 * j + 1]
-                distance = np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-                relative_distances.append(distance)
-        
-        return np.array(relative_distances)
-
-    # Keypoints 시퀀스를 스무딩하는 함수
-    def smooth_keypoints(sequence, window_size=3):
-        smoothed_sequence = []
-        for i in range(sequence.shape[1]):  # 각 keypoint에 대해
-            smoothed = np.convolve(sequence[:, i], np.ones(window_size)/window_size, mode='valid')
-            smoothed_sequence.append(smoothed)
-        smoothed_sequence = np.array(smoothed_sequence).T
-        return smoothed_sequence
-
-    # 비디오에서 keypoints 추출하는 함수 (1초당 1개의 프레임만 분석)
-    def extract_keypoints(video_path, model):
-        cap = cv2.VideoCapture(video_path)
-        keypoints_sequence = []
-        max_keypoints = 34  # Keypoints 배열의 고정된 크기 (17개의 keypoints, 각 2D 좌표)
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))  # FPS 가져오기
-        frame_interval = fps  # 1초에 한 프레임을 가져오기 위해 interval을 FPS로 설정
-        
-        frame_count = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % frame_interval == 0:  # 1초당 1 프레임 추출
-                # YOLO로 프레임에서 포즈 추출
-                results = model(frame)
-
-                for result in results:
-                    if result.keypoints is not None:
-                        # Keypoints 추출 (xy 좌표만 사용)
-                        keypoints = result.keypoints.xy.cpu().numpy()  # NumPy 배열로 변환
-                        xy_keypoints = keypoints.flatten()  # 1D로 평탄화
-                        
-                        # 좌표 정규화
-                        normalized_keypoints = normalize_keypoints(xy_keypoints, frame_width, frame_height)
-
-                        # Keypoints 배열의 크기를 고정 (34로 맞춤, 부족하면 0으로 패딩)
-                        if len(normalized_keypoints) < max_keypoints:
-                            padded_keypoints = np.zeros(max_keypoints)
-                            padded_keypoints[:len(normalized_keypoints)] = normalized_keypoints
-                            keypoints_sequence.append(padded_keypoints)
-                        else:
-                            keypoints_sequence.append(normalized_keypoints[:max_keypoints])
-            
-            frame_count += 1
-
-        cap.release()
-
-        # keypoints_sequence를 배열로 변환
-        keypoints_sequence = np.array(keypoints_sequence)
-
-        # keypoints 시퀀스에 스무딩 적용
-        if len(keypoints_sequence) > 3:  # 스무딩 적용 가능한 최소 길이 확인
-            keypoints_sequence = smooth_keypoints(keypoints_sequence)
-
-        return keypoints_sequence
-
-    # 두 시퀀스 간의 DTW 거리 계산 (상대적 거리 기반)
-    def calculate_dtw_distance(seq1, seq2):
-        # 각 시퀀스의 상대적 거리 계산
-        seq1_relative = np.array([calculate_relative_distances(frame) for frame in seq1])
-        seq2_relative = np.array([calculate_relative_distances(frame) for frame in seq2])
-
-        # 시퀀스 길이 맞추기
-        min_len = min(len(seq1_relative), len(seq2_relative))
-        seq1_flat = seq1_relative[:min_len]  # 두 시퀀스의 길이를 동일하게 맞춤
-        seq2_flat = seq2_relative[:min_len]
-
-        # 프레임별로 DTW 거리 계산
-        distances = []
-        for i in range(min_len):
-            if np.any(np.isnan(seq1_flat[i])) or np.any(np.isnan(seq2_flat[i])):
-                distances.append(np.inf)  # NaN이 있는 경우, 무한대로 처리
-            else:
-                distance = dtw.distance(seq1_flat[i], seq2_flat[i])
-                distances.append(distance)
-
-        return np.mean(distances)
-
-    # 두 영상의 유사도를 계산하는 메인 함수
-    def compare_videos(video_path1, video_path2, model):
-        st.info('첫 번째 비디오의 키포인트를 추출 중입니다...')
-        keypoints_seq1 = extract_keypoints(video_path1, model)
-        
-        st.info('두 번째 비디오의 키포인트를 추출 중입니다...')
-        keypoints_seq2 = extract_keypoints(video_path2, model)
-
-        st.info('DTW 거리를 계산 중입니다...')
-        dtw_distance = calculate_dtw_distance(keypoints_seq1, keypoints_seq2)
-        
+            yield FEEDBACK_ERROR_MESSAGE
+
+    # YOLO 모델 불러오기 (프로세스 공용 모델)
+    model = load_yolo_model()
+
+    # 업로드 영상을 세션 디렉터리에 한 번만 저장 (rerun마다 다시 쓰지 않음)
+    def ingest_upload(uploaded_file):
+        spooled = st.session_state.spooled_uploads.get(uploaded_file.file_id)
+        if spooled is None or not os.path.exists(spooled[0]):
+            spooled = spool_upload(uploaded_file, st.session_state.session_id)
+            st.session_state.spooled_uploads[uploaded_file.file_id] = spooled
+        else:
+            touch_session(st.session_state.session_id)
+        return spooled
+
+    # 두 영상의 유사도 비교를 백그라운드 작업으로 등록
+    def start_comparison(video_path1, video_path2, upload_hash, profile, feature=None):
+        job_manager = get_job_manager()
+        if st.session_state.comparison_job_id:
+            job_manager.cancel(st.session_state.comparison_job_id)  # 이전 비교는 더 이상 필요 없음
+        try:
+            job_id = job_manager.submit(video_path1, video_path2, upload_hash=upload_hash, profile=profile,
+                                        feature=feature)
+        except TooManyJobs:
+            st.warning('현재 비교 요청이 많습니다. 잠시 후 다시 시도해주세요.')
+            return False
+        st.session_state.comparison_job_id = job_id
+        st.session_state.comparison_advice = None
+        return True
+
+    # 작업이 끝날 때까지 진행 상황 표시 후 마지막 상태 반환 (bars: [(progress 키, 이름)])
+    # 위젯 갱신 중 다른 입력으로 rerun되면 여기서 빠져나가지만 작업은 계속 실행됨
+    def wait_for_job(job_manager, job_id, status, bars, cancel_label):
+        if status['state'] not in ('pending', 'running'):
+            return status
+        if st.button(cancel_label):
+            job_manager.cancel(job_id)
+        stage_text = st.empty()
+        progress_bars = [(key, label, st.progress(0.0, text=label)) for key, label in bars]
+        while status['state'] in ('pending', 'running'):
+            stage_text.info('대기 중입니다...' if status['state'] == 'pending' else f"진행 중: {status['stage']}")
+            for key, label, bar in progress_bars:
+                bar.progress(status[key], text=label)
+            time.sleep(JOB_POLL_INTERVAL)
+            status = job_manager.status(job_id)
+        stage_text.empty()
+        for _, _, bar in progress_bars:
+            bar.empty()
+        return status
+
+    # 비교 작업의 진행 상황/결과 표시 (rerun이나 페이지 이동 후에도 job id로 다시 조회)
+    def show_comparison_job():
+        job_id = st.session_state.comparison_job_id
+        if not job_id:
+            return
+        job_manager = get_job_manager()
+        status = job_manager.status(job_id)
+        if status is None:
+            st.session_state.comparison_job_id = None
+            return
+
+        status = wait_for_job(job_manager, job_id, status,
+                              [('decode', '디코딩'), ('inference', '포즈 추출'), ('dtw', 'DTW')], '비교 취소')
+        if status['state'] == 'cancelled':
+            st.warning('비교가 취소되었습니다.')
+            return
+        if status['state'] == 'failed':
+            st.error(f"오류 발생: {status.get('error')}")
+            return
+
+        result = status['result']
+        dtw_distance = result['distance']
         st.success(f"두 비디오 간의 DTW 거리: {dtw_distance}")
-        
-            # 피드백 생성 요청
-        st.info('피드백을 생성 중입니다...')
-        action_name = "동작"  # 예시: 동작명을 지정하세요.
-        advice = get_advice_based_on_similarity(dtw_distance, action_name)
-        
-        st.info('피드백:')
-        st.write(advice)
-
-        return dtw_distance
-
+        if result.get('profile'):
+            st.caption(f"분석 모드: {result['profile']}, 특징: {result.get('feature', 'relative_distances')}")
 
+        # 피드백은 작업당 한 번만 생성 (같은 동작 + 비슷한 거리면 서비스 캐시에서 바로 반환)
+        st.info('피드백:')
+        if st.session_state.comparison_advice is None:
+            action_name = st.session_state.selected_action or "동작"
+            st.session_state.comparison_advice = st.write_stream(stream_advice(dtw_distance, action_name))
+        else:
+            st.write(st.session_state.comparison_advice)
+
+    # 업로드 영상을 모든 레퍼런스 영상과 비교하는 작업 등록 (선택한 분석 모드/특징 사용)
+    def start_search(video_path, upload_hash, profile, feature=None):
+        job_manager = get_job_manager()
+        if st.session_state.search_job_id:
+            job_manager.cancel(st.session_state.search_job_id)
+        try:
+            st.session_state.search_job_id = job_manager.submit_search(video_path, upload_hash=upload_hash,
+                                                                       profile=profile, feature=feature)
+        except TooManyJobs:
+            st.warning('현재 비교 요청이 많습니다. 잠시 후 다시 시도해주세요.')
+
+    # 가장 가까운 동작 찾기 작업의 진행 상황/결과 표시
+    def show_search_job():
+        job_id = st.session_state.search_job_id
+        if not job_id:
+            return
+        job_manager = get_job_manager()
+        status = job_manager.status(job_id)
+        if status is None:
+            st.session_state.search_job_id = None
+            return
+
+        status = wait_for_job(job_manager, job_id, status,
+                              [('reference', '레퍼런스 준비'), ('decode', '디코딩'), ('inference', '포즈 추출'),
+                               ('dtw', 'DTW')], '전체 비교 취소')
+        if status['state'] == 'cancelled':
+            st.warning('전체 동작 비교가 취소되었습니다.')
+            return
+        if status['state'] == 'failed':
+            st.error(f"오류 발생: {status.get('error')}")
+            return
+
+        matches = status['result']['matches']
+        if not matches:
+            st.warning('비교할 수 있는 동작을 찾지 못했습니다.')
+            return
+        st.success(f"가장 가까운 동작: {matches[0][2]}")
+        for rank, (distance, _, label) in enumerate(matches, start=1):
+            st.write(f"{rank}. {label} (DTW 거리: {distance:.3f})")
+
+    # 실시간 비교: 웹캠 또는 업로드 영상을 실제 속도로 재생하면서 레퍼런스와의 점수를 계속 갱신
+    def show_live_comparison(video_path1, upload_path):
+        st.subheader('실시간 비교')
+        sources = ['웹캠'] + (['업로드 영상 재생'] if upload_path else [])
+        source_name = st.radio('입력', sources, horizontal=True)
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            start = st.button('실시간 비교 시작')
+        with col2:
+            stop = st.button('실시간 비교 중지')
+
+        session = st.session_state.stream_session
+        if stop and session is not None:
+            session.stop()
+        if start:
+            if session is not None:
+                session.stop()
+            profile = base_profile()
+            reference_keypoints = load_reference_keypoints(video_path1, model, model_key(profile), STREAM_SAMPLE_FPS,
+                                                           track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+            source = WebcamSource() if source_name == '웹캠' else VideoReplaySource(upload_path)
+            comparison = StreamingComparison(model, reference_keypoints, track_subject=TRACK_SUBJECT)
+            session = st.session_state.stream_session = StreamSession(source, comparison)
+        if session is None:
+            return
+
+        # 점수는 워커 스레드가 프레임마다 갱신하고, 화면은 UI_UPDATE_INTERVAL마다 최신 값만 표시
+        score_text = st.empty()
+        progress_bar = st.progress(0.0, text='레퍼런스 진행')
+        try:
+            for update in session.updates(UI_UPDATE_INTERVAL):
+                if update['distance'] is None:
+                    score_text.info('자세를 인식하는 중입니다...')
+                else:
+                    score_text.metric('현재 DTW 거리', f"{update['distance']:.3f}")
+                progress_bar.progress(min(update['progress'], 1.0),
+                                      text=f"레퍼런스 진행 {update['progress']:.0%} (분석 {update['frames']}프레임)")
+        except Exception as e:
+            st.error(f"오류 발생: {str(e)}")
 
     # Streamlit 앱 UI
     st.title('비디오 포즈 유사도 비교 (DTW)')
 
-    # 첫 번째 비디오는 고정된 경로 사용
-    video_path1 = os.path.join(os.path.dirname(__file__), '../src/mp4/video6.mp4')
+    # 첫 번째 비디오는 선택한 동작의 레퍼런스 영상 사용
+    video_path1 = reference_video_path(st.session_state.selected_action)
 
     # 파일 업로드 위젯 (두 번째 비디오)
     video_file_2 = st.file_uploader('두 번째 비디오 파일을 업로드하세요.', type=['mp4', 'mov', 'avi'])
 
     # 두 번째 파일이 업로드되었을 때 실행
     if video_file_2 is not None:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp2:
-            temp2.write(video_file_2.read())
-            video_path2 = temp2.name
-            
-        col1, col2 = st.columns([1, 1])  
+        # 업로드 파일은 세션이 끝날 때까지 유지 (해시가 같으면 캐시된 결과 사용)
+        video_path2, upload_hash = ingest_upload(video_file_2)
+
+        # 분석 모드 (auto: 영상 길이에 맞춰 시간 안에 끝나는 가장 정확한 모드)
+        profile_options = [AUTO] + list(PROFILES)
+        profile = st.selectbox('분석 모드', profile_options, index=profile_options.index(DEFAULT_PROFILE))
+        # DTW 특징 (joint_angles/pca는 차원이 작아서 DTW가 빠르지만 거리 값의 크기가 다름)
+        feature = st.selectbox('비교 특징', FEATURE_TYPES, index=FEATURE_TYPES.index(DEFAULT_FEATURE))
+
+        col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
             if st.button('비디오 유사도 비교 시작'):
-                dtw_distance = compare_videos(video_path1, video_path2, model)
-                st.write(f"두 비디오 간의 유사도 (DTW 거리): {dtw_distance}")
-                
+                start_comparison(video_path1, video_path2, upload_hash, profile, feature)
+
         with col2:
+            if st.button('전체 동작과 비교'):
+                start_search(video_path2, upload_hash, profile, feature)
+
+        with col3:
             if st.button("다음", key="next_button", help="다음 페이지로 이동"):
                 st.session_state.selected_page = "recommend_page"
 
-        # 임시 파일 삭제
-        os.remove(video_path2)
-        
+    show_comparison_job()
+    show_search_job()
+
+    show_live_comparison(video_path1, video_path2 if video_file_2 is not None else None)
+
 
 def generate_recommendation(user_data):
     """
@@ -719,8 +794,46 @@ def recommend_page(): # 추천 페이지
     if st.button("완료", key="next_button", help="메인 페이지로 이동"):
         st.session_state.selected_page = "main"
 
+# 관리자 페이지: 서버/워커 프로세스가 metrics 로그에 남긴 계측 결과 집계 (메뉴에는 노출하지 않음)
+def admin_page():
+    st.title("운영 지표")
+    window = st.selectbox("집계 구간", ["최근 5분", "최근 1시간", f"최근 이벤트 {MAX_EVENTS:,}개"], index=1)
+    since = {"최근 5분": time.time() - 5 * 60, "최근 1시간": time.time() - 60 * 60}.get(window)
+    st.button("새로고침")
+
+    events = read_events()
+    # 최근 MAX_EVENTS개보다 오래된 이벤트는 읽지 않으므로 선택한 구간보다 짧게 집계될 수 있음
+    if len(events) >= MAX_EVENTS and (since is None or events[0].get('ts', 0) > since):
+        oldest = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(events[0].get('ts', 0)))
+        st.caption(f"최근 이벤트 {MAX_EVENTS:,}개({oldest} 이후)만 집계했습니다.")
+    metrics = aggregate(events, since=since)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("카운터")
+        st.table({name: [value] for name, value in sorted(metrics['counters'].items())} or {"-": ["기록 없음"]})
+    with col2:
+        st.subheader("게이지")
+        st.table({name: [value] for name, value in sorted(metrics['gauges'].items())} or {"-": ["기록 없음"]})
+
+    st.subheader("구간 시간 (ms)")
+    rows = [dict(name=name, **summary) for name, summary in sorted(metrics['histograms'].items())]
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info("기록된 구간이 없습니다.")
+
+# ?admin= 값이 설정된 관리자 토큰과 같은지 (토큰이 없거나 너무 짧으면 항상 거부)
+def is_admin_request():
+    if len(ADMIN_TOKEN) < MIN_ADMIN_TOKEN_LENGTH:
+        if ADMIN_TOKEN and "admin" in st.query_params:
+            logging.warning("HH_ADMIN_TOKEN이 %d자보다 짧아서 관리자 페이지를 사용하지 않습니다.", MIN_ADMIN_TOKEN_LENGTH)
+        return False
+    return hmac.compare_digest(st.query_params.get("admin", "").encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
 # 페이지 전환 및 실행
-if st.session_state.selected_page == "main":
+if is_admin_request():
+    admin_page()
+elif st.session_state.selected_page == "main":
     main_page()
 elif st.session_state.selected_page == "page1":
     page1()
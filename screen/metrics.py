@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import logging
+import logging.handlers
+import threading
+import functools
+from collections import deque
+
+import numpy as np
+
+# 단계별 시간/카운터 계측
+# span(컨텍스트 매니저)/timed(데코레이터)로 구간 시간을 히스토그램에 모으고, 카운터/게이지와 함께
+# .cache/metrics.log에 JSON 한 줄씩 기록. 워커 프로세스도 같은 파일에 쓰므로 관리자 페이지는 로그를 모아서 보여줌
+# 파일이 LOG_MAX_BYTES를 넘으면 metrics.log.1 ... .LOG_BACKUPS로 돌려서 크기가 계속 늘지 않음
+# (여러 프로세스가 거의 동시에 파일을 돌리면 백업 하나가 덮어써질 수 있지만 계측 로그라 허용)
+# HH_METRICS=0이면 모든 계측이 아무 일도 하지 않음
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENABLED = os.environ.get('HH_METRICS', '1') != '0'
+LOG_PATH = os.environ.get('HH_METRICS_LOG', os.path.join(ROOT_DIR, '.cache', 'metrics.log'))
+LOG_MAX_BYTES = int(os.environ.get('HH_METRICS_LOG_BYTES', 10 * 1024 * 1024))  # 로그 파일 하나의 최대 크기
+LOG_BACKUPS = 3  # 보관하는 이전 로그 파일 수
+MAX_EVENTS = 20000  # 관리자 페이지가 읽는 최근 이벤트 수
+RESERVOIR_SIZE = 2048  # 히스토그램마다 보관하는 최근 측정값 수
+PERCENTILES = (50, 95, 99)
+
+_lock = threading.Lock()
+_histograms = {}  # 이름 -> 최근 측정값(ms) deque
+_counters = {}
+_gauges = {}
+_logger = None
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger('healthy_homebody.metrics')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            os.makedirs(os.path.dirname(os.path.abspath(LOG_PATH)), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                           encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _emit(event_type, name, **fields):
+    event = {'ts': round(time.time(), 3), 'pid': os.getpid(), 'type': event_type, 'name': name}
+    event.update(fields)
+    try:
+        _get_logger().info(json.dumps(event, ensure_ascii=False, default=str))
+    except OSError:
+        pass  # 로그를 쓸 수 없어도 본 작업은 계속
+
+
+def observe(name, ms, **fields):
+    if not ENABLED:
+        return
+    with _lock:
+        values = _histograms.get(name)
+        if values is None:
+            values = _histograms[name] = deque(maxlen=RESERVOIR_SIZE)
+        values.append(ms)
+    _emit('span', name, ms=round(ms, 3), **fields)
+
+
+def incr(name, value=1, **fields):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+    _emit('counter', name, value=value, **fields)
+
+
+def set_gauge(name, value, **fields):
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+    _emit('gauge', name, value=value, **fields)
+
+
+class _Span:
+    __slots__ = ('name', 'fields', 'start')
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        fields = self.fields
+        if exc_type is not None:
+            fields = dict(fields, error=exc_type.__name__)
+        observe(self.name, (time.perf_counter() - self.start) * 1000, **fields)
+        return False
+
+    # 구간 안에서 알게 된 값(프레임 수 등)을 로그에 추가
+    def set(self, **fields):
+        self.fields.update(fields)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **fields):
+    """with span('inference', frames=8): ... 형태로 구간 시간을 기록"""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, fields)
+
+
+def timed(name=None):
+    """함수 실행 시간을 기록하는 데코레이터 (이름을 생략하면 모듈.함수명)"""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return {'count': 0}
+    summary = {'count': int(values.size), 'mean': float(values.mean()), 'max': float(values.max())}
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{p}'] = float(value)
+    return summary
+
+
+# 현재 프로세스의 집계
+def snapshot():
+    with _lock:
+        histograms = {name: list(values) for name, values in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    return {
+        'histograms': {name: summarize(values) for name, values in histograms.items()},
+        'counters': counters,
+        'gauges': gauges,
+    }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+# 로그 파일(돌린 백업 포함)에서 가장 최근 max_events개의 JSON 이벤트를 시간 순으로 읽기 (다른 줄 형식은 무시)
+# 그보다 오래된 이벤트는 읽지 않으므로 집계 결과는 "최근 max_events개" 기준
+def read_events(path=LOG_PATH, max_events=MAX_EVENTS):
+    chunks = []
+    remaining = max_events
+    for file_path in [path] + [f"{path}.{i}" for i in range(1, LOG_BACKUPS + 1)]:  # 최신 파일부터
+        if remaining <= 0:
+            break
+        try:
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                lines = deque(f, maxlen=remaining)
+        except FileNotFoundError:
+            continue
+        events = []
+        for line in lines:
+            if not line.startswith('{'):
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        chunks.append(events)
+        remaining -= len(events)
+    return [event for events in reversed(chunks) for event in events]
+
+
+# 여러 프로세스가 남긴 이벤트를 snapshot()과 같은 형태로 집계 (게이지는 마지막으로 기록된 값)
+def aggregate(events, since=None):
+    histograms, counters, gauges = {}, {}, {}
+    for event in events:
+        if since is not None and event.get('ts', 0) < since:
+            continue
+        name = event.get('name')
+        if event.get('type') == 'span':
+            histograms.setdefault(name, []).append(event['ms'])
+        elif event.get('type') == 'counter':
+            counters[name] = counters.get(name, 0) + event['value']
+        elif event.get('type') == 'gauge':
+            gauges[name] = event['value']
+    return {
+        'histograms': {name: summarize(values) for name, values in histograms.items()},
+        'counters': counters,
+        'gauges': gauges,
+    }
@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+from .keypoints import MODEL_NAME
+
+# 프로세스당 포즈 모델을 이름별로 한 번만 로드하는 레지스트리
+# ultralytics(torch) import는 처음 모델이 필요할 때까지 미룸
+# ultralytics predictor는 스레드 안전하지 않으므로(predictor 상태/setup_source 공유) 공유 모델의 추론은 모델마다 잠금으로 직렬화
+# (세션 스크립트 스레드, 실시간 비교 스레드, 레퍼런스 인덱스 생성이 같은 모델을 동시에 호출할 수 있음)
+
+WARMUP_SIZE = 640  # 워밍업 추론에 사용할 빈 프레임 크기
+
+_models = {}
+_lock = threading.Lock()
+_warmup_threads = {}
+
+
+class SharedModel:
+    """여러 스레드가 함께 쓰는 YOLO 모델 (호출은 한 번에 하나씩, 나머지 속성은 원래 모델로 전달)"""
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+
+    def __call__(self, source, **kwargs):
+        with self._lock:
+            return self.model(source, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def _load(name):
+    from ultralytics import YOLO
+
+    return SharedModel(YOLO(name, verbose=False))
+
+
+# 빈 프레임으로 한 번 추론해서 가중치 로드/커널 초기화 비용을 미리 치름
+def warm_up(model):
+    model(np.zeros((WARMUP_SIZE, WARMUP_SIZE, 3), dtype=np.uint8), verbose=False)
+
+
+def get_model(name=MODEL_NAME, warm=False):
+    """name 모델을 반환 (없으면 로드해서 등록). 여러 스레드가 동시에 불러도 한 번만 로드된다."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            model = _load(name)
+            if warm:
+                warm_up(model)
+            _models[name] = model
+    return _models[name]
+
+
+# 서버 시작 시 백그라운드 스레드에서 모델 로드 + 워밍업 (첫 비교 요청이 기다리지 않도록)
+def start_background_warmup(names=(MODEL_NAME,)):
+    for name in names:
+        thread = _warmup_threads.get(name)
+        if thread is None:
+            thread = threading.Thread(target=get_model, args=(name, True), name=f'warmup-{name}', daemon=True)
+            _warmup_threads[name] = thread
+            thread.start()
+    return [_warmup_threads[name] for name in names]
+
+
+def is_ready(name=MODEL_NAME):
+    return name in _models
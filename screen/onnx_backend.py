@@ -0,0 +1,265 @@
+import os
+import sys
+import glob
+import argparse
+
+import cv2
+import numpy as np
+
+from .features import NUM_KEYPOINTS
+from .reference_store import ROOT_DIR
+
+# ONNX Runtime 포즈 추론 백엔드 (CPU 전용 환경용)
+# ultralytics YOLO 모델과 같은 방식으로 호출(model(frames))하고, 결과도 boxes/keypoints 속성을 가진 객체로 반환해서
+# extract_keypoints/파이프라인/추적 코드를 그대로 사용
+#
+# python -m screen.onnx_backend export --profile accurate [--int8]   # ONNX 내보내기 (torch 필요)
+# python -m screen.onnx_backend parity --profile accurate            # YOLO(...) 결과와 keypoints 비교
+
+ONNX_DIR = os.environ.get('HH_ONNX_DIR', os.path.join(ROOT_DIR, '.cache', 'onnx'))
+ONNX_THREADS = int(os.environ.get('HH_ONNX_THREADS', 0))  # intra-op 스레드 수 (0이면 ONNX Runtime 기본값)
+ONNX_INT8 = os.environ.get('HH_ONNX_INT8', '0') == '1'
+DEFAULT_IMGSZ = 640
+STRIDE = 32
+CONF_THRESHOLD = 0.25  # ultralytics predict 기본값과 동일
+IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+KEYPOINT_VISIBILITY = 0.5  # 이보다 신뢰도가 낮은 keypoint는 (0, 0) (ultralytics Keypoints와 동일)
+PAD_VALUE = 114
+
+
+def artifact_path(model_name, imgsz=None, int8=False, onnx_dir=ONNX_DIR):
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    return os.path.join(onnx_dir, f"{stem}-{imgsz or DEFAULT_IMGSZ}{'-int8' if int8 else ''}.onnx")
+
+
+class _Array(np.ndarray):
+    """torch 텐서처럼 .cpu().numpy()를 호출할 수 있는 배열 (기존 결과 처리 코드와 호환)"""
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.view(np.ndarray)
+
+
+def _wrap(array):
+    return np.asarray(array, dtype=np.float32).view(_Array)
+
+
+class PoseBoxes:
+    def __init__(self, xyxy, conf):
+        self.xyxy = _wrap(xyxy)
+        self.conf = _wrap(conf)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class PoseKeypoints:
+    def __init__(self, data):
+        self.data = _wrap(data)  # (N, 17, 3): x, y, 신뢰도
+        self.xy = _wrap(data[..., :2])
+        self.conf = _wrap(data[..., 2])
+
+
+class PoseResult:
+    def __init__(self, boxes, keypoints, orig_shape):
+        self.boxes = boxes
+        self.keypoints = keypoints
+        self.orig_shape = orig_shape
+
+
+# ultralytics LetterBox(auto=True)와 같은 크기 조정 + 패딩 (비율 유지, stride 배수까지만 패딩)
+def letterbox(frame, imgsz, stride=STRIDE, auto=True):
+    height, width = frame.shape[:2]
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    pad_w, pad_h = imgsz - new_width, imgsz - new_height
+    if auto:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    pad_w, pad_h = pad_w / 2, pad_h / 2
+    if (width, height) != (new_width, new_height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(pad_h - 0.1), round(pad_h + 0.1)
+    left, right = round(pad_w - 0.1), round(pad_w + 0.1)
+    return cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+
+
+# 입력 크기 기준 좌표를 원본 프레임 좌표로 되돌림 (ultralytics scale_boxes/scale_coords와 동일)
+def _scale_back(coords, input_shape, orig_shape):
+    input_h, input_w = input_shape
+    orig_h, orig_w = orig_shape
+    gain = min(input_h / orig_h, input_w / orig_w)
+    new_h, new_w = round(orig_h * gain), round(orig_w * gain)
+    pad_x, pad_y = round((input_w - new_w) / 2 - 0.1), round((input_h - new_h) / 2 - 0.1)
+    coords[..., 0::2] = np.clip((coords[..., 0::2] - pad_x) / (new_w / orig_w), 0, orig_w)
+    coords[..., 1::2] = np.clip((coords[..., 1::2] - pad_y) / (new_h / orig_h), 0, orig_h)
+    return coords
+
+
+class OnnxPoseModel:
+    """YOLOv8 포즈 ONNX 모델 (출력 (B, 5 + 17 * 3, N): cx, cy, w, h, 사람 신뢰도, keypoints)"""
+
+    def __init__(self, path, imgsz=None, threads=ONNX_THREADS, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, sess_options=options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = path
+        self.imgsz = imgsz or DEFAULT_IMGSZ
+        self.conf = conf
+        self.iou = iou
+        # 고정 크기로 내보낸 모델이면 그 크기로만 입력 가능
+        input_shape = self.session.get_inputs()[0].shape
+        self.fixed_shape = all(isinstance(dim, int) for dim in input_shape[2:])
+        if self.fixed_shape:
+            self.imgsz = input_shape[2]
+
+    def _preprocess(self, frames, imgsz):
+        auto = not self.fixed_shape and len({frame.shape for frame in frames}) == 1
+        images = [letterbox(frame, imgsz, auto=auto) for frame in frames]
+        if len({image.shape for image in images}) > 1:  # 크기가 다른 프레임이 섞이면 정사각형으로 통일
+            images = [letterbox(frame, imgsz, auto=False) for frame in frames]
+        batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)  # BGR -> RGB, NHWC -> NCHW
+        return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+    def _postprocess(self, prediction, input_shape, orig_shape):
+        prediction = prediction.T  # (N, 56)
+        prediction = prediction[prediction[:, 4] > self.conf]
+        if len(prediction) == 0:
+            return PoseResult(PoseBoxes(np.zeros((0, 4)), np.zeros(0)),
+                              PoseKeypoints(np.zeros((0, NUM_KEYPOINTS, 3))), orig_shape)
+
+        centers, sizes = prediction[:, :2], prediction[:, 2:4]
+        boxes = np.concatenate([centers - sizes / 2, centers + sizes / 2], axis=1)
+        scores = prediction[:, 4]
+        keep = cv2.dnn.NMSBoxes(np.concatenate([boxes[:, :2], sizes], axis=1).tolist(), scores.tolist(),
+                                self.conf, self.iou)
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]  # 신뢰도 내림차순
+
+        boxes = _scale_back(boxes[keep].copy(), input_shape, orig_shape)
+        keypoints = prediction[keep, 5:].reshape(-1, NUM_KEYPOINTS, 3).copy()
+        keypoints[..., :2] = _scale_back(keypoints[..., :2].reshape(len(keep), -1), input_shape,
+                                         orig_shape).reshape(-1, NUM_KEYPOINTS, 2)
+        keypoints[..., :2][keypoints[..., 2] < KEYPOINT_VISIBILITY] = 0
+        return PoseResult(PoseBoxes(boxes, scores[keep]), PoseKeypoints(keypoints), orig_shape)
+
+    def __call__(self, source, imgsz=None, verbose=False, **kwargs):
+        frames = source if isinstance(source, (list, tuple)) else [source]
+        imgsz = self.imgsz if self.fixed_shape else (imgsz or self.imgsz)
+        batch = self._preprocess(frames, imgsz)
+        predictions = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(prediction, batch.shape[2:], frame.shape[:2])
+                for prediction, frame in zip(predictions, frames)]
+
+
+# 내보낸 ONNX 모델 불러오기, 파일이 없으면 None (호출한 쪽에서 torch 모델 사용)
+def load_onnx_model(model_name, imgsz=None, int8=ONNX_INT8, threads=ONNX_THREADS, onnx_dir=ONNX_DIR):
+    path = artifact_path(model_name, imgsz, int8, onnx_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        return OnnxPoseModel(path, imgsz, threads)
+    except ImportError:
+        return None
+
+
+def export_model(model_name, imgsz=None, int8=False, onnx_dir=ONNX_DIR):
+    """ultralytics로 ONNX 내보내기 (배치/해상도는 동적), int8=True이면 동적 INT8 양자화 모델도 생성"""
+    from ultralytics import YOLO
+
+    os.makedirs(onnx_dir, exist_ok=True)
+    path = artifact_path(model_name, imgsz, False, onnx_dir)
+    if not os.path.exists(path):
+        exported = YOLO(model_name, verbose=False).export(format='onnx', imgsz=imgsz or DEFAULT_IMGSZ,
+                                                          dynamic=True, simplify=True)
+        os.replace(exported, path)
+    if not int8:
+        return path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = artifact_path(model_name, imgsz, True, onnx_dir)
+    if not os.path.exists(int8_path):
+        quantize_dynamic(path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+# 같은 프레임에 대한 YOLO(...)와 ONNX 결과의 keypoints 차이 (픽셀, 두 결과 모두 보이는 keypoint 기준)
+def parity(video_paths, model_name, imgsz=None, int8=False, frames_per_video=8, conf=CONF_THRESHOLD,
+           onnx_dir=ONNX_DIR):
+    from ultralytics import YOLO
+
+    from .keypoints import iter_sampled_frames
+
+    torch_model = YOLO(model_name, verbose=False)
+    onnx_model = OnnxPoseModel(artifact_path(model_name, imgsz, int8, onnx_dir), imgsz, conf=conf)
+    differences, box_differences, matched, total = [], [], 0, 0
+    for video_path in video_paths:
+        cap = cv2.VideoCapture(video_path)
+        frames = [frame for _, _, frame in iter_sampled_frames(cap, target_frames=frames_per_video)]
+        cap.release()
+        if not frames:
+            continue
+        expected = torch_model(frames, imgsz=imgsz or DEFAULT_IMGSZ, conf=conf, verbose=False)
+        actual = onnx_model(frames)
+        for torch_result, onnx_result in zip(expected, actual):
+            total += 1
+            if len(torch_result.boxes) != len(onnx_result.boxes):
+                continue
+            matched += 1
+            if len(onnx_result.boxes) == 0:
+                continue
+            # 신뢰도가 같은 검출은 순서가 바뀔 수 있으므로 박스가 가장 가까운 검출끼리 비교
+            torch_boxes = torch_result.boxes.xyxy.cpu().numpy()
+            onnx_boxes = onnx_result.boxes.xyxy.numpy()
+            nearest = np.abs(onnx_boxes[:, None] - torch_boxes[None]).sum(axis=2).argmin(axis=1)
+            data = torch_result.keypoints.data.cpu().numpy()[nearest]
+            # 버전에 따라 YOLO 결과가 보이지 않는 keypoint를 0으로 바꾸지 않으므로 둘 다 보이는 keypoint만 비교
+            visible = (data[..., 2] >= KEYPOINT_VISIBILITY) & (onnx_result.keypoints.conf.numpy() >= KEYPOINT_VISIBILITY)
+            diff = np.abs(data[..., :2] - onnx_result.keypoints.xy.numpy())[visible]
+            differences.append(diff.reshape(-1))
+            box_differences.append(np.abs(torch_boxes[nearest] - onnx_boxes).reshape(-1))
+
+    differences = np.concatenate(differences) if differences else np.zeros(0)
+    box_differences = np.concatenate(box_differences) if box_differences else np.zeros(0)
+    report = {
+        'frames': total,
+        'same_detection_count': matched / total if total else None,
+        'mean_abs_px': float(differences.mean()) if differences.size else None,
+        'max_abs_px': float(differences.max()) if differences.size else None,
+        'max_box_abs_px': float(box_differences.max()) if box_differences.size else None,
+    }
+    print(f"프레임 {total}개, 검출 수 일치 {matched}/{total}, "
+          f"keypoint 차이 평균 {report['mean_abs_px']} px, 최대 {report['max_abs_px']} px, "
+          f"박스 차이 최대 {report['max_box_abs_px']} px")
+    return report
+
+
+if __name__ == '__main__':
+    from .profiles import PROFILES, base_profile, get_profile
+    from .reference_store import REFERENCE_VIDEO_DIR
+
+    parser = argparse.ArgumentParser(description='ONNX Runtime 포즈 추론 백엔드')
+    parser.add_argument('command', choices=['export', 'parity'])
+    parser.add_argument('videos', nargs='*')
+    parser.add_argument('--profile', choices=list(PROFILES), help='기본: HH_PROFILE')
+    parser.add_argument('--model', help='프로필 대신 모델 파일 직접 지정')
+    parser.add_argument('--int8', action='store_true')
+    parser.add_argument('--conf', type=float, default=CONF_THRESHOLD)
+    args = parser.parse_args()
+
+    profile = get_profile(args.profile) if args.profile else base_profile()
+    model_name = args.model or profile.model_name
+    if args.command == 'export':
+        print(export_model(model_name, profile.imgsz, args.int8))
+    else:
+        video_paths = args.videos or sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4')))
+        report = parity(video_paths, model_name, profile.imgsz, args.int8, conf=args.conf)
+        sys.exit(0 if report['same_detection_count'] in (None, 1.0) else 1)
@@ -0,0 +1,172 @@
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from .keypoints import (BATCH_SIZE, SAMPLE_FPS, finish_sequence, get_video_fps, iter_sampled_frames,
+                        result_to_points, sequence_result)
+from .metrics import incr, span
+from .sampling import MAX_INFERENCES, iter_keyframes
+from .sequence import KeypointSequence
+from .tracking import SubjectTracker
+
+# 디코딩 -> 추론 -> 특징 저장 단계를 스레드로 나눠서 동시에 실행하는 키포인트 추출
+# 각 단계 사이의 큐는 크기가 제한되어 있어서 느린 단계가 앞 단계를 자연스럽게 멈추게 함 (backpressure)
+
+QUEUE_TIMEOUT = 0.1  # 취소 여부를 확인하는 주기 (초)
+_END = object()  # 단계 종료 신호
+
+
+class PipelineCancelled(Exception):
+    """cancel_event가 설정되어 추출이 중단됨"""
+
+
+# 중단되지 않은 동안 큐에 넣기 (큐가 가득 차면 대기)
+def _put(q, item, stopped):
+    while not stopped():
+        try:
+            q.put(item, timeout=QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# 중단되지 않은 동안 큐에서 꺼내기
+def _get(q, stopped):
+    while not stopped():
+        try:
+            return q.get(timeout=QUEUE_TIMEOUT)
+        except queue.Empty:
+            continue
+    raise PipelineCancelled()
+
+
+# 예상 샘플 프레임 수 (출력 배열 미리 할당용)
+def _expected_samples(cap, sample_fps, target_frames):
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    if target_frames:
+        return int(target_frames)
+    if total_frames <= 0:
+        return 64
+    step = max(1.0, get_video_fps(cap) / float(sample_fps))
+    return int(np.ceil(total_frames / step))
+
+
+def extract_keypoints_pipelined(video_path, model, batch_size=BATCH_SIZE, sample_fps=SAMPLE_FPS,
+                                target_frames=None, queue_size=None, cancel_event=None, progress_callback=None,
+                                decode_callback=None, track_subject=False, adaptive=False, max_inferences=None,
+                                return_timestamps=False, return_sequence=False):
+    """
+    extract_keypoints와 같은 결과를 반환하지만 디코딩과 추론을 별도 스레드에서 겹쳐서 실행.
+    cancel_event가 설정되면 모든 단계를 정리하고 PipelineCancelled를 발생시킨다.
+    progress_callback(처리한 프레임 수, 예상 프레임 수)은 호출한 스레드에서 불리므로
+    Streamlit 위젯을 갱신할 수 있고, 그 안에서 발생한 예외(세션 rerun 등)도 모든 단계를 정리한다.
+    decode_callback(디코딩한 프레임 수, 예상 프레임 수)은 디코딩 스레드에서 호출된다.
+    track_subject, adaptive, max_inferences, return_timestamps, return_sequence는 extract_keypoints와 같음.
+    """
+    cancel_event = cancel_event or threading.Event()
+    stop_event = threading.Event()  # 내부 오류/취소 시 모든 단계 종료용
+    batch_size = max(1, int(batch_size))
+    queue_size = queue_size or batch_size * 2
+
+    cap = cv2.VideoCapture(video_path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    capacity = max(1, _expected_samples(cap, sample_fps, target_frames))
+    sampling_stats = {}
+    if adaptive:
+        frames = iter_keyframes(cap, sample_fps, max_inferences or MAX_INFERENCES, sampling_stats)
+        capacity = min(capacity, max_inferences or MAX_INFERENCES)
+    else:
+        frames = iter_sampled_frames(cap, sample_fps, target_frames)
+    timestamps = []  # 디코딩 순서 = 결과 순서
+    tracker = SubjectTracker(model) if track_subject else None
+
+    frame_queue = queue.Queue(maxsize=queue_size)
+    result_queue = queue.Queue(maxsize=max(1, queue_size // batch_size + 1))
+    errors = []
+
+    def stopped():
+        return cancel_event.is_set() or stop_event.is_set()
+
+    # 1단계: 샘플링된 프레임 디코딩
+    def decode_stage():
+        try:
+            with span('decode') as decode_span:
+                for decoded, (_, timestamp, frame) in enumerate(frames, start=1):
+                    timestamps.append(timestamp)
+                    if not _put(frame_queue, frame, stopped):
+                        return
+                    if decode_callback is not None:
+                        decode_callback(decoded, capacity)
+                    decode_span.set(frames=decoded)
+            _put(frame_queue, _END, stopped)
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    # 2단계: 배치 단위 YOLO 추론
+    def inference_stage():
+        try:
+            batch = []
+            while True:
+                frame = _get(frame_queue, stopped)
+                if frame is not _END:
+                    batch.append(frame)
+                if batch and (len(batch) == batch_size or frame is _END):
+                    if tracker is not None:
+                        results = tracker.process(batch)  # 이미 정규화된 (17, 3) points 목록
+                    else:
+                        with span('inference', frames=len(batch)):
+                            results = model(batch)
+                    incr('frames_inferred', len(batch))
+                    if not _put(result_queue, results, stopped):
+                        return
+                    batch = []
+                if frame is _END:
+                    _put(result_queue, _END, stopped)
+                    return
+        except PipelineCancelled:
+            return
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+
+    threads = [
+        threading.Thread(target=decode_stage, name='keypoints-decode', daemon=True),
+        threading.Thread(target=inference_stage, name='keypoints-inference', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # 3단계: 정규화/패딩 결과를 미리 할당한 KeypointSequence에 기록 (부족하면 두 배로 확장)
+    sequence = KeypointSequence(capacity)
+    sample = 0
+    try:
+        while True:
+            try:
+                results = _get(result_queue, stopped)
+            except PipelineCancelled:
+                if errors:
+                    raise errors[0]
+                raise
+            if results is _END:
+                break
+            for result in results:
+                points = result if tracker is not None else result_to_points(result, frame_width, frame_height)
+                sample += 1
+                if points is not None:
+                    sequence.append(points, timestamps[sample - 1])
+            if progress_callback is not None:
+                progress_callback(len(sequence), capacity)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        cap.release()
+
+    # 직렬 경로와 같은 보간/스무딩 후 같은 형태로 반환
+    sequence = finish_sequence(sequence, sample_fps, sampling_stats)
+    return sequence_result(sequence, return_timestamps, return_sequence)
@@ -0,0 +1,308 @@
+import os
+import time
+import glob
+import logging
+import argparse
+import itertools
+import threading
+
+import cv2
+import numpy as np
+
+from .keypoints import BATCH_SIZE, MODEL_NAME, SAMPLE_FPS, get_video_fps
+from .models import get_model
+
+# 속도/정확도 프로필 (모델 크기 + 추론 해상도)
+# 배포 기본값은 HH_PROFILE, 요청마다 다른 프로필을 고를 수도 있음
+# 'auto'는 측정한 프레임당 추론 시간, 영상 디코딩 시간과 영상 길이로 시간 예산(HH_TIME_BUDGET) 안에 끝나는
+# 가장 정확한 프로필을 선택
+#
+# python -m screen.profiles            # 프로필별 레퍼런스 영상 DTW 점수 차이(drift) 리포트
+
+
+class PipelineProfile:
+    def __init__(self, name, model_name, imgsz=None):
+        self.name = name
+        self.model_name = model_name
+        self.imgsz = imgsz  # None이면 모델 기본 해상도 (640)
+
+    def __repr__(self):
+        return f"PipelineProfile({self.name!r}, {self.model_name!r}, imgsz={self.imgsz})"
+
+
+# 정확한 순서대로 정렬 (auto 선택 시 앞에서부터 시도)
+PROFILES = {profile.name: profile for profile in (
+    PipelineProfile('accurate', MODEL_NAME),
+    PipelineProfile('balanced', 'yolov8s-pose.pt', imgsz=480),
+    PipelineProfile('fast', 'yolov8n-pose.pt', imgsz=320),
+)}
+AUTO = 'auto'
+DEFAULT_PROFILE = os.environ.get('HH_PROFILE', 'accurate')
+TIME_BUDGET = float(os.environ.get('HH_TIME_BUDGET', 30))  # auto 프로필의 목표 추출 시간 (디코딩 + 추론, 초)
+LATENCY_FRAME_SHAPE = (720, 1280, 3)  # 추론 시간 측정용 프레임 크기
+LATENCY_ROUNDS = 2
+DECODE_PROBE_FRAMES = 30  # auto 선택 때 영상 앞부분에서 디코딩 시간을 재는 프레임 수
+INFERENCE_BACKEND = os.environ.get('HH_INFERENCE_BACKEND', 'torch')  # 'torch' 또는 'onnx' (ONNX Runtime, CPU 전용 환경용)
+INFERENCE_SERVER = os.environ.get('HH_INFERENCE_SERVER', '')  # 공유 추론 서버 주소 (inference_server, 비어 있으면 프로세스마다 모델 로드)
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise KeyError(f"알 수 없는 프로필입니다: {name} (가능한 값: {', '.join(PROFILES)}, {AUTO})") from None
+
+
+# 영상 길이와 상관없이 쓰는 기본 프로필 (auto면 중간 프로필)
+def base_profile():
+    return get_profile('balanced' if DEFAULT_PROFILE == AUTO else DEFAULT_PROFILE)
+
+
+class ProfiledModel:
+    """imgsz를 지정하지 않은 호출에 프로필 해상도를 넣어주는 모델 래퍼 (나머지 속성은 원래 모델로 전달)"""
+
+    def __init__(self, model, imgsz):
+        self.model = model
+        self.imgsz = imgsz
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault('imgsz', self.imgsz)
+        return self.model(source, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+# 워커 프로세스가 코어를 나눠 쓰도록 추론(ONNX Runtime/torch)과 OpenCV 스레드 수를 제한 (모델을 로드하기 전에 호출)
+def limit_threads(threads):
+    os.environ.setdefault('HH_ONNX_THREADS', str(threads))
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    cv2.setNumThreads(threads)
+
+
+_onnx_models = {}
+_onnx_lock = threading.Lock()  # 백그라운드 워밍업과 세션 스레드가 같은 세션을 두 번 만들지 않도록
+
+
+# HH_INFERENCE_BACKEND=onnx이고 내보낸 ONNX 파일이 있으면 ONNX Runtime 모델, 없으면 None
+def _onnx_model(profile):
+    if INFERENCE_BACKEND != 'onnx':
+        return None
+    from .onnx_backend import ONNX_INT8, artifact_path, load_onnx_model
+
+    key = artifact_path(profile.model_name, profile.imgsz, ONNX_INT8)
+    with _onnx_lock:
+        if key not in _onnx_models:
+            model = load_onnx_model(profile.model_name, profile.imgsz)
+            if model is None:
+                logging.warning("ONNX 모델을 불러오지 못해 torch 모델을 사용합니다: %s "
+                                "(python -m screen.onnx_backend export --profile %s)", key, profile.name)
+            _onnx_models[key] = model
+        return _onnx_models[key]
+
+
+# 이 프로세스에 모델을 로드 (추론 서버도 이 함수로 모델을 들고 있음)
+def load_local_model(profile, warm=False):
+    model = _onnx_model(profile)
+    if model is not None:
+        return model
+    model = get_model(profile.model_name, warm=warm)
+    return ProfiledModel(model, profile.imgsz) if profile.imgsz else model
+
+
+# HH_INFERENCE_SERVER가 있으면 모델 대신 서버 클라이언트 (같은 호출/결과 형식)
+def load_profile_model(profile, warm=False):
+    if INFERENCE_SERVER:
+        from .inference_server import connect
+
+        return connect(INFERENCE_SERVER, profile.name)
+    return load_local_model(profile, warm)
+
+
+# 서버 시작 시 백그라운드 스레드에서 load_profile_model(profile, warm=True) 실행 (프로필마다 한 번)
+# 세션이 쓰는 것과 같은 경로라서 ONNX 백엔드면 ONNX 세션만 만들고,
+# 추론 서버를 쓰면 이 프로세스에는 모델을 올리지 않고 서버 클라이언트만 만들어 둠
+_warmup_threads = {}
+
+
+def start_profile_warmup(profile):
+    thread = _warmup_threads.get(profile.name)
+    if thread is None:
+        thread = threading.Thread(target=load_profile_model, args=(profile, True),
+                                  name=f'warmup-{profile.name}', daemon=True)
+        _warmup_threads[profile.name] = thread
+        thread.start()
+    return thread
+
+
+def local_model_key(profile):
+    if _onnx_model(profile) is None:
+        return profile.model_name
+    return os.path.basename(_onnx_model(profile).path)
+
+
+# 저장소/캐시 키에 쓰는 모델 이름 (ONNX로 추론하면 결과가 조금 다를 수 있으므로 torch 결과와 구분)
+# 추론 서버를 쓰면 서버가 실제로 로드한 모델 기준
+def model_key(profile):
+    if INFERENCE_SERVER:
+        from .inference_server import connect
+
+        return connect(INFERENCE_SERVER, profile.name).model_key
+    return local_model_key(profile)
+
+
+# 프로필별 프레임당 추론 시간 (초), 프로세스마다 한 번만 측정
+_latency = {}
+
+
+def measure_latency(profile, batch_size=BATCH_SIZE, frame_shape=LATENCY_FRAME_SHAPE, rounds=LATENCY_ROUNDS):
+    if profile.name not in _latency:
+        model = load_profile_model(profile, warm=True)
+        frames = [np.zeros(frame_shape, dtype=np.uint8)] * batch_size
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            model(frames, verbose=False)
+            best = min(best, time.perf_counter() - start)
+        _latency[profile.name] = best / batch_size
+    return _latency[profile.name]
+
+
+def _measure_all_latencies():
+    return {name: measure_latency(profile) for name, profile in PROFILES.items()}
+
+
+# 모든 프로필의 프레임당 추론 시간을 별도(spawn) 프로세스에서 한 번 측정
+# 측정하려고 로드한 모델은 그 프로세스와 함께 해제되므로, 결과만 set_latencies로 작업 워커에 넘기면
+# 워커는 auto 선택 때문에 쓰지 않을 프로필 모델까지 들고 있지 않음
+def measure_latencies_isolated():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_measure_all_latencies).result()
+
+
+def set_latencies(latencies):
+    _latency.update(latencies)
+
+
+# 영상에서 분석할 (샘플링된) 프레임 수
+def sampled_frame_count(video_path, sample_fps=SAMPLE_FPS):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        return int(np.ceil(total_frames / max(1.0, get_video_fps(cap) / sample_fps)))
+    finally:
+        cap.release()
+
+
+# 추출 중 디코딩에 드는 예상 시간 (초, 프로필과 무관)
+# 샘플 사이 프레임도 모두 grab()으로 디코딩하므로 (전체 프레임 수 x grab 시간) + (샘플 수 x BGR 변환 시간)
+# 코덱/해상도마다 다르므로 영상 앞부분 probe_frames개를 실제로 디코딩해서 잼 (첫 프레임은 코덱 초기화라 제외)
+def estimate_decode_time(video_path, sample_fps=SAMPLE_FPS, probe_frames=DECODE_PROBE_FRAMES):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        samples = int(np.ceil(total_frames / max(1.0, get_video_fps(cap) / sample_fps)))
+        if not cap.grab():
+            return 0.0
+        grabbed = 0
+        start = time.perf_counter()
+        while grabbed < probe_frames and cap.grab():
+            grabbed += 1
+        if grabbed == 0:
+            return 0.0
+        grab_time = (time.perf_counter() - start) / grabbed
+        start = time.perf_counter()
+        cap.retrieve()
+        retrieve_time = time.perf_counter() - start
+        return total_frames * grab_time + samples * retrieve_time
+    finally:
+        cap.release()
+
+
+def choose_profile(video_path, budget=TIME_BUDGET, sample_fps=SAMPLE_FPS):
+    """
+    예상 시간(디코딩 시간 + 샘플 프레임 수 x 프레임당 추론 시간)이 budget 안에 드는 가장 정확한 프로필,
+    없으면 가장 빠른 프로필. 디코딩과 추론은 같은 CPU 코어를 나눠 쓰므로 겹치는 시간 없이 더함.
+    """
+    frames = sampled_frame_count(video_path, sample_fps)
+    decode_time = estimate_decode_time(video_path, sample_fps)
+    for profile in PROFILES.values():
+        if decode_time + frames * measure_latency(profile) <= budget:
+            return profile
+    return list(PROFILES.values())[-1]
+
+
+def resolve_profile(name, video_path=None, budget=TIME_BUDGET):
+    name = name or DEFAULT_PROFILE
+    if name == AUTO:
+        if video_path is None:
+            return base_profile()
+        return choose_profile(video_path, budget)
+    return get_profile(name)
+
+
+# 프로필마다 레퍼런스 영상끼리의 DTW 점수를 구해서 기준 프로필과 비교
+def drift_report(video_paths, profile_names=None, baseline='accurate'):
+    from .dtw_engine import calculate_dtw_distance
+    from .reference_store import load_reference_keypoints
+
+    profile_names = profile_names or list(PROFILES)
+    names = [os.path.basename(path) for path in video_paths]
+    pairs = list(itertools.combinations(range(len(video_paths)), 2))
+    scores = {}
+    for profile_name in profile_names:
+        profile = get_profile(profile_name)
+        model = load_profile_model(profile, warm=True)
+        start = time.perf_counter()
+        keypoints = [load_reference_keypoints(path, model, model_key(profile), imgsz=profile.imgsz)
+                     for path in video_paths]
+        extract_time = time.perf_counter() - start
+        matrix = np.full((len(video_paths), len(video_paths)), np.inf)
+        for i, j in pairs:
+            matrix[i, j] = matrix[j, i] = calculate_dtw_distance(keypoints[i], keypoints[j])
+        scores[profile_name] = matrix
+        print(f"{profile_name:>10}: {profile.model_name} imgsz={profile.imgsz or 640}, "
+              f"프레임당 {measure_latency(profile) * 1000:.1f}ms, 추출 {extract_time:.1f}s")
+
+    reference = scores[baseline]
+    upper = np.triu_indices(len(video_paths), 1)
+    report = {}
+    for profile_name in profile_names:
+        if profile_name == baseline:
+            continue
+        matrix = scores[profile_name]
+        finite = np.isfinite(reference[upper]) & np.isfinite(matrix[upper])
+        relative = np.abs(matrix[upper][finite] - reference[upper][finite]) / np.maximum(reference[upper][finite], 1e-9)
+        # 각 영상에서 가장 가까운 영상이 기준 프로필과 같은지
+        same_nearest = [int(np.argmin(matrix[i]) == np.argmin(reference[i])) for i in range(len(names))]
+        report[profile_name] = {
+            'mean_relative_drift': float(relative.mean()) if relative.size else None,
+            'max_relative_drift': float(relative.max()) if relative.size else None,
+            'nearest_agreement': float(np.mean(same_nearest)),
+        }
+        if relative.size:
+            print(f"{profile_name:>10} vs {baseline}: 평균 {relative.mean():.1%}, 최대 {relative.max():.1%}, "
+                  f"가장 가까운 영상 일치 {np.mean(same_nearest):.0%}")
+        else:
+            print(f"{profile_name:>10} vs {baseline}: 비교할 수 있는 점수가 없습니다")
+    return report
+
+
+if __name__ == '__main__':
+    from .reference_store import REFERENCE_VIDEO_DIR
+
+    parser = argparse.ArgumentParser(description='프로필별 DTW 점수 차이 리포트')
+    parser.add_argument('videos', nargs='*')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES))
+    parser.add_argument('--baseline', default='accurate')
+    args = parser.parse_args()
+    drift_report(args.videos or sorted(glob.glob(os.path.join(REFERENCE_VIDEO_DIR, '*.mp4'))),
+                 args.profiles, args.baseline)
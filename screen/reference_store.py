@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import glob
+import hashlib
+
+from .features import SMOOTHING_WINDOW
+from .keypoints import MODEL_NAME, SAMPLE_FPS, extract_keypoints
+from .sequence import KeypointSequence
+
+# python -m screen.reference_store  (src/mp4 전체 레퍼런스 키포인트 미리 추출)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFERENCE_VIDEO_DIR = os.path.join(ROOT_DIR, 'src', 'mp4')
+STORE_DIR = os.environ.get('HH_REFERENCE_STORE', os.path.join(ROOT_DIR, '.cache', 'reference_keypoints'))
+MANIFEST_NAME = 'manifest.json'
+
+# 추출 로직이 바뀌면 올려서 기존 저장본을 무효화
+STORE_VERSION = 3  # 3: KeypointSequence 레코드 형식 (신뢰도, timestamp 포함)
+
+_hash_cache = {}  # (경로, 크기, 수정시각) -> sha256
+
+
+# 파일 내용 SHA-256 (청크 단위로 읽어서 메모리 사용 최소화)
+def file_sha256(path, chunk_size=1024 * 1024):
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key in _hash_cache:
+        return _hash_cache[cache_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    _hash_cache[cache_key] = digest.hexdigest()
+    return _hash_cache[cache_key]
+
+
+# 모델/샘플링 파라미터를 포함한 저장 키
+def store_key(content_hash, model_name=MODEL_NAME, sample_fps=SAMPLE_FPS, smoothing_window=SMOOTHING_WINDOW,
+              track_subject=False, imgsz=None):
+    params = {
+        'model': os.path.basename(model_name),
+        'sample_fps': sample_fps,
+        'smoothing_window': smoothing_window,
+        'version': STORE_VERSION,
+    }
+    # 기존 저장본 키가 바뀌지 않도록 기본값이 아닐 때만 포함
+    if track_subject:
+        params['track_subject'] = True
+    if imgsz:
+        params['imgsz'] = imgsz
+    params = json.dumps(params, sort_keys=True)
+    params_hash = hashlib.sha256(params.encode('utf-8')).hexdigest()[:12]
+    return f"{content_hash}-{params_hash}"
+
+
+def _store_path(key, store_dir):
+    return os.path.join(store_dir, f"{key}.npy")
+
+
+def _load_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(manifest, store_dir):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# 임시 파일에 쓴 뒤 교체해서 다른 세션이 반쯤 쓰인 파일을 읽지 않도록 함
+def _save_keypoints(sequence, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        sequence.save(f)
+    os.replace(tmp_path, path)
+
+
+# 저장소에서 레퍼런스 키포인트를 불러오고, 없거나 해시가 바뀌었으면 다시 추출
+def load_reference_keypoints(video_path, model=None, model_name=MODEL_NAME, sample_fps=SAMPLE_FPS,
+                             store_dir=STORE_DIR, mmap=True, track_subject=False, imgsz=None):
+    """
+    video_path의 키포인트를 sequence.KeypointSequence로 반환 (mmap=True이면 저장 파일을 복사 없이 연결).
+    저장본이 없으면 model로 추출해서 채우며, model이 None이면 KeyError를 발생시킨다.
+    """
+    key = store_key(file_sha256(video_path), model_name, sample_fps, track_subject=track_subject, imgsz=imgsz)
+    path = _store_path(key, store_dir)
+
+    if os.path.exists(path):
+        return KeypointSequence.load(path, mmap)
+
+    if model is None:
+        raise KeyError(f"레퍼런스 키포인트가 저장소에 없습니다: {video_path}")
+
+    keypoints = extract_keypoints(video_path, model, sample_fps=sample_fps, track_subject=track_subject,
+                                  return_sequence=True)
+    os.makedirs(store_dir, exist_ok=True)
+    _save_keypoints(keypoints, path)
+
+    # 같은 비디오, 같은 파라미터의 예전(해시가 바뀐) 저장본 정리 (모델/모드가 다른 저장본은 따로 관리)
+    manifest = _load_manifest(store_dir)
+    name = f"{os.path.basename(video_path)}:{key.rsplit('-', 1)[1]}"
+    old_key = manifest.get(name, {}).get('key')
+    if old_key and old_key != key and os.path.exists(_store_path(old_key, store_dir)):
+        os.remove(_store_path(old_key, store_dir))
+    manifest[name] = {'key': key, 'frames': int(len(keypoints))}
+    _save_manifest(manifest, store_dir)
+
+    return KeypointSequence.load(path, mmap)
+
+
+# src/mp4 아래 모든 비디오의 키포인트를 미리 추출
+def build_store(model, video_dir=REFERENCE_VIDEO_DIR, model_name=MODEL_NAME, sample_fps=SAMPLE_FPS,
+                store_dir=STORE_DIR, imgsz=None):
+    built = {}
+    for video_path in sorted(glob.glob(os.path.join(video_dir, '*.mp4'))):
+        keypoints = load_reference_keypoints(video_path, model, model_name, sample_fps, store_dir, imgsz=imgsz)
+        built[os.path.basename(video_path)] = keypoints.shape
+        print(f"{os.path.basename(video_path)}: {keypoints.shape}")
+    return built
+
+
+if __name__ == '__main__':
+    from .profiles import base_profile, get_profile, load_profile_model, model_key
+
+    # python -m screen.reference_store [프로필 이름]
+    profile = get_profile(sys.argv[1]) if len(sys.argv) > 1 else base_profile()
+    build_store(load_profile_model(profile), model_name=model_key(profile), imgsz=profile.imgsz)
@@ -0,0 +1,201 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .keypoints import MODEL_NAME, SAMPLE_FPS
+from .metrics import incr
+from .reference_store import ROOT_DIR, STORE_VERSION
+from .sequence import KeypointSequence
+
+# 업로드 영상 결과 캐시 (메모리 LRU + 디스크)
+# 키는 업로드 바이트의 SHA-256과 파이프라인 파라미터로 만들어서, 같은 영상을 다시 올리면 YOLO를 건너뜀
+
+CACHE_DIR = os.environ.get('HH_RESULT_CACHE', os.path.join(ROOT_DIR, '.cache', 'results'))
+MEMORY_LIMIT = 64 * 1024 * 1024  # 메모리 LRU 최대 크기 (bytes)
+DISK_LIMIT = 512 * 1024 * 1024  # 디스크 캐시 최대 크기 (bytes)
+FEATURE_TYPE = 'relative_distances'
+
+
+# 키포인트/점수 결과에 영향을 주는 파라미터
+def pipeline_params(model_name=MODEL_NAME, sample_fps=SAMPLE_FPS, feature_type=FEATURE_TYPE, track_subject=False,
+                    imgsz=None, max_inferences=None):
+    params = {
+        'model': os.path.basename(model_name),
+        'sample_fps': sample_fps,
+        'feature': feature_type,
+        'version': STORE_VERSION,
+    }
+    if track_subject:
+        params['track_subject'] = True
+    if imgsz:
+        params['imgsz'] = imgsz
+    if max_inferences:  # 움직임 기반 샘플링 (sampling.iter_keyframes)
+        params['adaptive'] = max_inferences
+    return params
+
+
+def cache_key(kind, *parts):
+    payload = json.dumps([kind] + list(parts), sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, memory_limit=MEMORY_LIMIT, disk_limit=DISK_LIMIT):
+        self.cache_dir = cache_dir
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._memory = OrderedDict()  # key -> (값, 크기)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _count(self, stat):
+        self.stats[stat] += 1
+        incr(f'cache.{stat}')
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    # 메모리 LRU에 넣고 한도를 넘으면 오래된 것부터 제거
+    def _remember(self, key, value, size):
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= self._memory.pop(key)[1]
+            if size > self.memory_limit:
+                return
+            self._memory[key] = (value, size)
+            self._memory_size += size
+            while self._memory_size > self.memory_limit:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_size -= evicted_size
+                self._count('evictions')
+
+    def _recall(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._count('memory_hits')
+                return self._memory[key][0]
+        return None
+
+    # 임시 파일에 쓴 뒤 교체 (다른 프로세스가 반쯤 쓰인 파일을 읽지 않도록)
+    def _write(self, path, write):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+        self._evict_disk()
+
+    # 디스크 캐시가 한도를 넘으면 가장 오래 사용하지 않은 파일부터 삭제
+    def _evict_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_limit:
+                break
+            try:
+                os.remove(path)
+                self._count('evictions')
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get_array(self, key):
+        value = self._recall(key)
+        if value is not None:
+            return value
+        path = self._path(key, '.npy')
+        try:
+            value = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self._count('misses')
+            return None
+        self._touch(path)
+        self._count('disk_hits')
+        value.setflags(write=False)  # 메모리 캐시와 공유되므로 읽기 전용
+        self._remember(key, value, value.nbytes)
+        return value
+
+    def put_array(self, key, value):
+        value = np.array(value, dtype=np.float32)
+        value.setflags(write=False)
+        self._write(self._path(key, '.npy'), lambda f: np.save(f, value))
+        self._remember(key, value, value.nbytes)
+
+    # 키포인트 시퀀스는 디스크 파일을 mmap으로 연결 (읽기 전용, 복사 없음)
+    def get_sequence(self, key):
+        value = self._recall(key)
+        if value is not None:
+            return value
+        path = self._path(key, '.npy')
+        try:
+            value = KeypointSequence.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self._count('misses')
+            return None
+        self._touch(path)
+        self._count('disk_hits')
+        self._remember(key, value, value.nbytes)
+        return value
+
+    def put_sequence(self, key, sequence):
+        self._write(self._path(key, '.npy'), sequence.save)
+        self._remember(key, sequence, sequence.nbytes)
+
+    def get_record(self, key):
+        value = self._recall(key)
+        if value is not None:
+            return dict(value)
+        path = self._path(key, '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._count('misses')
+            return None
+        self._touch(path)
+        self._count('disk_hits')
+        self._remember(key, value, len(json.dumps(value, ensure_ascii=False)))
+        return dict(value)
+
+    def put_record(self, key, value):
+        data = json.dumps(value, ensure_ascii=False).encode('utf-8')
+        self._write(self._path(key, '.json'), lambda f: f.write(data))
+        self._remember(key, dict(value), len(data))
+
+    def hit_rate(self):
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+
+# 프로세스당 하나의 캐시 (디스크 저장소는 모든 프로세스가 공유)
+_cache = None
+
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
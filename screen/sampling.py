@@ -0,0 +1,141 @@
+import os
+
+import cv2
+import numpy as np
+
+from .keypoints import SAMPLE_FPS, get_video_fps
+from .metrics import incr
+from .sequence import KeypointSequence
+
+# 움직임 기반 키프레임 샘플링
+# 고정 간격(1초에 1개) 대신 축소한 흑백 프레임 차이로 움직임을 재서, 움직이는 구간은 촘촘하게,
+# 오래 멈춰 있는 자세는 MAX_GAP마다 한 번만 추론. 추론 횟수는 영상 길이 x sample_fps(고정 간격과 같은 수)와
+# max_inferences 중 작은 값을 넘지 않음. 추출 결과는 timestamp로 고정 간격 시간축에 보간해서
+# 레퍼런스(고정 간격)와 같은 시간 해상도로 DTW에 넘김
+# 따라서 전환 구간에 촘촘히 뽑은 샘플은 격자 시점의 자세를 더 정확하게 보간하는 데만 쓰이고,
+# 1/sample_fps초보다 짧은 전환 동작 자체는 DTW 입력에 남지 않음 (시간 해상도는 고정 간격 샘플링과 같음)
+
+ADAPTIVE_SAMPLING = os.environ.get('HH_ADAPTIVE_SAMPLING', '0') == '1'  # 업로드 영상 추출 기본값
+MAX_INFERENCES = int(os.environ.get('HH_MAX_INFERENCES', 300))  # 영상 하나당 최대 추론 횟수
+SCAN_FPS = 3.0  # 움직임을 재는 후보 프레임 비율 (초당)
+MOTION_WIDTH = 64  # 움직임 측정용 축소 프레임 너비 (px)
+NOISE_FLOOR = 0.001  # 이보다 작은 평균 밝기 차이(0~1)는 압축 노이즈로 보고 무시
+MOTION_UNIT = 0.03  # 평균 밝기 차이가 이만큼 쌓이면 추론 한 번
+MAX_GAP = 3.0  # 움직임이 없어도 이 간격(초)마다 한 번은 추론
+
+
+# 움직임 측정용 축소 흑백 프레임 (0~1)
+def motion_thumbnail(frame, width=MOTION_WIDTH):
+    height = max(1, int(round(frame.shape[0] * width / frame.shape[1])))
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+
+
+def iter_keyframes(cap, sample_fps=SAMPLE_FPS, max_inferences=MAX_INFERENCES, stats=None):
+    """
+    iter_sampled_frames와 같은 (프레임 번호, 초 단위 timestamp, 프레임)을 움직임에 따라 골라서 반환.
+    SCAN_FPS 간격의 후보 프레임마다 이전 후보와의 차이를 중요도로 쌓고, 1이 넘으면 그 프레임을 추론 대상으로 선택.
+    예산은 시간에 비례해서 채워지는 토큰 방식이라 앞부분이 정지 화면이면 남은 예산을 뒤의 움직임에 쓸 수 있고,
+    전체 선택 수는 budget을 넘지 않음 (첫 프레임과 마지막 후보 프레임은 보간 범위를 위해 항상 포함).
+    stats(dict)를 넘기면 후보/선택 수를 기록.
+    """
+    fps = get_video_fps(cap)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    duration = total_frames / fps if total_frames else None
+    budget = max_inferences
+    if duration:
+        budget = min(budget, max(2, int(np.ceil(duration * sample_fps))))
+    scan_step = max(1.0, fps / max(SCAN_FPS, sample_fps))
+    interval = scan_step / fps  # 후보 프레임 간격 (초)
+
+    stats = stats if stats is not None else {}
+    stats.update(scanned=0, selected=0, budget=budget, fps=fps, total_frames=total_frames)
+    frame_index = 0
+    next_scan = 0.0
+    previous = None
+    importance = 0.0
+    pending = None  # 마지막 후보가 선택되지 않았으면 끝에서 내보냄
+    while cap.isOpened():
+        scan_index = int(round(next_scan))
+        if total_frames and scan_index >= total_frames:
+            break
+        while frame_index < scan_index:
+            if not cap.grab():
+                break
+            frame_index += 1
+        if frame_index < scan_index:
+            break
+        ret, frame = cap.read()
+        if not ret:
+            break
+        timestamp = frame_index / fps
+        frame_index += 1
+        next_scan += scan_step
+        stats['scanned'] += 1
+
+        thumbnail = motion_thumbnail(frame)
+        motion = 0.0 if previous is None else max(0.0, float(np.abs(thumbnail - previous).mean()) - NOISE_FLOOR)
+        previous = thumbnail
+        importance += motion / MOTION_UNIT + interval / MAX_GAP
+
+        # 지금까지 쓸 수 있는 예산 (마지막 프레임용 1개는 남겨둠)
+        allowed = budget
+        if duration:
+            allowed = int((budget - 1) * min(1.0, timestamp / duration)) + 1
+        if stats['selected'] == 0 or (importance >= 1.0 and stats['selected'] < min(allowed, budget - 1)):
+            importance = 0.0
+            pending = None
+            stats['selected'] += 1
+            yield scan_index, timestamp, frame
+        else:
+            pending = (scan_index, timestamp, frame)
+
+    if not total_frames:
+        stats['total_frames'] = frame_index
+    if pending is not None and stats['selected'] < budget:
+        stats['selected'] += 1
+        yield pending
+    incr('sampling.skipped_frames', stats['scanned'] - stats['selected'])
+
+
+# 고정 간격 샘플링(iter_sampled_frames)이 고르는 프레임의 timestamp (초)
+def uniform_timestamps(total_frames, fps, sample_fps=SAMPLE_FPS):
+    step = max(1.0, fps / float(sample_fps))
+    return np.round(np.arange(0, total_frames, step)) / fps
+
+
+# 시간이 불규칙한 keypoints (T, D)를 times 시점으로 선형 보간 (범위 밖은 양 끝 값)
+def resample_keypoints(keypoints, timestamps, times):
+    keypoints = np.asarray(keypoints, dtype=np.float32)
+    if len(keypoints) == 0:
+        return keypoints
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    resampled = np.empty((len(times), keypoints.shape[1]), dtype=np.float32)
+    for column in range(keypoints.shape[1]):
+        resampled[:, column] = np.interp(times, timestamps, keypoints[:, column])
+    return resampled
+
+
+# iter_keyframes로 고른 샘플의 KeypointSequence를 고정 간격 샘플링과 같은 시간축으로 보간 (신뢰도 포함)
+# 좌표가 (0, 0)인 keypoint(사람/관절을 검출하지 못한 샘플)는 실제 자세가 아니므로 보간에 쓰지 않고,
+# 격자 시점에서 가장 가까운 샘플이 검출하지 못한 keypoint는 고정 간격 추출처럼 0으로 둠
+def to_uniform_grid(sequence, stats, sample_fps=SAMPLE_FPS):
+    times = uniform_timestamps(stats['total_frames'], stats['fps'], sample_fps)
+    timestamps = np.asarray(sequence.timestamps, dtype=np.float64)
+    points = np.asarray(sequence.points)
+    detected = np.any(points[..., :2] != 0, axis=-1)  # (T, 17)
+
+    # 격자 시점마다 시간상 가장 가까운 샘플
+    right = np.minimum(np.searchsorted(timestamps, times), len(timestamps) - 1)
+    left = np.maximum(right - 1, 0)
+    nearest = np.where(np.abs(timestamps[right] - times) < np.abs(times - timestamps[left]), right, left)
+
+    grid = np.zeros((len(times), points.shape[1], 3), dtype=np.float32)
+    for keypoint in range(points.shape[1]):
+        valid = detected[:, keypoint]
+        if not valid.any():
+            continue
+        resampled = resample_keypoints(points[valid, keypoint], timestamps[valid], times)
+        keep = valid[nearest]
+        grid[keep, keypoint] = resampled[keep]
+    return KeypointSequence.from_arrays(grid, times)
@@ -0,0 +1,255 @@
+import os
+import csv
+import sys
+import json
+import glob
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .dtw_engine import DTW_METHOD, DTW_METHODS
+from .feature_space import DEFAULT_FEATURE, FEATURE_TYPES
+from .jobs import compare
+from .library import ACTION_VIDEOS, reference_video_path, video_label
+from .profiles import (AUTO, DEFAULT_PROFILE, PROFILES, get_profile, limit_threads, load_profile_model,
+                       measure_latencies_isolated, model_key, resolve_profile, set_latencies)
+from .reference_store import REFERENCE_VIDEO_DIR, load_reference_keypoints
+from .sharding import set_shard_budget
+from .tracking import TRACK_SUBJECT
+
+# Streamlit 없이 여러 (사용자 영상, 레퍼런스 동작) 쌍의 DTW 점수를 계산하는 배치 CLI
+# 영상 하나가 작업 하나 (키포인트는 한 번만 추출하고 레퍼런스마다 DTW), 워커 프로세스마다 모델 하나
+# 결과는 끝나는 대로 출력 파일에 한 줄씩 추가하므로 중단된 뒤 같은 명령을 다시 실행하면 남은 쌍만 계산
+#
+# python -m screen.score uploads/ -o scores.csv                       # 모든 동작과 비교
+# python -m screen.score a.mp4 b.mp4 --actions "골반저근 강화 운동" -o scores.jsonl --workers 4
+
+# profile은 요청한 프로필 이름 (이어서 계산할 때 키로 사용), used_profile은 auto일 때 실제로 고른 프로필
+FIELDS = ('video', 'reference', 'action', 'profile', 'used_profile', 'feature', 'dtw', 'distance', 'frames', 'cached',
+          'seconds', 'error')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi')
+
+
+# 파일/디렉터리 목록을 영상 파일 목록으로 (디렉터리는 바로 아래 영상 파일들)
+def collect_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(sorted(p for p in glob.glob(os.path.join(path, '*'))
+                                 if p.lower().endswith(VIDEO_EXTENSIONS)))
+        else:
+            videos.append(path)
+    return [os.path.abspath(path) for path in videos]
+
+
+# 비교할 레퍼런스 영상 목록 (같은 영상을 쓰는 동작은 한 번만)
+def collect_references(actions=None, references=None):
+    if references:
+        return collect_videos(references)
+    paths = [reference_video_path(action) for action in (actions or ACTION_VIDEOS)]
+    return [os.path.abspath(path) for path in dict.fromkeys(paths)]
+
+
+def _row_key(row):
+    return (row['video'], row['reference'], row['profile'], row.get('feature') or 'relative_distances',
+            row.get('dtw') or 'exact')
+
+
+# 이미 출력 파일에 성공적으로 기록된 쌍 (오류가 난 쌍은 다시 계산)
+def load_done(output_path):
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, 'r', encoding='utf-8', newline='') as f:
+        if output_path.endswith('.jsonl'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return {_row_key(row) for row in rows if not row.get('error')}
+
+
+# 이어서 쓸 CSV의 헤더를 현재 FIELDS에 맞춤 (feature/dtw 열이 생기기 전 파일에 그대로 추가하면 열이 밀림)
+# 빠진 열만 있으면 빈 값으로 채워 현재 헤더로 다시 쓰고, FIELDS에 없는 열이 있으면 데이터를 잃지 않도록 ValueError
+def upgrade_csv_header(output_path):
+    if output_path.endswith('.jsonl') or not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        header = tuple(reader.fieldnames or ())
+        if header == FIELDS:
+            return
+        unknown = [name for name in header if name not in FIELDS]
+        if unknown:
+            raise ValueError(f"{output_path}에 현재 출력 형식에 없는 열이 있습니다: {', '.join(unknown)} "
+                             f"(다른 출력 파일을 지정하세요)")
+        rows = list(reader)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, output_path)
+    print(f"{output_path}의 헤더를 현재 형식으로 바꿨습니다 (추가된 열: "
+          f"{', '.join(name for name in FIELDS if name not in header)})")
+
+
+class ResultWriter:
+    """CSV 또는 JSONL(.jsonl) 출력 파일에 결과를 한 줄씩 추가 (줄마다 flush)"""
+
+    def __init__(self, output_path):
+        self.jsonl = output_path.endswith('.jsonl')
+        upgrade_csv_header(output_path)
+        new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self.file = open(output_path, 'a', encoding='utf-8', newline='')
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if new_file:
+                self.writer.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self.file.write(json.dumps({field: row.get(field) for field in FIELDS}, ensure_ascii=False) + '\n')
+        else:
+            self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# 워커 프로세스 초기화: 코어를 워커 수로 나눠서 쓰도록 스레드 수를 제한하고 모델을 미리 로드
+# latencies(auto일 때 부모가 한 번 측정한 프로필별 추론 시간)를 받으면 워커가 영상마다 프로필을 고를 때 다시 측정하지 않음
+# 이미 영상 단위로 워커들이 코어를 나눠 쓰므로 워커 안에서 구간 추출 풀을 또 띄우지 않음
+def _init_worker(profile_name, threads, latencies=None):
+    limit_threads(threads)
+    set_shard_budget(1)
+    if latencies:
+        set_latencies(latencies)
+    load_profile_model(resolve_profile(profile_name), warm=True)
+
+
+# auto가 고를 수 있는 모든 프로필, 아니면 지정한 프로필 하나
+def _candidate_profiles(profile_name):
+    return list(PROFILES) if profile_name == AUTO else [profile_name]
+
+
+def _prepare_reference(reference_path, profile_name):
+    profile = get_profile(profile_name)
+    load_reference_keypoints(reference_path, load_profile_model(profile), model_key(profile),
+                             track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+    return reference_path
+
+
+# 영상 하나를 여러 레퍼런스와 비교 (두 번째 비교부터는 결과 캐시의 키포인트를 재사용)
+# auto는 영상마다 한 번만 프로필을 골라서 모든 레퍼런스에 같은 프로필을 씀
+def _score_video(video_path, reference_paths, profile_name, feature, dtw_method):
+    rows = []
+    try:
+        used_profile = resolve_profile(profile_name, video_path).name
+    except Exception:
+        used_profile = profile_name  # 영상을 읽지 못하면 compare에서 같은 오류를 행마다 기록
+    for reference_path in reference_paths:
+        row = {'video': video_path, 'reference': reference_path,
+               'action': video_label(os.path.basename(reference_path)), 'profile': profile_name, 'feature': feature,
+               'dtw': dtw_method}
+        start = time.perf_counter()
+        try:
+            result = compare(reference_path, video_path, {}, None, None, used_profile, feature, dtw_method)
+            row.update(used_profile=result['profile'], distance=result['distance'], frames=result['frames'],
+                       cached=result['cached'])
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+        row['seconds'] = round(time.perf_counter() - start, 3)
+        rows.append(row)
+    return rows
+
+
+def score(video_paths, reference_paths, output_path, profile_name=None, workers=None, feature=None, dtw_method=None):
+    """
+    모든 (video, reference) 쌍을 점수화해서 output_path에 기록하고 이번 실행에서 계산한 행 목록을 반환.
+    output_path에 이미 있는 쌍은 건너뛴다. feature는 DTW 특징 이름 (None이면 HH_FEATURE),
+    dtw_method는 'exact' 또는 'multiscale' (None이면 HH_DTW_METHOD).
+    """
+    profile_name = profile_name or DEFAULT_PROFILE
+    if profile_name != AUTO:
+        get_profile(profile_name)
+    feature = feature or DEFAULT_FEATURE
+    dtw_method = dtw_method or DTW_METHOD
+    workers = max(1, workers or os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    upgrade_csv_header(output_path)  # 계산을 시작하기 전에 이어 쓸 수 없는 파일이면 ValueError
+    done = load_done(output_path)
+    pending = {}
+    for video_path in video_paths:
+        references = [ref for ref in reference_paths if (video_path, ref, profile_name, feature, dtw_method) not in done]
+        if references:
+            pending[video_path] = references
+    total = sum(len(references) for references in pending.values())
+    print(f"{len(video_paths) * len(reference_paths)}쌍 중 {total}쌍 계산 "
+          f"(이미 완료 {len(video_paths) * len(reference_paths) - total}쌍), 워커 {workers}개")
+    if not pending:
+        return []
+
+    # auto는 프로필별 추론 시간을 워커마다 재지 않도록 (재는 동안 다른 워커의 추론과 경쟁함)
+    # 워커를 띄우기 전에 별도 프로세스에서 한 번만 측정해서 모든 워커에 전달
+    latencies = measure_latencies_isolated() if profile_name == AUTO else None
+
+    rows = []
+    writer = ResultWriter(output_path)
+    context = multiprocessing.get_context('spawn')
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                               initializer=_init_worker, initargs=(profile_name, threads, latencies))
+    start = time.perf_counter()
+    try:
+        # 레퍼런스 키포인트를 먼저 저장소에 만들어 두어야 워커들이 같은 레퍼런스를 중복 추출하지 않음
+        # (auto는 영상마다 다른 프로필을 고를 수 있으므로 모든 프로필의 레퍼런스를 준비)
+        needed = sorted({ref for references in pending.values() for ref in references})
+        for future in as_completed([pool.submit(_prepare_reference, ref, name)
+                                    for name in _candidate_profiles(profile_name) for ref in needed]):
+            future.result()
+
+        futures = [pool.submit(_score_video, video_path, references, profile_name, feature, dtw_method)
+                   for video_path, references in pending.items()]
+        for future in as_completed(futures):
+            for row in future.result():
+                writer.write(row)
+                rows.append(row)
+            print(f"[{len(rows)}/{total}] {os.path.basename(rows[-1]['video'])} "
+                  f"({time.perf_counter() - start:.1f}s)")
+    except KeyboardInterrupt:
+        print(f"중단됨: {len(rows)}/{total}쌍 저장. 같은 명령을 다시 실행하면 남은 쌍부터 계산합니다.")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        writer.close()
+    pool.shutdown()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='여러 영상의 동작 유사도(DTW 거리) 일괄 계산')
+    parser.add_argument('videos', nargs='+', help='영상 파일 또는 디렉터리')
+    parser.add_argument('-o', '--output', required=True, help='결과 파일 (.csv 또는 .jsonl)')
+    parser.add_argument('--actions', nargs='+', choices=list(ACTION_VIDEOS), help='비교할 동작 (기본: 전체)')
+    parser.add_argument('--references', nargs='+',
+                        help=f'동작 대신 레퍼런스 영상 파일/디렉터리 지정 (예: {REFERENCE_VIDEO_DIR})')
+    parser.add_argument('--profile', choices=list(PROFILES) + [AUTO], help='기본: HH_PROFILE')
+    parser.add_argument('--feature', choices=FEATURE_TYPES, help='DTW 특징 (기본: HH_FEATURE)')
+    parser.add_argument('--dtw', choices=DTW_METHODS, help='DTW 계산 방식 (기본: HH_DTW_METHOD)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='워커 프로세스 수')
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.videos)
+    if not videos:
+        parser.error('영상 파일이 없습니다')
+    try:
+        rows = score(videos, collect_references(args.actions, args.references), args.output, args.profile,
+                     args.workers, args.feature, args.dtw)
+    except ValueError as e:
+        parser.error(str(e))
+    return 1 if any(row.get('error') for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
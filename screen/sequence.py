@@ -0,0 +1,107 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .features import NUM_KEYPOINTS, SMOOTHING_WINDOW
+
+# 키포인트 시퀀스 컨테이너
+# 프레임마다 (17, 3) float32 [x, y, 신뢰도]와 초 단위 timestamp를 레코드 배열 하나에 저장
+# 프레임별 배열을 파이썬 리스트에 쌓는 대신 미리 할당한 버퍼를 두 배씩 늘려 쓰고,
+# 특징/DTW 단계에는 복사 없는 view(points, xy, confidence, timestamps)를 넘김
+# 디스크에는 같은 레코드 배열을 .npy로 저장하므로 mmap으로 복사 없이 다시 열 수 있음
+
+FRAME_DTYPE = np.dtype([('points', np.float32, (NUM_KEYPOINTS, 3)), ('timestamp', np.float64)])
+INITIAL_CAPACITY = 64
+
+
+class KeypointSequence:
+    """
+    np.asarray(sequence)는 (T, 17, 3) points view를 반환하므로
+    calculate_relative_distances / calculate_dtw_distance에 배열 대신 그대로 넘길 수 있음
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, frames=None):
+        if frames is None:
+            frames = np.zeros(max(1, int(capacity)), dtype=FRAME_DTYPE)
+            self._length = 0
+        else:
+            self._length = len(frames)
+        self._buffer = frames
+
+    # (T, 17, 3) points와 (T,) timestamps로 만들기 (timestamps가 없으면 0)
+    @classmethod
+    def from_arrays(cls, points, timestamps=None):
+        points = np.asarray(points, dtype=np.float32).reshape(-1, NUM_KEYPOINTS, 3)
+        frames = np.zeros(len(points), dtype=FRAME_DTYPE)
+        frames['points'] = points
+        if timestamps is not None:
+            frames['timestamp'] = timestamps
+        return cls(frames=frames)
+
+    def __len__(self):
+        return self._length
+
+    def __array__(self, dtype=None, copy=None):
+        points = self.points
+        return points if dtype is None else points.astype(dtype, copy=False)
+
+    def append(self, points, timestamp=0.0):
+        if self._length == len(self._buffer):  # 가득 차면 두 배로 확장
+            grown = np.zeros(2 * len(self._buffer), dtype=FRAME_DTYPE)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length] = (points, timestamp)
+        self._length += 1
+
+    @property
+    def frames(self):
+        return self._buffer[:self._length]
+
+    @property
+    def points(self):
+        return self.frames['points']
+
+    @property
+    def xy(self):
+        return self.points[..., :2]
+
+    @property
+    def confidence(self):
+        return self.points[..., 2]
+
+    @property
+    def timestamps(self):
+        return self.frames['timestamp']
+
+    @property
+    def shape(self):
+        return self._length, NUM_KEYPOINTS, 3
+
+    @property
+    def nbytes(self):
+        return self.frames.nbytes
+
+    # 기존 형식의 (T, 34) float32 좌표 배열 (연속 메모리 복사본, 프레임이 없으면 빈 배열)
+    def flat_xy(self):
+        if not self._length:
+            return np.array([])
+        return np.ascontiguousarray(self.xy).reshape(self._length, NUM_KEYPOINTS * 2)
+
+    # 시간 축 이동 평균 ('valid' 구간만, timestamp도 같은 창으로 평균)
+    def smoothed(self, window_size=SMOOTHING_WINDOW):
+        frames = np.zeros(max(0, self._length - window_size + 1), dtype=FRAME_DTYPE)
+        if len(frames):  # 결과 레코드 배열에 바로 기록 (중간 배열 없음)
+            sliding_window_view(self.points, window_size, axis=0).mean(axis=-1, dtype=np.float32,
+                                                                       out=frames['points'])
+            sliding_window_view(self.timestamps, window_size).mean(axis=-1, out=frames['timestamp'])
+        return KeypointSequence(frames=frames)
+
+    def save(self, file):
+        np.save(file, self.frames)
+
+    # mmap=True이면 파일을 복사 없이 읽기 전용으로 연결 (형식이 다르면 ValueError)
+    @classmethod
+    def load(cls, path, mmap=True):
+        frames = np.load(path, mmap_mode='r' if mmap else None)
+        if frames.dtype != FRAME_DTYPE:
+            raise ValueError(f"키포인트 시퀀스 형식이 아닙니다: {path}")
+        return cls(frames=frames)
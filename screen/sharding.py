@@ -0,0 +1,216 @@
+import os
+import time
+import argparse
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from .keypoints import (BATCH_SIZE, SAMPLE_FPS, collect_sequence, count_samples, finish_sequence, get_video_fps,
+                        iter_sampled_frames, sequence_result)
+from .metrics import incr, span
+from .pipeline import PipelineCancelled
+from .sequence import KeypointSequence
+from .tracking import SubjectTracker
+
+# 긴 업로드 영상의 시간 분할 병렬 키포인트 추출
+# 샘플 프레임을 연속된 구간 N개로 나누고, 워커 프로세스마다 자기 VideoCapture를 열어 구간 시작으로 seek한 뒤 그 구간만 추출
+# 워커는 스무딩 전 keypoints를 돌려주고 부모가 timestamp 순으로 합친 다음 한 번에 스무딩하므로
+# 구간 경계의 이동 평균도 직렬 추출과 같음 (주 수행자 추적은 구간마다 첫 프레임에서 다시 찾음)
+#
+# python -m screen.sharding 업로드.mp4 --workers 1 2 4   (직렬 추출과 결과/시간 비교)
+
+SHARD_WORKERS = int(os.environ.get('HH_SHARD_WORKERS', 1))  # 업로드 추출에 쓸 워커 프로세스 수, 작업 풀 전체 합계 (1이면 사용 안 함)
+MIN_SHARD_SECONDS = 60.0  # 구간 하나의 최소 영상 길이 (짧은 구간은 seek/모델 로드 비용이 더 큼)
+
+# 이 프로세스가 구간 추출에 쓸 수 있는 워커 수
+# 작업/점수 풀의 워커 프로세스는 set_shard_budget으로 풀 전체의 SHARD_WORKERS를 나눈 몫만 씀
+# (풀 워커마다 SHARD_WORKERS개씩 띄우면 구간 프로세스가 풀 워커 수 x SHARD_WORKERS개로 늘어나 코어를 나눠 쓰고
+# 모델도 그만큼 복사됨)
+_shard_budget = SHARD_WORKERS
+
+
+def set_shard_budget(workers):
+    global _shard_budget
+    _shard_budget = max(1, int(workers))
+
+
+def shard_budget():
+    return _shard_budget
+
+
+# 영상 길이에 맞춘 구간 수 (구간마다 MIN_SHARD_SECONDS 이상, 최대 workers개, None이면 shard_budget())
+def shard_count(video_path, workers=None, min_shard_seconds=MIN_SHARD_SECONDS):
+    workers = workers or _shard_budget
+    cap = cv2.VideoCapture(video_path)
+    try:
+        duration = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / get_video_fps(cap)
+    finally:
+        cap.release()
+    return max(1, min(workers, int(duration // min_shard_seconds)))
+
+
+# 샘플 번호 [0, total_samples)를 연속된 (start, stop) 구간 shards개로 나눔 (마지막 구간은 영상 끝까지)
+def shard_ranges(total_samples, shards):
+    shards = max(1, min(shards, total_samples))
+    bounds = np.linspace(0, total_samples, shards + 1).round().astype(int)
+    return [(int(start), int(stop) if i < shards - 1 else None)
+            for i, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+# 워커 프로세스마다 모델을 한 번만 로드 (코어를 워커 수로 나눠 쓰도록 스레드 수 제한)
+_worker_model = None
+
+
+def _init_worker(model_factory, threads):
+    global _worker_model
+    from .profiles import limit_threads
+
+    limit_threads(threads)
+    _worker_model = model_factory()
+
+
+def _noop():
+    return None
+
+
+# 구간 하나 추출: 스무딩 전 레코드 배열 (프레임마다 points, timestamp)
+def _extract_shard(video_path, start, stop, sample_fps, batch_size, track_subject):
+    cap = cv2.VideoCapture(video_path)
+    frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    tracker = SubjectTracker(_worker_model) if track_subject else None
+    try:
+        with span('shard', start=start):
+            frames = iter_sampled_frames(cap, sample_fps, start=start, stop=stop)
+            sequence = collect_sequence(frames, _worker_model, frame_width, frame_height, batch_size, tracker,
+                                        capacity=(stop - start) if stop is not None else None)
+    finally:
+        cap.release()
+    return sequence.frames
+
+
+# 프로필 모델 로더 (워커 프로세스로 보낼 수 있도록 모듈 함수)
+def _load_profile(profile_name):
+    from .profiles import get_profile, load_profile_model
+
+    return load_profile_model(get_profile(profile_name), warm=True)
+
+
+class ShardedExtractor:
+    """
+    워커 프로세스 풀(워커마다 model_factory()로 모델 하나)을 유지하면서 영상을 시간 구간으로 나눠 추출.
+    model_factory는 spawn 워커로 보내므로 모듈 수준 함수(또는 그 functools.partial)여야 함.
+    """
+
+    def __init__(self, model_factory, workers=SHARD_WORKERS):
+        self.model_factory = model_factory
+        self.workers = max(1, int(workers))
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # torch가 있는 프로세스에서 fork하지 않도록 spawn 사용
+    # 작업 풀 안에서는 다른 워커의 구간 프로세스와 합쳐 최대 SHARD_WORKERS개가 동시에 돌므로 그 수로 코어를 나눔
+    def _ensure_started(self):
+        with self._lock:
+            if self._pool is None:
+                threads = max(1, (os.cpu_count() or 1) // max(self.workers, SHARD_WORKERS))
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(self.model_factory, threads))
+        return self._pool
+
+    # 워커를 미리 띄워서 모델 로드를 첫 추출 전에 끝냄
+    def warm_up(self):
+        pool = self._ensure_started()
+        for future in [pool.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+
+    def extract(self, video_path, sample_fps=SAMPLE_FPS, batch_size=BATCH_SIZE, shards=None, track_subject=False,
+                cancel_event=None, progress_callback=None, return_timestamps=False, return_sequence=False):
+        """
+        extract_keypoints와 같은 결과를 구간 병렬로 계산 (shards: 구간 수, None이면 워커 수).
+        progress_callback(끝난 구간 수, 전체 구간 수)은 호출한 스레드에서 불린다.
+        cancel_event가 설정되면 시작하지 않은 구간을 취소하고 PipelineCancelled를 발생시킨다
+        (이미 실행 중인 구간은 끝날 때까지 워커에서 계속 실행됨).
+        """
+        cap = cv2.VideoCapture(video_path)
+        try:
+            total_samples = count_samples(get_video_fps(cap), int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0), sample_fps)
+        finally:
+            cap.release()
+        ranges = shard_ranges(total_samples, shards or self.workers) if total_samples else [(0, None)]
+        incr('shards', len(ranges))
+
+        pool = self._ensure_started()
+        futures = {pool.submit(_extract_shard, video_path, start, stop, sample_fps, batch_size, track_subject): i
+                   for i, (start, stop) in enumerate(ranges)}
+        parts = [None] * len(ranges)
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise PipelineCancelled()
+                for future in done:
+                    parts[futures[future]] = future.result()
+                if done and progress_callback is not None:
+                    progress_callback(len(ranges) - len(pending), len(ranges))
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+        # timestamp 순으로 합친 뒤 전체 시퀀스에 한 번만 보간/스무딩 (구간 경계도 직렬 추출과 같은 창)
+        frames = np.concatenate(parts)
+        frames = frames[np.argsort(frames['timestamp'], kind='stable')]
+        sequence = finish_sequence(KeypointSequence(frames=frames), sample_fps)
+        return sequence_result(sequence, return_timestamps, return_sequence)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# 프로필마다 프로세스당 하나의 추출기 (워커 풀은 첫 추출 때 시작)
+_extractors = {}
+
+
+def get_sharded_extractor(profile, workers=None):
+    workers = workers or _shard_budget
+    key = (profile.name, workers)
+    if key not in _extractors:
+        _extractors[key] = ShardedExtractor(functools.partial(_load_profile, profile.name), workers)
+    return _extractors[key]
+
+
+if __name__ == '__main__':
+    from .keypoints import extract_keypoints
+    from .profiles import base_profile, get_profile, load_profile_model, model_key
+
+    parser = argparse.ArgumentParser(description='시간 분할 병렬 추출과 직렬 추출의 결과/시간 비교')
+    parser.add_argument('video')
+    parser.add_argument('--workers', type=int, nargs='+', default=[os.cpu_count() or 1])
+    parser.add_argument('--profile', help='기본: HH_PROFILE')
+    parser.add_argument('--sample-fps', type=float, default=SAMPLE_FPS)
+    args = parser.parse_args()
+
+    profile = get_profile(args.profile) if args.profile else base_profile()
+    start = time.perf_counter()
+    expected = extract_keypoints(args.video, load_profile_model(profile, warm=True), sample_fps=args.sample_fps)
+    serial = time.perf_counter() - start
+    print(f"{model_key(profile)} 직렬: {len(expected)}프레임 {serial:.1f}s")
+    for workers in args.workers:
+        extractor = ShardedExtractor(functools.partial(_load_profile, profile.name), workers)
+        extractor.warm_up()  # 모델 로드 시간은 제외
+        start = time.perf_counter()
+        keypoints = extractor.extract(args.video, args.sample_fps)
+        elapsed = time.perf_counter() - start
+        extractor.shutdown()
+        same = keypoints.shape == expected.shape and np.allclose(keypoints, expected, atol=1e-6)
+        print(f"워커 {workers}개: {elapsed:.1f}s ({serial / elapsed:.2f}x), 직렬 결과와 {'일치' if same else '다름'}")
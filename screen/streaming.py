@@ -0,0 +1,226 @@
+import os
+import time
+import argparse
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+from .dtw_engine import OpenEndDTW, calculate_dtw_distance, default_window
+from .features import SMOOTHING_WINDOW, calculate_relative_distances, smooth_keypoints
+from .keypoints import SAMPLE_FPS, batch_to_keypoints, get_video_fps
+from .metrics import incr, span
+from .tracking import SubjectTracker
+
+# 실시간 비교: 프레임이 들어오는 대로 포즈를 추출하고 레퍼런스와의 open-end DTW를 갱신
+# 프레임 소스는 웹캠 또는 실제 속도로 재생하는 영상 파일 (처리가 밀리면 지난 프레임은 건너뜀)
+# 화면에는 워커 스레드가 갱신하는 최신 점수를 UI_UPDATE_INTERVAL마다 보여줌
+#
+# python -m screen.streaming 업로드.mp4 [--reference src/mp4/video6.mp4] [--fast]
+
+STREAM_SAMPLE_FPS = float(os.environ.get('HH_STREAM_SAMPLE_FPS', SAMPLE_FPS * 2))  # 초당 분석할 프레임 수
+BAND_RATIO = 0.25  # open-end DTW band: 레퍼런스 길이의 25% (따라 하는 속도가 달라도 위치를 놓치지 않도록)
+UI_UPDATE_INTERVAL = 0.5  # 화면 점수 갱신 주기 (초)
+WEBCAM_MAX_SECONDS = 5 * 60  # 웹캠 비교 최대 길이 (초)
+
+
+class VideoReplaySource:
+    """영상 파일을 실제 재생 속도에 맞춰 sample_fps로 내보내는 프레임 소스 (realtime=False면 최대한 빠르게)"""
+
+    def __init__(self, video_path, sample_fps=STREAM_SAMPLE_FPS, realtime=True):
+        self.video_path = video_path
+        self.sample_fps = sample_fps
+        self.realtime = realtime
+        self.dropped = 0  # 처리가 늦어서 건너뛴 샘플 수
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            fps = get_video_fps(cap)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            interval = 1.0 / self.sample_fps
+            start = time.perf_counter()
+            frame_index = 0
+            sample = 0
+            while True:
+                timestamp = sample * interval
+                if self.realtime:
+                    elapsed = time.perf_counter() - start
+                    if elapsed < timestamp:
+                        time.sleep(timestamp - elapsed)
+                    elif elapsed - timestamp >= interval:
+                        # 이미 지나간 샘플은 건너뛰고 현재 재생 위치부터 다시 시작
+                        skipped = int((elapsed - timestamp) / interval)
+                        self.dropped += skipped
+                        incr('stream.dropped_frames', skipped)
+                        sample += skipped
+                        timestamp = sample * interval
+
+                target = int(round(timestamp * fps))
+                if total_frames and target >= total_frames:
+                    return
+                while frame_index < target:  # 샘플 사이 프레임은 디코딩 없이 넘김
+                    if not cap.grab():
+                        return
+                    frame_index += 1
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                frame_index += 1
+                yield timestamp, frame
+                sample += 1
+        finally:
+            cap.release()
+
+
+class WebcamSource:
+    """웹캠에서 sample_fps 간격으로 가장 최근 프레임을 내보내는 프레임 소스 (서버가 실행 중인 PC의 카메라)"""
+
+    def __init__(self, device=0, sample_fps=STREAM_SAMPLE_FPS, max_seconds=WEBCAM_MAX_SECONDS):
+        self.device = device
+        self.sample_fps = sample_fps
+        self.max_seconds = max_seconds
+        self.dropped = 0
+
+    def __iter__(self):
+        cap = cv2.VideoCapture(self.device)
+        if not cap.isOpened():
+            raise RuntimeError(f"웹캠을 열 수 없습니다: {self.device}")
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 밀린 프레임 대신 최신 프레임을 읽도록
+        try:
+            interval = 1.0 / self.sample_fps
+            start = time.perf_counter()
+            next_sample = 0.0
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                timestamp = time.perf_counter() - start
+                if timestamp > self.max_seconds:
+                    return
+                if timestamp < next_sample:
+                    continue
+                yield timestamp, frame
+                next_sample = (int(timestamp / interval) + 1) * interval
+        finally:
+            cap.release()
+
+
+class StreamingComparison:
+    """
+    프레임을 하나씩 push하면서 레퍼런스 키포인트와의 점수를 갱신.
+    오프라인 추출과 같은 규칙으로 정규화/스무딩(최근 smoothing_window 프레임 평균)한 뒤
+    관절 간 거리 특징으로 OpenEndDTW를 한 행씩 갱신하므로 프레임당 작업량은 O(band)로 일정.
+    """
+
+    def __init__(self, model, reference_keypoints, band=None, track_subject=False,
+                 smoothing_window=SMOOTHING_WINDOW):
+        self.model = model
+        self.reference_frames = len(reference_keypoints)
+        if band is None:
+            band = default_window(len(reference_keypoints), len(reference_keypoints), BAND_RATIO)
+        self.dtw = OpenEndDTW(calculate_relative_distances(reference_keypoints, dtype=np.float64), band)
+        self.tracker = SubjectTracker(model) if track_subject else None
+        self.recent = deque(maxlen=smoothing_window)
+        self.frames = 0
+        self.keypoints = []  # 스무딩 전 keypoints (끝난 뒤 오프라인 DTW와 비교할 때 사용)
+
+    def push(self, frame, timestamp):
+        height, width = frame.shape[:2]
+        with span('stream.frame'):
+            keypoints_list = batch_to_keypoints(self.model, [frame], width, height, self.tracker)
+            self.frames += 1
+            if keypoints_list:
+                self.keypoints.append(keypoints_list[0])
+                self.recent.append(keypoints_list[0])
+                if len(self.recent) == self.recent.maxlen:
+                    smoothed = np.mean(self.recent, axis=0, dtype=np.float32)
+                    self.dtw.update(calculate_relative_distances(smoothed))
+        return self.partial(timestamp)
+
+    def partial(self, timestamp=None):
+        """
+        {'timestamp', 'frames', 'distance': 지금까지 따라 한 구간의 DTW 거리,
+         'progress': 따라 한 레퍼런스 비율, 'final_distance': 레퍼런스 끝까지 정렬한 거리}
+        """
+        matched = self.dtw.frames > 0
+        return {
+            'timestamp': timestamp,
+            'frames': self.frames,
+            'distance': self.dtw.distance if matched else None,
+            'progress': (self.dtw.position + 1) / self.reference_frames if matched else 0.0,
+            'final_distance': self.dtw.closed_distance if matched else None,
+        }
+
+
+class StreamSession:
+    """프레임 소스를 워커 스레드에서 처리하고, 화면은 latest()로 최신 점수만 가져감"""
+
+    def __init__(self, source, comparison):
+        self.source = source
+        self.comparison = comparison
+        self.error = None
+        self._latest = comparison.partial()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for timestamp, frame in self.source:
+                if self._stop.is_set():
+                    break
+                self._latest = self.comparison.push(frame, timestamp)
+        except Exception as e:
+            self.error = e
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def latest(self):
+        return dict(self._latest, dropped=self.source.dropped)
+
+    def stop(self):
+        self._stop.set()
+
+    # interval마다 최신 점수를 내보내고, 소스가 끝나면 마지막 점수를 내보낸 뒤 종료
+    def updates(self, interval=UI_UPDATE_INTERVAL):
+        while self.running:
+            yield self.latest()
+            self._thread.join(interval)
+        if self.error is not None:
+            raise self.error
+        yield self.latest()
+
+
+if __name__ == '__main__':
+    from .library import reference_video_path
+    from .profiles import base_profile, load_profile_model, model_key
+    from .reference_store import load_reference_keypoints
+    from .tracking import TRACK_SUBJECT
+
+    parser = argparse.ArgumentParser(description='영상 파일을 실시간으로 재생하면서 레퍼런스와 비교')
+    parser.add_argument('video')
+    parser.add_argument('--reference', default=reference_video_path())
+    parser.add_argument('--sample-fps', type=float, default=STREAM_SAMPLE_FPS)
+    parser.add_argument('--band', type=int, help='DTW band (기본: 레퍼런스 길이의 25%%)')
+    parser.add_argument('--fast', action='store_true', help='실제 속도로 기다리지 않고 모든 샘플 처리')
+    args = parser.parse_args()
+
+    profile = base_profile()
+    model = load_profile_model(profile, warm=True)
+    reference = load_reference_keypoints(args.reference, model, model_key(profile), args.sample_fps,
+                                         track_subject=TRACK_SUBJECT, imgsz=profile.imgsz)
+    comparison = StreamingComparison(model, reference, args.band, TRACK_SUBJECT)
+    session = StreamSession(VideoReplaySource(args.video, args.sample_fps, realtime=not args.fast), comparison)
+    start = time.perf_counter()
+    for update in session.updates():
+        if update['distance'] is not None:
+            print(f"{time.perf_counter() - start:6.1f}s  영상 {update['timestamp']:6.1f}s  "
+                  f"거리 {update['distance']:.4f}  진행 {update['progress']:.0%}  건너뜀 {update['dropped']}")
+    # 같은 프레임으로 전체 시퀀스를 한 번에 계산한 거리 (band 제한 없음)
+    offline = calculate_dtw_distance(reference, smooth_keypoints(np.array(comparison.keypoints)), window=0)
+    print(f"최종 거리 {update['final_distance']:.4f} (따라 한 구간 {update['distance']}), "
+          f"같은 프레임의 오프라인 DTW {offline:.4f}")
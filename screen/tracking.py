@@ -0,0 +1,171 @@
+import os
+
+import numpy as np
+
+from .features import NUM_KEYPOINTS, normalize_keypoints
+from .metrics import incr, span
+
+# 주 수행자(화면에서 가장 크고 확실한 사람) 한 명만 추적하는 포즈 추출
+# 처음 한 번 전체 프레임에서 찾은 뒤에는 이전 박스 주변을 잘라낸 작은 이미지로만 추론하고,
+# 잘라낸 영역에서 놓치거나 신뢰도가 낮아지면 그 프레임만 전체 프레임에서 다시 검출
+
+TRACK_SUBJECT = os.environ.get('HH_TRACK_SUBJECT', '0') == '1'  # 앱 기본값 (레퍼런스/업로드 모두 같은 모드로 추출)
+CROP_PADDING = 0.5  # 추적 박스 크기 대비 여백 비율 (샘플 간 이동 허용)
+CROP_IMGSZ = 320  # 잘라낸 영역 추론 해상도 (전체 프레임은 모델 기본값 640)
+MIN_CONFIDENCE = 0.5  # 이보다 낮은 박스 신뢰도는 추적 실패로 보고 재검출
+MIN_IOU = 0.3  # 이전 박스와 겹치는 정도가 이보다 작으면 다른 사람으로 판단
+MIN_AREA_RATIO = 0.5  # 재검출 시 이전 박스 넓이의 이 비율보다 작은 사람은 주 수행자로 보지 않음 (구경꾼 제외)
+
+
+def to_numpy(value):
+    return value.cpu().numpy() if hasattr(value, 'cpu') else np.asarray(value)
+
+
+# keypoints별 신뢰도 (N, 17), 신뢰도를 주지 않는 모델은 검출된(0이 아닌) 점을 1로
+def keypoint_confidence(keypoints, xy):
+    if keypoints.conf is not None:
+        return to_numpy(keypoints.conf).astype(np.float32).reshape(xy.shape[:-1])
+    return (xy != 0).any(axis=-1).astype(np.float32)
+
+
+# box (4,)와 boxes (N, 4) 사이의 IoU (xyxy 좌표)
+def box_iou(box, boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    x0 = np.maximum(box[0], boxes[:, 0])
+    y0 = np.maximum(box[1], boxes[:, 1])
+    x1 = np.minimum(box[2], boxes[:, 2])
+    y1 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-6)
+
+
+# YOLO 결과 하나에서 사람별 (박스, 신뢰도, keypoints (17, 3) [x, y, 신뢰도]) 를
+# offset만큼 옮긴 전체 프레임 픽셀 좌표로 반환
+def _detections(result, offset=(0, 0)):
+    if result.keypoints is None or result.boxes is None or len(result.boxes) == 0:
+        return None
+    shift = np.array(offset, dtype=np.float32)
+    boxes = to_numpy(result.boxes.xyxy).astype(np.float32) + np.tile(shift, 2)
+    confidences = to_numpy(result.boxes.conf).astype(np.float32)
+    xy = to_numpy(result.keypoints.xy).astype(np.float32).reshape(len(boxes), NUM_KEYPOINTS, 2)
+    points = np.empty((len(boxes), NUM_KEYPOINTS, 3), dtype=np.float32)
+    # 검출되지 않은 keypoint는 (0, 0)으로 오므로 옮기지 않음
+    points[..., :2] = np.where((xy == 0).all(axis=-1, keepdims=True), 0, xy + shift)
+    points[..., 2] = keypoint_confidence(result.keypoints, xy)
+    return boxes, confidences, points
+
+
+class SubjectTracker:
+    def __init__(self, model, padding=CROP_PADDING, crop_imgsz=CROP_IMGSZ, min_confidence=MIN_CONFIDENCE,
+                 min_iou=MIN_IOU, min_area_ratio=MIN_AREA_RATIO):
+        self.model = model
+        self.padding = padding
+        self.crop_imgsz = crop_imgsz
+        self.min_confidence = min_confidence
+        self.min_iou = min_iou
+        self.min_area_ratio = min_area_ratio
+        self.box = None  # 마지막으로 추적한 박스 (전체 프레임 픽셀 xyxy)
+        self.stats = {'crop_frames': 0, 'full_frames': 0, 'lost': 0}
+
+    # 추적 박스 주변 여백을 포함한 잘라낼 영역 (프레임 밖은 잘라냄)
+    def crop_region(self, frame_shape):
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.box
+        pad_x = (x1 - x0) * self.padding
+        pad_y = (y1 - y0) * self.padding
+        return (max(0, int(x0 - pad_x)), max(0, int(y0 - pad_y)),
+                min(width, int(np.ceil(x1 + pad_x))), min(height, int(np.ceil(y1 + pad_y))))
+
+    # 검출 결과 중 추적 대상 고르기: 추적 중이면 이전 박스와 가장 많이 겹치는 사람,
+    # 처음이거나 겹치는 사람이 없으면 (박스 넓이 x 신뢰도)가 가장 큰 사람
+    # (추적 중에는 이전 박스와 크기가 비슷한 사람만 후보로 봐서 주 수행자가 가려졌을 때 구경꾼으로 바뀌지 않게 함)
+    def _select(self, detections):
+        if detections is None:
+            return None
+        boxes, confidences, points = detections
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        scores = areas * confidences
+        index = None
+        if self.box is not None:
+            overlaps = box_iou(self.box, boxes)
+            if overlaps.max() >= self.min_iou:
+                index = int(overlaps.argmax())
+            else:
+                tracked_area = (self.box[2] - self.box[0]) * (self.box[3] - self.box[1])
+                scores = np.where(areas >= tracked_area * self.min_area_ratio, scores, -1)
+                if scores.max() < 0:
+                    return None
+        if index is None:
+            index = int(scores.argmax())
+        if confidences[index] < self.min_confidence:
+            return None
+        return boxes[index], points[index]
+
+    # 잘라낸 영역의 경계(프레임 경계 제외)에 닿은 박스는 사람이 잘렸을 수 있으므로 재검출
+    @staticmethod
+    def _touches_edge(box, region, frame_shape):
+        x0, y0, x1, y1 = region
+        height, width = frame_shape[:2]
+        return ((x0 > 0 and box[0] <= x0 + 1) or (y0 > 0 and box[1] <= y0 + 1)
+                or (x1 < width and box[2] >= x1 - 1) or (y1 < height and box[3] >= y1 - 1))
+
+    def process(self, frames):
+        """
+        프레임 배치에서 추적 대상의 keypoints를 전체 프레임 기준으로 정규화한 (17, 3) [x, y, 신뢰도] 배열 목록으로 반환.
+        사람이 없는 프레임은 0으로 채운 배열 (전체 프레임 추출과 같은 규칙).
+        """
+        if not frames:
+            return []
+        height, width = frames[0].shape[:2]
+        selected = [None] * len(frames)
+        start = 0
+
+        # 0) 아직 추적 대상이 없으면 첫 프레임만 전체 프레임에서 검출
+        if self.box is None:
+            with span('inference.full', frames=1):
+                result = self.model(frames[:1], verbose=False)[0]
+            self.stats['full_frames'] += 1
+            selected[0] = self._select(_detections(result))
+            if selected[0] is not None:
+                self.box = selected[0][0]
+            start = 1
+        redetect = list(range(start, len(frames)))
+
+        # 1) 추적 박스 주변만 잘라서 작은 해상도로 추론 (배치 안에서는 같은 영역 사용)
+        if self.box is not None and redetect:
+            region = x0, y0, x1, y1 = self.crop_region(frames[0].shape)
+            crops = [np.ascontiguousarray(frames[i][y0:y1, x0:x1]) for i in redetect]
+            with span('inference.crop', frames=len(crops), width=x1 - x0, height=y1 - y0):
+                results = self.model(crops, imgsz=self.crop_imgsz, verbose=False)
+            self.stats['crop_frames'] += len(crops)
+            redetect = []
+            for i, result in zip(range(start, len(frames)), results):
+                match = self._select(_detections(result, (x0, y0)))
+                if match is None or self._touches_edge(match[0], region, frames[i].shape):
+                    redetect.append(i)
+                else:
+                    selected[i] = match
+
+        # 2) 놓친 프레임만 전체 프레임에서 다시 검출
+        if redetect:
+            with span('inference.full', frames=len(redetect)):
+                results = self.model([frames[i] for i in redetect], verbose=False)
+            self.stats['full_frames'] += len(redetect)
+            incr('tracking.redetections', len(redetect))
+            for i, result in zip(redetect, results):
+                selected[i] = self._select(_detections(result))
+                if selected[i] is None:
+                    self.stats['lost'] += 1
+
+        # 3) 다음 배치는 마지막으로 찾은 박스 주변을 잘라냄
+        points_list = []
+        for match in selected:
+            points = np.zeros((NUM_KEYPOINTS, 3), dtype=np.float32)
+            if match is not None:
+                self.box = match[0]
+                points[:, :2] = normalize_keypoints(match[1][:, :2], width, height)
+                points[:, 2] = match[1][:, 2]
+            points_list.append(points)
+        return points_list
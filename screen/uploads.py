@@ -0,0 +1,101 @@
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+
+from .reference_store import ROOT_DIR
+
+# 업로드 영상을 고정 크기 청크로 디스크에 스트리밍하면서 해시 계산
+# 세션별 디렉터리에 (업로드 해시).확장자 로 한 번만 저장하고, 오래 사용하지 않은 세션은 주기적으로 삭제
+
+SPOOL_DIR = os.environ.get('HH_UPLOAD_SPOOL', os.path.join(ROOT_DIR, '.cache', 'uploads'))
+CHUNK_SIZE = 1024 * 1024  # 1MB
+SESSION_TTL = 60 * 60  # 마지막 사용 후 세션 업로드를 보관하는 시간 (초)
+SWEEP_INTERVAL = 5 * 60
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _session_dir(session_id, spool_dir):
+    return os.path.join(spool_dir, session_id)
+
+
+# 세션 디렉터리 수정 시각을 마지막 사용 시각으로 사용
+def touch_session(session_id, spool_dir=SPOOL_DIR):
+    session_dir = _session_dir(session_id, spool_dir)
+    if os.path.isdir(session_dir):
+        os.utime(session_dir)
+
+
+def spool_upload(uploaded_file, session_id, spool_dir=SPOOL_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Streamlit UploadedFile(또는 read(n)을 지원하는 파일 객체)을 청크 단위로 디스크에 쓰고
+    (저장 경로, SHA-256)을 반환. 같은 세션에 같은 내용이 이미 있으면 기존 파일을 사용한다.
+    """
+    session_dir = _session_dir(session_id, spool_dir)
+    os.makedirs(session_dir, exist_ok=True)
+    extension = os.path.splitext(getattr(uploaded_file, 'name', ''))[1].lower() or '.mp4'
+
+    if hasattr(uploaded_file, 'seek'):
+        uploaded_file.seek(0)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=session_dir, suffix='.part', delete=False) as spool:
+        part_path = spool.name
+        try:
+            for chunk in iter(lambda: uploaded_file.read(chunk_size), b''):
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            os.remove(part_path)
+            raise
+
+    upload_hash = digest.hexdigest()
+    path = os.path.join(session_dir, f"{upload_hash}{extension}")
+    if os.path.exists(path):
+        os.remove(part_path)
+    else:
+        os.replace(part_path, path)
+    touch_session(session_id, spool_dir)
+    return path, upload_hash
+
+
+def remove_session(session_id, spool_dir=SPOOL_DIR):
+    shutil.rmtree(_session_dir(session_id, spool_dir), ignore_errors=True)
+
+
+# TTL이 지난 세션 디렉터리 삭제, 삭제한 세션 수 반환
+def sweep_expired(ttl=SESSION_TTL, spool_dir=SPOOL_DIR):
+    if not os.path.isdir(spool_dir):
+        return 0
+    removed = 0
+    now = time.time()
+    for name in os.listdir(spool_dir):
+        session_dir = os.path.join(spool_dir, name)
+        try:
+            expired = now - os.path.getmtime(session_dir) > ttl
+        except FileNotFoundError:
+            continue
+        if expired:
+            shutil.rmtree(session_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+# 프로세스당 하나의 백그라운드 정리 스레드
+def start_sweeper(interval=SWEEP_INTERVAL, ttl=SESSION_TTL, spool_dir=SPOOL_DIR):
+    global _sweeper
+
+    def run():
+        while True:
+            sweep_expired(ttl, spool_dir)
+            time.sleep(interval)
+
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=run, name='upload-sweeper', daemon=True)
+            _sweeper.start()
+    return _sweeper
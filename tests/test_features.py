@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from screen.bench_features import _normalize_loop, _relative_distances_loop, _smooth_loop
+from screen.features import calculate_relative_distances, normalize_keypoints, smooth_keypoints
+
+# 벡터화된 특징 계산이 기존 파이썬 반복문 구현(bench_features)과 같은 값을 내는지 확인
+# 입력은 추출 결과와 같은 (T, 17, 3) [x, y, 신뢰도] 시퀀스, 검출이 없는 프레임(전부 0)을 섞음
+
+FRAME_WIDTH, FRAME_HEIGHT = 1920, 1080
+
+
+def _random_sequence(num_frames, missing=(), seed=0):
+    rng = np.random.default_rng(seed)
+    sequence = rng.random((num_frames, 17, 3)).astype(np.float32)
+    sequence[..., 0] *= FRAME_WIDTH
+    sequence[..., 1] *= FRAME_HEIGHT
+    sequence[list(missing)] = 0.0
+    return sequence
+
+
+# 기존 방식: 프레임마다 (34,) 좌표로 펼쳐서 정규화 -> 시퀀스 스무딩 -> 프레임마다 거리 계산
+def _legacy_features(sequence):
+    flat = sequence[..., :2].reshape(len(sequence), -1)
+    normalized = np.array([_normalize_loop(frame, FRAME_WIDTH, FRAME_HEIGHT) for frame in flat])
+    smoothed = _smooth_loop(normalized.astype(np.float64))
+    return normalized, smoothed, np.array([_relative_distances_loop(frame) for frame in smoothed])
+
+
+@pytest.mark.parametrize('num_frames, missing', [
+    (30, ()),
+    (30, (0, 7, 8, 29)),  # 앞/중간(연속)/끝 프레임에 검출 없음
+    (5, (0, 1, 2, 3, 4)),  # 전부 검출 없음
+])
+def test_vectorized_features_match_loops(num_frames, missing):
+    sequence = _random_sequence(num_frames, missing)
+    legacy_normalized, legacy_smoothed, legacy_distances = _legacy_features(sequence)
+
+    normalized = normalize_keypoints(sequence, FRAME_WIDTH, FRAME_HEIGHT)
+    assert normalized.shape == sequence.shape
+    assert np.allclose(normalized[..., :2].reshape(num_frames, -1), legacy_normalized, rtol=1e-5, atol=1e-6)
+
+    smoothed = smooth_keypoints(normalized)
+    assert np.allclose(smoothed[..., :2].reshape(len(smoothed), -1), legacy_smoothed, rtol=1e-5, atol=1e-6)
+
+    distances = calculate_relative_distances(smoothed)
+    assert distances.shape == legacy_distances.shape
+    assert np.allclose(distances, legacy_distances, rtol=1e-5, atol=1e-6)
+    assert np.allclose(calculate_relative_distances(smoothed[0, :, :2].reshape(-1)), legacy_distances[0], rtol=1e-5, atol=1e-6)
+
+
+def test_empty_sequence_has_no_features():
+    assert calculate_relative_distances(np.zeros((0, 17, 3), dtype=np.float32)).shape == (0, 136)
+
+
+# 정규화 좌표(x/W, y/H)에 영상 비율을 넘기면 관절 각도가 픽셀 좌표로 계산한 값과 같아야 함
+def test_joint_angles_are_isotropic():
+    from screen.feature_space import JointAngleFeature, joint_angles
+
+    sequence = _random_sequence(10)
+    normalized = normalize_keypoints(sequence, FRAME_WIDTH, FRAME_HEIGHT)
+    expected = joint_angles(sequence[..., :2])
+    angles = JointAngleFeature()(normalized, aspect=FRAME_WIDTH / FRAME_HEIGHT)
+    assert np.allclose(angles, expected, atol=1e-4)
@@ -0,0 +1,82 @@
+import shutil
+import functools
+
+import cv2
+import numpy as np
+import pytest
+
+from screen import jobs, metrics, reference_store
+from screen.onnx_backend import PoseBoxes, PoseKeypoints, PoseResult
+from screen.result_cache import ResultCache
+
+# 같은 업로드를 두 번 비교하면 두 번째는 저장된 점수를 반환하고 포즈 모델을 전혀 호출하지 않아야 함
+
+
+class CountingModel:
+    """프레임 밝기로 keypoints를 만드는 가짜 포즈 모델 (호출 횟수를 셈)"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source, **kwargs):
+        self.calls += 1
+        frames = source if isinstance(source, list) else [source]
+        results = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            level = frame.mean() / 255.0
+            data = np.zeros((1, 17, 3), dtype=np.float32)
+            data[0, :, 0] = (0.2 + 0.6 * level) * width * np.linspace(0.5, 1.0, 17)
+            data[0, :, 1] = (0.8 - 0.6 * level) * height * np.linspace(1.0, 0.5, 17)
+            data[0, :, 2] = 0.9
+            boxes = PoseBoxes(np.array([[0, 0, width, height]], dtype=np.float32), np.array([0.9], dtype=np.float32))
+            results.append(PoseResult(boxes, PoseKeypoints(data), (height, width)))
+        return results
+
+
+def _write_video(path, levels, fps=10.0, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for level in levels:
+        writer.write(np.full((size[1], size[0], 3), level, dtype=np.uint8))
+    writer.release()
+
+
+@pytest.fixture
+def stub_pipeline(tmp_path, monkeypatch):
+    model = CountingModel()
+    monkeypatch.setattr(metrics, 'ENABLED', False)
+    monkeypatch.setattr(jobs, 'load_profile_model', lambda profile, warm=False: model)
+    monkeypatch.setattr(jobs, 'model_key', lambda profile: 'counting-stub')
+    monkeypatch.setattr(jobs, 'load_reference_keypoints', functools.partial(
+        reference_store.load_reference_keypoints, store_dir=str(tmp_path / 'store')))
+    monkeypatch.setattr(jobs, 'TRACK_SUBJECT', False)
+    monkeypatch.setattr(jobs, 'ADAPTIVE_SAMPLING', False)
+    monkeypatch.setattr(jobs, 'shard_budget', lambda: 1)
+    return model
+
+
+def test_second_identical_upload_skips_inference(tmp_path, monkeypatch, stub_pipeline):
+    reference = tmp_path / 'reference.mp4'
+    upload = tmp_path / 'upload.mp4'
+    _write_video(reference, np.linspace(0, 250, 40))
+    _write_video(upload, np.linspace(250, 0, 40))
+    cache_dir = str(tmp_path / 'cache')
+
+    monkeypatch.setattr(jobs, 'get_result_cache', lambda: ResultCache(cache_dir))
+    first = jobs.compare(str(reference), str(upload), {}, None, None, 'accurate')
+    assert first['cached'] is False
+    assert stub_pipeline.calls > 0
+
+    # 같은 바이트를 다른 경로로 다시 올린 경우: 새 프로세스처럼 메모리 캐시 없이 디스크 캐시만으로 다시 비교
+    # (키가 경로가 아니라 내용 해시로 만들어져야 캐시를 찾음)
+    reupload = tmp_path / 'session2' / 'reupload.mp4'
+    reupload.parent.mkdir()
+    shutil.copyfile(upload, reupload)
+    stub_pipeline.calls = 0
+    progress = {}
+    second = jobs.compare(str(reference), str(reupload), progress, None, None, 'accurate')
+    assert second['cached'] is True
+    assert stub_pipeline.calls == 0
+    assert second['distance'] == first['distance']
+    assert second['upload_hash'] == first['upload_hash']
+    assert progress['stage'] == 'done'